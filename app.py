@@ -7,7 +7,9 @@ Soruları Cloud Run'daki FastAPI backend'e HTTP ile gönderir.
 """
 
 import streamlit as st
-import requests
+import httpx
+import importlib.util
+import json
 import os
 import time
 
@@ -17,6 +19,62 @@ import time
 # Cloud Run URL'si (.env veya Streamlit Cloud Secrets'tan okunur)
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 
+@st.cache_resource
+def get_backend_client():
+    """
+    Backend'e TEK, havuzlu HTTP istemcisi (tüm oturumlar ve yeniden çalıştırmalar paylaşır).
+    Bağlantılar açık tutulur; her soruda yeniden TLS el sıkışması yapılmaz.
+    'h2' paketi kuruluysa HTTP/2 kullanılır (Cloud Run destekler).
+    """
+    return httpx.Client(
+        base_url=BACKEND_URL,
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+        timeout=httpx.Timeout(60, connect=10),
+    )
+
+def stream_answer(question, status):
+    """
+    /ask/stream (Server-Sent Events) akışını okur ve cevap parçalarını üretir.
+    st.write_stream ile kullanılır: ilk kelime, planlama biter bitmez ekrana düşer.
+
+    Girdi:
+    - question: Kullanıcı sorusu
+    - status: Planlama/arama durumunun yazılacağı st.empty() alanı
+    """
+    with get_backend_client().stream(
+        "POST",
+        "/ask/stream",
+        json={"question": question}
+    ) as resp:
+        resp.raise_for_status()
+
+        event = None
+        for line in resp.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                continue
+            if not line.startswith("data: "):
+                continue
+            data = json.loads(line[len("data: "):])
+
+            if event == "routing":
+                if data.get("cached"):
+                    status.caption("⚡ Benzer bir soru daha önce cevaplandı.")
+                elif data.get("tools"):
+                    tools = ", ".join(t["tool"].replace("search_", "").upper() for t in data["tools"])
+                    status.caption(f"🔎 Taranan kaynaklar: {tools}")
+            elif event == "sources":
+                status.caption(f"📚 {len(data)} kaynak bulundu, cevap yazılıyor...")
+            elif event == "token":
+                yield data["text"]
+            elif event == "references":
+                yield f"\n\n{data['text']}"
+            elif event == "error":
+                raise RuntimeError(data.get("detail", "Bilinmeyen hata"))
+            elif event == "done":
+                status.empty()
+
 # ==============================================================================
 # 2. SAYFA AYARLARI
 # ==============================================================================
@@ -65,7 +123,7 @@ with st.sidebar:
 # Sayfa yüklendiğinde backend'in erişilebilir olup olmadığını kontrol et
 if "backend_ready" not in st.session_state:
     try:
-        resp = requests.get(f"{BACKEND_URL}/health", timeout=10)
+        resp = get_backend_client().get("/health", timeout=10)
         data = resp.json()
         st.session_state.backend_ready = data.get("rag_ready", False)
         if st.session_state.backend_ready:
@@ -100,28 +158,18 @@ if prompt := st.chat_input("Sorunuzu buraya yazın..."):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # 2. Backend API'ye sor
+    # 2. Backend API'ye sor (Akışlı: cevap yazıldıkça ekrana düşer)
     with st.chat_message("assistant"):
-        with st.spinner("Kanun maddeleri taranıyor..."):
-            try:
-                # --- API ÇAĞRISI ---
-                resp = requests.post(
-                    f"{BACKEND_URL}/ask",
-                    json={"question": prompt},
-                    timeout=60
-                )
-                resp.raise_for_status()
-                data = resp.json()
-                
-                cevap = data["answer"]
-                
-                # Cevabı Göster
-                st.markdown(cevap)
-                
-                # Cevabı hafızaya kaydet
-                st.session_state.messages.append({"role": "assistant", "content": cevap})
-            
-            except requests.exceptions.ConnectionError:
-                st.error("Backend sunucusuna bağlanılamadı. Lütfen API servisinin çalıştığından emin olun.")
-            except Exception as e:
-                st.error(f"Bir hata oluştu: {e}")
+        status = st.empty()
+        status.caption("Kanun maddeleri taranıyor...")
+        try:
+            # --- API ÇAĞRISI (SSE) ---
+            cevap = st.write_stream(stream_answer(prompt, status))
+
+            # Cevabı hafızaya kaydet
+            st.session_state.messages.append({"role": "assistant", "content": cevap})
+
+        except httpx.ConnectError:
+            st.error("Backend sunucusuna bağlanılamadı. Lütfen API servisinin çalıştığından emin olun.")
+        except Exception as e:
+            st.error(f"Bir hata oluştu: {e}")
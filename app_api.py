@@ -5,18 +5,36 @@ RAG ajanını HTTP servisi olarak sunar.
 Google Cloud Run üzerinde çalışır.
 
 Endpoints:
-  POST /ask    → Soru-Cevap
-  GET  /health → Kontrol
+  POST /ask        → Soru-Cevap
+  POST /ask/stream → Soru-Cevap (Server-Sent Events, token token akış)
+  POST /ask/batch  → Toplu Soru-Cevap (soru listesi, giriş sırasıyla sonuçlar)
+  GET  /health → Kontrol (canlılık + hazırlık + soğuk başlangıç süreleri)
+  GET  /health/live  → Canlılık (süreç ayakta mı)
+  GET  /health/ready → Hazırlık (koleksiyonlar açık mı; değilse 503)
+  GET  /stats  → Önbellek ve MLflow yazıcısı sayaçları
   GET  /docs   → Swagger UI (Otomatik)
 
 """
 
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 from src.agent import LegalRAG
+from src import config, metrics, utils
+import asyncio
+import json
 import logging
 
+# Soğuk başlangıç dökümü (saniye): içe aktarma + LegalRAG adımları (/health)
+startup_timings = {"imports": round(time.perf_counter() - _IMPORT_STARTED, 4)}
+
 # --- Logging Ayarları ---
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -46,27 +64,103 @@ class SourceItem(BaseModel):
     """Tek bir kaynak belgesi."""
     doc_name: str
     content: str
+    page_start: Optional[int] = None  # Parçanın PDF'teki ilk/son sayfası (varsa)
+    page_end: Optional[int] = None
+    score: Optional[float] = None     # Vektör benzerliği (kosinüs; BM25 ile bulunanlarda yok)
 
 class AnswerResponse(BaseModel):
     """API cevabı: yanıt metni + başvurulan kaynaklar."""
     answer: str
     sources: list[SourceItem]
 
+class BatchRequest(BaseModel):
+    """Toplu soru listesi."""
+    questions: list[str]
+
+class BatchItem(BaseModel):
+    """Toplu cevaptaki tek bir sorunun sonucu (başarılıysa answer/sources, değilse error)."""
+    answer: Optional[str] = None
+    sources: list[SourceItem] = []
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    """Toplu API cevabı: soruların giriş sırasıyla sonuçları."""
+    results: list[BatchItem]
+
+def to_source_items(raw_sources):
+    """Ham kaynak verilerini ({'content', 'metadata'}) API formatına dönüştürür."""
+    return [
+        SourceItem(
+            doc_name=src.get("metadata", {}).get("doc_name", "Bilinmiyor"),
+            content=src.get("content", "")[:600],  # Uzun metinleri kırp
+            page_start=src.get("metadata", {}).get("page_start"),
+            page_end=src.get("metadata", {}).get("page_end"),
+            score=src.get("score")
+        )
+        for src in raw_sources
+    ]
+
+def sse_event(event, data):
+    """Tek bir Server-Sent Events mesajı üretir."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 # --- RAG Sistemi (Uygulama başlatılırken bir kez yüklenir) ---
 rag_system = None
+warmup_task = None  # Koleksiyonları (LAZY_COLLECTIONS) ve router merkez vektörlerini arka planda hazırlayan görev
+
+async def warm_up_in_background():
+    """
+    Sunucu istek kabul ederken:
+    1. Koleksiyonları açar (config.LAZY_COLLECTIONS açıksa).
+    2. Yönlendiricinin merkez vektörlerini hesaplar (embedding isteği + koleksiyon okumaları);
+       böylece ilk istekler bu hesaplamayı beklemez.
+    """
+    if not rag_system.collections_ready:
+        try:
+            await asyncio.to_thread(rag_system.open_collections)
+            logger.info(f"Koleksiyonlar hazır ({rag_system.init_timings['collections']} sn).")
+        except Exception as e:
+            # Açılamayan koleksiyonlar ilk aramada tekrar denenir
+            logger.warning(f"Koleksiyonlar arka planda açılamadı: {e}")
+    if rag_system.router:
+        try:
+            await asyncio.to_thread(rag_system.router.warm_up)
+        except Exception as e:
+            # Kararlar LLM planlamasına döner; hesaplama ROUTER_RETRY_INTERVAL sonra tekrar denenir
+            logger.warning(f"Router merkez vektörleri hesaplanamadı: {e}")
 
 @app.on_event("startup")
 async def startup_event():
-    """Uygulama başlarken RAG sistemini hazırla."""
-    global rag_system
+    """
+    Uygulama başlarken RAG sistemini hazırla.
+    Koleksiyonlar paralel açılır; LAZY_COLLECTIONS açıksa hiç beklenmez (arka planda açılır).
+    """
+    global rag_system, warmup_task
+    # asyncio.to_thread varsayılan havuzu (CPU+4 thread) eşzamanlı istekler için
+    # dar kalır; bloklayıcı ChromaDB/MLflow çağrıları için havuzu genişlet.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=config.IO_THREAD_POOL_SIZE)
+    )
     try:
         logger.info("RAG sistemi başlatılıyor...")
+        started = time.perf_counter()
         rag_system = LegalRAG()
-        logger.info("RAG sistemi hazır.")
+        startup_timings["init"] = rag_system.init_timings
+        startup_timings["startup"] = round(time.perf_counter() - started, 4)
+        logger.info(f"RAG sistemi hazır: {startup_timings}")
+        if not rag_system.collections_ready or rag_system.router:
+            warmup_task = asyncio.create_task(warm_up_in_background())
     except Exception as e:
         logger.error(f"RAG sistemi başlatılamadı: {e}")
         raise e
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Kapanırken kuyrukta bekleyen MLflow kayıtlarını yaz (src/tracking.py)."""
+    if rag_system and rag_system.tracker:
+        await asyncio.to_thread(rag_system.tracker.flush)
+        logger.info(f"MLflow yazıcısı kapandı: {rag_system.tracker.stats()}")
+
 # --- Endpoints ---
 
 @app.get("/health")
@@ -75,8 +169,64 @@ async def health_check():
     Sağlık Kontrolü
     ----------------
     Cloud Run ve load balancer'ların kullanacağı basit bir endpoint.
+    - live: Süreç ayakta ve istek kabul ediyor
+    - ready: RAG sistemi kurulu ve tüm koleksiyonlar açık
+    - startup: Soğuk başlangıç dökümü (içe aktarma, istemciler, indeksler, koleksiyonlar — sn)
+    """
+    return {
+        "status": "healthy",
+        "live": True,
+        "ready": is_ready(),
+        "rag_ready": rag_system is not None,
+        "startup": startup_timings,
+    }
+
+def is_ready():
+    return rag_system is not None and rag_system.collections_ready
+
+@app.get("/health/live")
+async def liveness():
+    """Canlılık: süreç cevap veriyorsa 200 (yeniden başlatma kararı için)."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Hazırlık: koleksiyonlar açılana kadar 503 (trafik yönlendirme / startup probe için)."""
+    if not is_ready():
+        raise HTTPException(status_code=503, detail="RAG sistemi henüz hazır değil.")
+    return {"status": "ready"}
+
+@app.get("/stats")
+async def stats():
+    """
+    Önbellek İstatistikleri
+    -----------------------
+    Sorgu embedding önbelleği ve anlamsal cevap önbelleğinin sayaçları.
+    Kaç embedding ve LLM çağrısından tasarruf edildiğini gösterir.
+    'single_flight': Devam eden aynı soruya bağlanan (birleştirilen) istekler.
+    'speculation': Planlamayla paralel ön-aramaların isabet oranı ve kazanılan süre.
+    'tracking': MLflow yazıcısı (kuyrukta bekleyen, yazılan, atılan kayıtlar).
+    """
+    answer_cache = rag_system.answer_cache if rag_system else None
+    return {
+        "embedding_cache": utils.get_query_embedding_cache().stats(),
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "router": rag_system.router.stats() if rag_system and rag_system.router else None,
+        "single_flight": rag_system.single_flight.stats() if rag_system and rag_system.single_flight else None,
+        "speculation": rag_system.speculator.stats() if rag_system and rag_system.speculator else None,
+        "tracking": rag_system.tracker.stats() if rag_system and rag_system.tracker else None,
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus Metrikleri
+    ---------------------
+    Adım bazlı gecikme histogramları (planning, embedding, retrieval, generation),
+    istek başına token, araç çağrısı ve önbellek isabet sayaçları (src/metrics.py).
     """
-    return {"status": "healthy", "rag_ready": rag_system is not None}
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
 
 @app.post("/ask", response_model=AnswerResponse)
 async def ask_question(request: QuestionRequest):
@@ -97,15 +247,11 @@ async def ask_question(request: QuestionRequest):
     
     try:
         logger.info(f"Soru alındı: {request.question[:80]}...")
-        answer, raw_sources = rag_system.generate_answer(request.question)
+        # Asenkron akış: LLM ve ChromaDB beklenirken event loop serbest kalır
+        answer, raw_sources = await rag_system.agenerate_answer(request.question)
         
         # Ham kaynak verilerini API formatına dönüştür
-        sources = []
-        for src in raw_sources:
-            sources.append(SourceItem(
-                doc_name=src.get("metadata", {}).get("doc_name", "Bilinmiyor"),
-                content=src.get("content", "")[:600]  # Uzun metinleri kırp
-            ))
+        sources = to_source_items(raw_sources)
         
         logger.info(f"Cevap hazır. Kaynak sayısı: {len(sources)}")
         return AnswerResponse(answer=answer, sources=sources)
@@ -113,3 +259,81 @@ async def ask_question(request: QuestionRequest):
     except Exception as e:
         logger.error(f"Soru işlenirken hata: {e}")
         raise HTTPException(status_code=500, detail=f"İşlem hatası: {str(e)}")
+
+@app.post("/ask/batch", response_model=BatchResponse)
+async def ask_batch(request: BatchRequest):
+    """
+    Toplu Soru-Cevap Endpoint'i
+    ---------------------------
+    Yönetim şirketlerinin toplu soru listeleri için: liste tek bir iş olarak
+    işlenir (LegalRAG.agenerate_answers). Aynı sorular bir kez cevaplanır,
+    tüm sorgular toplu vektörleştirilir ve koleksiyon başına tek arama yapılır;
+    LLM çağrıları config.BATCH_CONCURRENCY ile sınırlıdır.
+
+    Girdi: {"questions": ["Aidat ödemezsem ne olur?", ...]}
+    Çıktı: {"results": [{"answer": "...", "sources": [...]}, {"error": "..."}, ...]}
+    Bir sorunun hatası sadece o sorunun 'error' alanına yazılır.
+    """
+    if rag_system is None:
+        raise HTTPException(status_code=503, detail="RAG sistemi henüz hazır değil.")
+
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="Soru listesi boş olamaz.")
+
+    if len(request.questions) > config.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Tek istekte en fazla {config.BATCH_MAX_QUESTIONS} soru gönderilebilir."
+        )
+
+    try:
+        logger.info(f"Toplu soru alındı: {len(request.questions)} soru")
+        results = await rag_system.agenerate_answers(request.questions)
+        items = [
+            BatchItem(error=result["error"]) if "error" in result
+            else BatchItem(answer=result["answer"], sources=to_source_items(result["sources"]))
+            for result in results
+        ]
+        logger.info(f"Toplu cevap hazır. Hatalı soru sayısı: {sum(1 for item in items if item.error)}")
+        return BatchResponse(results=items)
+
+    except Exception as e:
+        logger.error(f"Toplu soru işlenirken hata: {e}")
+        raise HTTPException(status_code=500, detail=f"İşlem hatası: {str(e)}")
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """
+    Akışlı Soru-Cevap Endpoint'i (Server-Sent Events)
+    -------------------------------------------------
+    /ask ile aynı işi yapar; ancak cevabın tamamını beklemek yerine:
+    1. routing    → Planlayıcı hangi kanunları seçti (ilk olay)
+    2. sources    → Arama bitince bulunan kaynaklar
+    3. token      → Nihai cevap parça parça
+    4. references → "📌 Kaynak: ..." satırı
+    5. done       → Akış bitti (hata olursa 'error' olayı gönderilir)
+    """
+    if rag_system is None:
+        raise HTTPException(status_code=503, detail="RAG sistemi henüz hazır değil.")
+
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Soru boş olamaz.")
+
+    logger.info(f"Soru alındı (stream): {request.question[:80]}...")
+
+    async def event_stream():
+        try:
+            async for event, data in rag_system.astream_answer(request.question):
+                if event == "sources":
+                    data = jsonable_encoder(to_source_items(data))
+                yield sse_event(event, data)
+        except Exception as e:
+            logger.error(f"Soru işlenirken hata (stream): {e}")
+            yield sse_event("error", {"detail": f"İşlem hatası: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Proxy/load balancer'ların akışı tamponlamasını engelle
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -10,13 +10,35 @@ aranacağına LLM'in kendisi karar verir — bu yaklaşıma
 
 """
 
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import asyncio
+import contextvars
 import json
 import re
-import mlflow
+import time
 from src import config
 from src.rag_engine import LegalRAGTool
-from src import utils
+from src.answer_cache import SemanticAnswerCache
+from src.context_packer import pack_context
+from src.single_flight import SingleFlight, question_key
+from src.speculation import SpeculativeRetriever
+from src.router import EmbeddingRouter
+from src.article_index import ArticleIndex, ARTICLE_TYPES
+from src import metrics, tracking, utils
+
+# Numarası bilinen maddeyi getiren aracın adı (search_* araçlarından ayrı)
+ARTICLE_TOOL = "get_article"
+
+def _format_pages(pages):
+    """Sayfa numaralarını kısa aralıklara çevirir: {2, 5, 6, 7} -> "2, 5-7"."""
+    ranges = []
+    for page in sorted(pages):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
 
 class LegalRAG:
     """
@@ -28,24 +50,95 @@ class LegalRAG:
     3. Cevaplama (Generator): Bulunan bilgileri kullanarak kullanıcıya cevap üretir.
     """
     
-    def __init__(self):
+    def __init__(self, lazy_collections=None):
         """
         Sistemi Hazırla:
-        - OpenAI ve ChromaDB bağlantılarını kur.
-        - MLflow takip sistemini başlat.
-        - Tüm hukuk kaynaklarını (Tools) hafızaya yükle.
+        - OpenAI (senkron + asenkron) ve vektör veritabanı bağlantılarını kur.
+        - MLflow istek takibini (arka plan yazıcısı) bağla.
+        - Tüm hukuk kaynaklarını (Tools) hafızaya yükle; koleksiyonlar paralel açılır.
+
+        lazy_collections (varsayılan: config.LAZY_COLLECTIONS): True ise koleksiyonlar
+        burada açılmaz; open_collections() (ör. sunucu başladıktan sonra arka planda)
+        veya ilk arama sırasında açılır.
+
+        Her adımın süresi self.init_timings'e yazılır (/health soğuk başlangıç dökümü).
         """
-        self.client = OpenAI(api_key=config.OPENAI_API_KEY)
-        self.chroma_client = utils.get_chroma_client()
+        if lazy_collections is None:
+            lazy_collections = config.LAZY_COLLECTIONS
+        self.init_timings = {}
+        started = time.perf_counter()
+
+        # Paylaşılan, havuzlu istemciler (utils: tek bağlantı havuzu, keep-alive, HTTP/2)
+        self.client = utils.get_openai_client()
+        # FastAPI event loop'unu bloklamamak için asenkron istemci (agenerate_answer)
+        self.async_client = utils.new_async_openai_client()
+        self.vector_client = utils.get_vector_client()
+        # Tüm koleksiyonlar tek bir embedding fonksiyonunu paylaşır
+        self.embedding_fn = utils.get_embedding_function()
+        self.embedding_cache = utils.get_query_embedding_cache()
+        # Benzer sorulara LLM'e gitmeden cevap (config.ANSWER_CACHE_*); koleksiyonların
+        # ingest_version'ı değişince (yeniden yükleme) boşaltılır
+        self.answer_cache = (
+            SemanticAnswerCache(version_fn=self._ingest_versions) if config.ANSWER_CACHE_ENABLED else None
+        )
+        # Aynı anda gelen aynı sorular tek akışı bekler (config.SINGLE_FLIGHT_ENABLED)
+        self.single_flight = SingleFlight() if config.SINGLE_FLIGHT_ENABLED else None
         
-        # MLflow Konfigürasyonu
-        mlflow.set_tracking_uri(config.MLFLOW_TRACKING_URI)
-        mlflow.set_experiment(config.MLFLOW_EXPERIMENT_NAME)
+        # MLflow: her istek bitince bir run kuyruğa eklenir, arka planda toplu yazılır
+        # (src/tracking.py). İstek yolunda MLflow'a hiç gidilmez.
+        self.tracker = tracking.get_request_tracker()
+        started = self._init_step("clients", started)
         
-        # ARAÇLARI HAZIRLA (Her kanun için RAG motoru)
+        # ARAÇLARI HAZIRLA (Her kanun için RAG motoru; koleksiyon bağlantısı aşağıda)
         self.tools_map = {}
         for key, info in config.LEGAL_DOCS.items():
-            self.tools_map[key] = LegalRAGTool(info["collection"], self.chroma_client)
+            self.tools_map[key] = LegalRAGTool(info["collection"], self.vector_client, self.embedding_fn, lazy=True)
+
+        # Madde indeksi: "KMK Madde 20" gibi numarası bilinen maddeler aramasız getirilir
+        self.article_index = ArticleIndex.load(config.ARTICLE_INDEX_PATH)
+
+        # Yerel yönlendirici: emin olduğu sorularda planlama LLM çağrısını atlar
+        self.router = None
+        if config.ROUTER_MODE != "off":
+            self.router = EmbeddingRouter(
+                self.tools_map, lambda texts: utils.embed_texts(self.client, texts)
+            )
+        started = self._init_step("indexes", started)
+
+        # Aynı planlama adımındaki koleksiyon sorgularını paralel çalıştırmak için
+        self.executor = ThreadPoolExecutor(max_workers=len(self.tools_map))
+
+        # Planlama sürerken ham soru en olası kanunlarda önceden aranır (config.SPECULATIVE_RETRIEVAL)
+        self.speculator = None
+        if config.SPECULATIVE_RETRIEVAL and self.router:
+            self.speculator = SpeculativeRetriever(self.tools_map, self.executor)
+
+        if not lazy_collections:
+            self.open_collections()
+
+    def _init_step(self, step, started):
+        """Bir başlangıç adımının süresini init_timings'e yazar; sonraki adımın başlangıcını döndürür."""
+        now = time.perf_counter()
+        self.init_timings[step] = round(now - started, 4)
+        return now
+
+    def _ingest_versions(self):
+        """Tüm koleksiyonların ingestion sürümleri (paralel okunur; answer_cache sürüm kontrolü)."""
+        return tuple(self.executor.map(lambda tool: tool.ingest_version(), self.tools_map.values()))
+
+    def open_collections(self):
+        """
+        Tüm koleksiyonlara paralel bağlanır (her biri bir ağ turu).
+        Sıralı açılışta süre koleksiyon sayısıyla çarpılırdı; paralelde en yavaşı kadardır.
+        """
+        started = time.perf_counter()
+        list(self.executor.map(lambda tool: tool.open(), self.tools_map.values()))
+        self._init_step("collections", started)
+
+    @property
+    def collections_ready(self):
+        """Tüm koleksiyonlar açıldı mı (hazırlık / readiness kontrolü)."""
+        return all(tool.is_open for tool in self.tools_map.values())
             
     def _get_system_prompt(self):
         """
@@ -78,43 +171,61 @@ class LegalRAG:
         """
         MADDE NUMARASI ÇIKARICI (Hallucination Önleyici)
         ------------------------------------------------
-        Ne Yapar: Retrieved chunk'ların ham metninden regex ile
-        madde numaralarını çeker ve kaynak adına göre gruplar.
+        Ne Yapar: Retrieved chunk'ların kapsadığı maddeleri toplar ve kaynak adına göre gruplar.
+        Maddeler ingestion sırasında chunk metadata'sına ('articles') yazılır;
+        bu alan olmayan eski chunk'larda ham metin regex ile taranır.
+
+        Sayfa aralıkları ('page_start' / 'page_end') varsa onlar da eklenir.
 
-        Girdi: sources — [{'content': '...Madde 20...', 'metadata': {'doc_name': 'Kat Mülkiyeti Kanunu'}}]
-        Çıktı: "📌 Kaynak: Kat Mülkiyeti Kanunu (Madde 20, 4)"
+        Girdi: sources — [{'content': '...', 'metadata': {'doc_name': 'Kat Mülkiyeti Kanunu', 'articles': 'Madde 20', 'page_start': 5, 'page_end': 6}}]
+        Çıktı: "📌 Kaynak: Kat Mülkiyeti Kanunu (Madde 4, Madde 20; s. 2, 5-6)"
 
         Neden: LLM bazen doğru maddeyi bilse de numarayı yanlış yazabilir
         (hallucination). Bu fonksiyon sadece gerçekten chunk'ta geçen
         madde numaralarını kullanır.
         """
-        # Her kaynak dokümanı için bulunan madde numaralarını topla
-        doc_articles = {}  # {'Kat Mülkiyeti Kanunu': {20, 4, 25}, ...}
+        # Her kaynak dokümanı için bulunan madde etiketlerini topla
+        doc_articles = {}  # {'Kat Mülkiyeti Kanunu': {'Madde 20', 'Madde 4'}, ...}
+        doc_pages = {}     # {'Kat Mülkiyeti Kanunu': {2, 5, 6}, ...}
 
         for src in sources:
-            doc_name = src.get("metadata", {}).get("doc_name", "Bilinmiyor")
-            content = src.get("content", "")
+            metadata = src.get("metadata", {}) or {}
+            doc_name = metadata.get("doc_name", "Bilinmiyor")
 
-            # Regex: "Madde 20", "Ek Madde 3", "Geçici Madde 1" gibi kalıpları yakala
-            # Negatif lookbehind ile "Ek Madde" ve "Geçici Madde" ayrı yakalanır
-            patterns = re.findall(r'(?:Ek Madde|Geçici Madde|Madde)\s+(\d+)', content)
+            if "articles" in metadata:
+                # Önceden hesaplanmış: chunk'ın kapsadığı maddeler
+                labels = [a.strip() for a in metadata["articles"].split(",") if a.strip()]
+            else:
+                # Regex: "Madde 20", "Ek Madde 3", "Geçici Madde 1" gibi kalıpları yakala
+                content = src.get("content", "")
+                labels = [f"Madde {n}" for n in re.findall(r'(?:Ek Madde|Geçici Madde|Madde)\s+(\d+)', content)]
 
             if doc_name not in doc_articles:
                 doc_articles[doc_name] = set()
-            # Bulunan numaraları set'e ekle (tekrar önleme)
-            doc_articles[doc_name].update(patterns)
+            # Bulunan etiketleri set'e ekle (tekrar önleme)
+            doc_articles[doc_name].update(labels)
+            if "page_start" in metadata:
+                doc_pages.setdefault(doc_name, set()).update(
+                    range(int(metadata["page_start"]), int(metadata.get("page_end", metadata["page_start"])) + 1)
+                )
 
         # Hiç madde bulunamadıysa boş döndür
         if not doc_articles or all(len(v) == 0 for v in doc_articles.values()):
             return ""
 
-        # Formatla: "📌 Kaynak: KMK (Madde 4, 20) | TBK (Madde 314)"
+        # Sıralama: önce Madde, sonra Ek Madde, sonra Geçici Madde; her grup sayısal sırada
+        def _sort_key(label):
+            article_type, _, number = label.rpartition(" ")
+            type_order = ARTICLE_TYPES.index(article_type) if article_type in ARTICLE_TYPES else 0
+            return (type_order, int(number) if number.isdigit() else 0)
+
+        # Formatla: "📌 Kaynak: KMK (Madde 4, Madde 20) | TBK (Madde 314)"
         parts = []
         for doc_name, articles in doc_articles.items():
             if articles:
-                # Madde numaralarını sayısal sıraya koy
-                sorted_articles = sorted(articles, key=int)
-                madde_str = ", ".join([f"Madde {a}" for a in sorted_articles])
+                madde_str = ", ".join(sorted(articles, key=_sort_key))
+                if doc_name in doc_pages:
+                    madde_str += f"; s. {_format_pages(doc_pages[doc_name])}"
                 parts.append(f"{doc_name} ({madde_str})")
             else:
                 parts.append(doc_name)
@@ -125,8 +236,10 @@ class LegalRAG:
         """
         LLM'e Sunulacak Araçlar (Tools).
         OpenAI Function Calling formatına uygun olarak tanımlanır.
+        Madde indeksi doluysa numarası bilinen maddeyi doğrudan getiren
+        'get_article' aracı da eklenir.
         """
-        return [
+        tools = [
             {
                 "type": "function",
                 "function": {
@@ -143,89 +256,914 @@ class LegalRAG:
             }
             for key, info in config.LEGAL_DOCS.items()
         ]
+        if len(self.article_index):
+            tools.append({
+                "type": "function",
+                "function": {
+                    "name": ARTICLE_TOOL,
+                    "description": "Numarası bilinen bir kanun/yönetmelik maddesinin tam metnini doğrudan getirir. "
+                                   "Soru belirli bir madde numarasına atıf yapıyorsa (örn: 'KMK 20. madde') kullan.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "law": {"type": "string", "enum": list(config.LEGAL_DOCS), "description": "Kaynak anahtarı"},
+                            "number": {"type": "string", "description": "Madde numarası (örn: '20')"},
+                            "article_type": {"type": "string", "enum": list(ARTICLE_TYPES), "description": "Madde türü (varsayılan: Madde)"}
+                        },
+                        "required": ["law", "number"]
+                    }
+                }
+            })
+        return tools
+
+    def _get_article(self, tool_call):
+        """
+        'get_article' aracını çalıştırır: madde indeksinden O(1) erişim.
+        Sonuç, arama sonuçlarıyla aynı formattadır ({'id', 'content', 'metadata'}).
+        """
+        args = json.loads(tool_call.function.arguments)
+        law = args.get("law")
+        article = self.article_index.get(law, args.get("number", ""), args.get("article_type") or "Madde")
+        if not article:
+            return []
+        return [{
+            "id": f"{law}:{article['label']}",
+            "content": article["text"],
+            "metadata": {
+                "source": law,
+                "doc_name": config.LEGAL_DOCS[law]["name"],
+                "articles": article["label"],
+                **{k: article[k] for k in ("page_start", "page_end") if k in article},
+            }
+        }]
+
+    def _embed_question(self, user_query):
+        """
+        Kullanıcı sorusunun vektörü (embedding önbelleği üzerinden).
+        Embedding API'si erişilemezse None döner; önbellek ve yönlendirici atlanır.
+        """
+        try:
+            with metrics.span("embedding"):
+                return self.embedding_cache.get(
+                    user_query, lambda texts: utils.embed_texts(self.client, texts)
+                )
+        except Exception as e:
+            print(f"⚠️ Soru embedding'i alınamadı (önbellek/router atlandı): {e}")
+            return None
+
+    async def _aembed_question(self, user_query):
+        try:
+            with metrics.span("embedding"):
+                vectors = await self.embedding_cache.aget_many(
+                    [user_query], lambda texts: utils.aembed_texts(self.async_client, texts)
+                )
+            return vectors[0]
+        except Exception as e:
+            print(f"⚠️ Soru embedding'i alınamadı (önbellek/router atlandı): {e}")
+            return None
+
+    def _build_messages(self, user_query):
+        """Planlama adımının mesaj listesini hazırlar (Sistem Prompt + Soru)."""
+        return [
+            {"role": "system", "content": self._get_system_prompt()},
+            {"role": "user", "content": user_query}
+        ]
+
+    def _parse_tool_call(self, tool_call):
+        """
+        LLM'in araç çağrısını (doc_key, query) ikilisine çevirir.
+        Fonksiyon isminden hangi kanunun aranacağı anlaşılır (örn: search_kmk -> kmk).
+        'get_article' için query None döner.
+        """
+        args = json.loads(tool_call.function.arguments)
+        if tool_call.function.name == ARTICLE_TOOL:
+            # Madde aracı: arama sorgusu yok, kanun anahtarı argümandan gelir
+            return args.get("law"), None
+        doc_key = tool_call.function.name.replace("search_", "")
+        return doc_key, args.get("query")
+
+    def _routed_tool_calls(self, decision, user_query):
+        """
+        Yönlendirici kararını, LLM'in üreteceği formatta araç çağrılarına çevirir.
+        Ham soru, arama sorgusu olarak kullanılır. Nihai cevap adımı (3. ADIM)
+        mesaj geçmişinde normal bir planlama turu görür.
+        """
+        # LLM cevabındaki tool_call nesneleriyle aynı alanlar (id, function.name, function.arguments)
+        tool_calls = [
+            SimpleNamespace(
+                id=f"route_{key}",
+                function=SimpleNamespace(
+                    name=f"search_{key}",
+                    arguments=json.dumps({"query": user_query}, ensure_ascii=False)
+                )
+            )
+            for key in decision.keys
+        ]
+        msg = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {"id": tc.id, "type": "function",
+                 "function": {"name": tc.function.name, "arguments": tc.function.arguments}}
+                for tc in tool_calls
+            ]
+        }
+        return msg, tool_calls
+
+    def _planning_kwargs(self, messages):
+        return dict(
+            model=config.LLM_MODEL,
+            messages=messages,
+            tools=self._get_openai_tools(),
+            tool_choice="auto",
+            temperature=config.TEMPERATURE
+        )
+
+    def _route(self, question_embedding):
+        """
+        Yönlendirici kararı; sadece 'on' modunda ve emin olunduğunda planlamayı atlatır.
+        Yönlendirici hata verirse (ör. merkez vektörler hesaplanamadı) karar yok sayılır
+        ve planlama LLM ile yapılır.
+        """
+        if not self.router or question_embedding is None:
+            return None, False
+        try:
+            decision = self.router.route(question_embedding)
+        except Exception as e:
+            print(f"⚠️ Yönlendirici karar veremedi, planlama LLM ile yapılacak: {e}")
+            return None, False
+        return decision, decision.confident and config.ROUTER_MODE == "on"
+
+    async def _aroute(self, question_embedding):
+        """
+        _route'un asenkron hali. Merkez vektörler henüz hesaplanmadıysa hesaplama
+        (embedding isteği + koleksiyon okumaları) event loop'u bloklamasın diye thread'de yapılır.
+        """
+        if self.router and not self.router.ready and question_embedding is not None:
+            return await asyncio.to_thread(self._route, question_embedding)
+        return self._route(question_embedding)
+
+    def _record_route(self, decision, tool_calls):
+        if decision:
+            planner_keys = [self._parse_tool_call(tc)[0] for tc in (tool_calls or [])]
+            self.router.record(decision, planner_keys=planner_keys)
+
+    def _plan(self, user_query, messages, question_embedding, speculate=True):
+        """
+        PLANLAMA (Senkron)
+        ------------------
+        Yönlendirici emin ise araç çağrıları yerelde üretilir (LLM çağrısı yok);
+        değilse LLM Function Calling ile hangi kanunun aranacağına karar verir.
+        LLM beklenirken ham soru en olası kanunlarda önceden aranır (spekülatif arama;
+        toplu cevaplamada speculate=False — aramalar koleksiyon başına toplu yapılır).
+
+        Çıktı: (assistant mesajı, araç çağrıları listesi veya None, Speculation veya None)
+        """
+        decision, skip_llm = self._route(question_embedding)
+        if skip_llm:
+            self.router.record(decision, skipped=True)
+            return (*self._routed_tool_calls(decision, user_query), None)
+
+        speculation = None
+        if self.speculator and decision and speculate:
+            speculation = self.speculator.start(user_query, question_embedding, decision)
+        try:
+            with metrics.span("planning"):
+                response = self.client.chat.completions.create(**self._planning_kwargs(messages))
+        except BaseException:
+            # Planlama başarısız (veya istek iptal edildi): ön-aramalar iptal edilir, sayaçlara işlenir
+            if speculation:
+                speculation.finish(0)
+            raise
+        metrics.record_usage("planning", response.usage)
+        msg = response.choices[0].message
+        self._record_route(decision, msg.tool_calls)
+        return msg, msg.tool_calls, speculation
+
+    async def _aplan(self, user_query, messages, question_embedding, speculate=True):
+        """PLANLAMA (Asenkron) — _plan ile aynı mantık, AsyncOpenAI ile."""
+        decision, skip_llm = await self._aroute(question_embedding)
+        if skip_llm:
+            self.router.record(decision, skipped=True)
+            return (*self._routed_tool_calls(decision, user_query), None)
+
+        speculation = None
+        if self.speculator and decision and speculate:
+            speculation = self.speculator.astart(user_query, question_embedding, decision)
+        try:
+            with metrics.span("planning"):
+                response = await self.async_client.chat.completions.create(**self._planning_kwargs(messages))
+        except BaseException:
+            # Planlama başarısız (veya istek iptal edildi): ön-aramalar iptal edilir, sayaçlara işlenir
+            if speculation:
+                speculation.finish(0)
+            raise
+        metrics.record_usage("planning", response.usage)
+        msg = response.choices[0].message
+        self._record_route(decision, msg.tool_calls)
+        return msg, msg.tool_calls, speculation
+
+    def _plan_tool_calls(self, tool_calls):
+        """
+        Araç çağrılarını çalıştırılabilir işlere çevirir.
+
+        Çıktı:
+        - jobs: [(tool_call, rag_tool veya None, query), ...] (LLM'in verdiği sırayla)
+          rag_tool None ise (madde aracı veya bilinmeyen araç) sonuç _direct_result ile üretilir.
+        - queries: Vektörleştirilecek benzersiz sorgular (tek embedding isteği için)
+        """
+        jobs = []
+        queries = []
+        for tool_call in tool_calls:
+            doc_key, query = self._parse_tool_call(tool_call)
+            # 'get_article' arama yapmaz (rag_tool=None), _direct_result ile çözülür
+            rag_tool = None if tool_call.function.name == ARTICLE_TOOL else self.tools_map.get(doc_key)
+            jobs.append((tool_call, rag_tool, query))
+            if rag_tool and query not in queries:
+                queries.append(query)
+        return jobs, queries
+
+    def _direct_result(self, tool_call):
+        """Arama gerektirmeyen araç çağrıları: madde aracı veya tanımsız araç (boş sonuç)."""
+        if tool_call.function.name == ARTICLE_TOOL:
+            return self._get_article(tool_call)
+        return []
+
+    def _search(self, rag_tool, query, embeddings):
+        """Tek bir araç araması: vektör varsa hibrit arama, yoksa sadece sözcük araması."""
+        if embeddings is None:
+            return rag_tool.lexical_retrieve(query)
+        return rag_tool.get_context(query, embeddings[query])
+
+    async def _asearch(self, rag_tool, query, embeddings):
+        if embeddings is None:
+            return rag_tool.lexical_retrieve(query)
+        return await rag_tool.aget_context(query, embeddings[query])
+
+    def _speculative_search(self, speculation, rag_tool, query, embeddings):
+        """Ön-aramanın sonuçları; ön-arama hata verdiyse normal arama."""
+        results = speculation.take(rag_tool)
+        if results is None:
+            return rag_tool.get_context(query, (embeddings or {}).get(query))
+        return results
+
+    async def _aspeculative_search(self, speculation, rag_tool, query, embeddings):
+        results = await speculation.atake(rag_tool)
+        if results is None:
+            return await rag_tool.aget_context(query, (embeddings or {}).get(query))
+        return results
+
+    def _speculative_hits(self, speculation, jobs, embeddings=None, known=frozenset()):
+        """
+        Ön-aramayla karşılanabilecek işlerin indeksleri: önce metin eşleşmesi;
+        sorgu vektörleri verilirse soru vektörüne benzerlik (speculation.Speculation.matches).
+        """
+        if not speculation:
+            return set()
+        return {
+            i for i, (_, rag_tool, query) in enumerate(jobs)
+            if rag_tool and i not in known
+            and speculation.matches(rag_tool, query, embeddings.get(query) if embeddings else None)
+        }
+
+    @staticmethod
+    def _unserved_queries(jobs, hits):
+        """Ön-aramayla karşılanmayan işlerin (vektörleştirilecek) benzersiz sorguları."""
+        return list(dict.fromkeys(
+            query for i, (_, rag_tool, query) in enumerate(jobs) if rag_tool and i not in hits
+        ))
+
+    def _run_tool_calls(self, tool_calls, speculation=None):
+        """
+        PARALEL ARAŞTIRMA (Senkron)
+        ---------------------------
+        1. Bu adımdaki sorgular önce embedding önbelleğinde aranır; eksikler
+           TEK bir embeddings isteğiyle vektörleştirilir.
+        2. Koleksiyon sorguları thread havuzunda aynı anda çalıştırılır.
+        Toplam gecikme, sorguların toplamı yerine en yavaş sorgu kadar olur.
+        3. (Spekülatif arama) Planlama sırasında önceden yapılan aramayla eşleşen
+           çağrılar (aynı kanun + aynı/benzer sorgu) yeniden aranmaz.
+
+        Çıktı: [(tool_call, results), ...] (LLM'in verdiği sırayla)
+        """
+        jobs, queries = self._plan_tool_calls(tool_calls)
+        metrics.record_tool_calls(tool_calls)
+        hits = self._speculative_hits(speculation, jobs)
+        if hits:
+            queries = self._unserved_queries(jobs, hits)
+        try:
+            with metrics.span("embedding"):
+                vectors = self.embedding_cache.get_many(
+                    queries, lambda texts: utils.embed_texts(self.client, texts)
+                )
+            embeddings = dict(zip(queries, vectors))
+        except Exception as e:
+            # Embedding API'si yavaş/erişilemez: araçlar sadece sözcük (BM25) araması yapar
+            print(f"⚠️ Sorgu embedding'i alınamadı, sözcük aramasına geçildi: {e}")
+            embeddings = None
+
+        hits |= self._speculative_hits(speculation, jobs, embeddings, hits)
+
+        # copy_context: thread'lerdeki arama süreleri de isteğin izine yazılır
+        futures = [
+            self.executor.submit(
+                contextvars.copy_context().run,
+                *((self._speculative_search, speculation) if i in hits else (self._search,)),
+                rag_tool, query, embeddings
+            )
+            if rag_tool else None
+            for i, (_, rag_tool, query) in enumerate(jobs)
+        ]
+        tool_results = [
+            (tool_call, future.result() if future else self._direct_result(tool_call))
+            for (tool_call, _, _), future in zip(jobs, futures)
+        ]
+        if speculation:
+            speculation.finish(sum(1 for _, rag_tool, _ in jobs if rag_tool))
+        return tool_results
+
+    async def _arun_tool_calls(self, tool_calls, speculation=None):
+        """
+        PARALEL ARAŞTIRMA (Asenkron)
+        ----------------------------
+        _run_tool_calls ile aynı mantık: önbellek + tek embeddings isteği, ardından
+        tüm koleksiyon sorguları asyncio.gather ile eşzamanlı çalışır.
+        """
+        jobs, queries = self._plan_tool_calls(tool_calls)
+        metrics.record_tool_calls(tool_calls)
+        hits = self._speculative_hits(speculation, jobs)
+        if hits:
+            queries = self._unserved_queries(jobs, hits)
+        try:
+            with metrics.span("embedding"):
+                vectors = await self.embedding_cache.aget_many(
+                    queries, lambda texts: utils.aembed_texts(self.async_client, texts)
+                )
+            embeddings = dict(zip(queries, vectors))
+        except Exception as e:
+            print(f"⚠️ Sorgu embedding'i alınamadı, sözcük aramasına geçildi: {e}")
+            embeddings = None
+
+        hits |= self._speculative_hits(speculation, jobs, embeddings, hits)
+
+        async def _adirect_result(tool_call):
+            return self._direct_result(tool_call)
+
+        all_results = await asyncio.gather(*[
+            (self._aspeculative_search(speculation, rag_tool, query, embeddings) if i in hits
+             else self._asearch(rag_tool, query, embeddings)) if rag_tool else _adirect_result(tool_call)
+            for i, (tool_call, rag_tool, query) in enumerate(jobs)
+        ])
+        if speculation:
+            speculation.finish(sum(1 for _, rag_tool, _ in jobs if rag_tool))
+        return [(tool_call, results) for (tool_call, _, _), results in zip(jobs, all_results)]
+
+    def _tool_messages(self, tool_results):
+        """
+        Arama sonuçlarını LLM'e geri gönderilecek 'tool' mesajlarına çevirir.
+        Bağlam context_packer ile derlenir: tekrarlar ve örtüşen parça metinleri
+        bir kez yazılır, toplam boyut config.CONTEXT_TOKEN_BUDGET ile sınırlanır.
+
+        Çıktı: (mesajlar, bağlama giren kaynaklar)
+        """
+        contents, sources, stats = pack_context(tool_results)
+        metrics.record_context(stats)
+        messages = [
+            {
+                "tool_call_id": tool_call.id,
+                "role": "tool",
+                "name": tool_call.function.name,
+                "content": content
+            }
+            for (tool_call, _), content in zip(tool_results, contents)
+        ]
+        return messages, sources
+
+    def _finalize_answer(self, answer, used_sources):
+        """
+        Kaynak Referansını Koddan Ekle:
+        LLM'in madde numarası uydurmak yerine, chunk'lardan
+        regex ile çekilen gerçek madde numaralarını sona ekle.
+        """
+        ref_header = self._extract_article_refs(used_sources)
+        if ref_header:
+            answer = f"{answer}\n\n{ref_header}"
+        return answer
+
+    def _split_answer(self, answer, used_sources):
+        """
+        _finalize_answer'ın tersi: Önbellekteki son cevabı (metin, kaynak satırı)
+        olarak ayırır. Kaynak satırı aynı kaynaklardan yeniden üretildiği için
+        akış (streaming) isteği önbellekten de 'token' + 'references' olaylarını alır.
+        """
+        ref_header = self._extract_article_refs(used_sources)
+        suffix = f"\n\n{ref_header}"
+        if ref_header and answer.endswith(suffix):
+            return answer[:-len(suffix)], ref_header
+        return answer, None
 
+    @metrics.traced("sync")
     def generate_answer(self, user_query):
         """
         ANA AKIŞ (Main Flow):
         1. Planlama: Soruyu al ve LLM'e gönder. Hangi aracı çağıracağına karar versin.
-        2. Araştırma: Eğer araç çağırdıysa, ilgili kanun içinde arama yap.
+        2. Araştırma: Eğer araç çağırdıysa, ilgili kanunlarda (paralel) arama yap.
         3. Cevaplama: Bulunan bilgileri LLM'e geri gönder ve nihai cevabı ürettir.
         """
-        # Her sorgu için bir MLflow Run başlat (Kullanım takibi için)
-        # Not: Metin dosyaları (artifacts) yoğunluk yaratmaması için loglanmıyor, sadece parametreler takip ediliyor.
-        run_name = user_query[:50] + "..." if len(user_query) > 50 else user_query
-        with mlflow.start_run(run_name=run_name):
-            mlflow.log_params({
-                "llm_model": config.LLM_MODEL,
-                "top_k": config.TOP_K,
-                "embedding_model": config.EMBEDDING_MODEL,
-                "temperature": config.TEMPERATURE
-            })
-            
-            # --- 1. ADIM: Planlama ---
-            messages = [
-                {"role": "system", "content": self._get_system_prompt()},
-                {"role": "user", "content": user_query}
-            ]
-            
-            response = self.client.chat.completions.create(
-                model=config.LLM_MODEL,
-                messages=messages,
-                tools=self._get_openai_tools(),
-                tool_choice="auto",
-                temperature=config.TEMPERATURE
-            )
-            
-            msg = response.choices[0].message
-            tool_calls = msg.tool_calls
-            used_sources = [] # Artık dict listesi olacak
-            
-            # --- 2. ADIM: Araç Kullanımı (Varsa) ---
-            if tool_calls:
-                messages.append(msg)
-                
-                for tool_call in tool_calls:
-                    # Fonksiyon isminden hangi kanunu arayacağını anla (örn: search_kmk -> kmk)
-                    doc_key = tool_call.function.name.replace("search_", "")
-                    query = json.loads(tool_call.function.arguments).get("query")
-                    
-                    rag_tool = self.tools_map.get(doc_key)
-                    context_str = "Bilgi bulunamadı."
-                    
-                    if rag_tool:
-                        results = rag_tool.get_context(query)
-                        if results:
-                            # Context stringini oluştur (LLM için)
-                            context_str = "\n".join([r['content'] for r in results])
-                            
-                            # Ham veriyi sakla (UI ve Eval için)
-                            # Her bir result zaten {'content': ..., 'metadata': ...} formatında
-                            used_sources.extend(results)
-
-                    # Aracı çalıştır ve sonucunu mesaja ekle
-                    messages.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": tool_call.function.name,
-                        "content": context_str
-                    })
-
-                # --- 3. ADIM: Nihai Cevap ---
+        # --- 0. ADIM: Anlamsal Önbellek ---
+        # Benzer bir soru daha önce cevaplandıysa LLM'e hiç gidilmez.
+        # Soru vektörü yönlendirici (router) tarafından da kullanılır.
+        question_embedding = None
+        if self.answer_cache or self.router:
+            question_embedding = self._embed_question(user_query)
+        if self.answer_cache and question_embedding is not None:
+            cached = self.answer_cache.lookup(question_embedding)
+            metrics.record_cache("answer", bool(cached))
+            if cached:
+                return cached
+
+        # --- 1. ADIM: Planlama (Yerel Router veya LLM) ---
+        messages = self._build_messages(user_query)
+        # (Spekülatif arama: LLM beklenirken ham soru en olası kanunlarda önceden aranır)
+        msg, tool_calls, speculation = self._plan(user_query, messages, question_embedding)
+        used_sources = [] # Artık dict listesi olacak
+
+        # --- 2. ADIM: Araç Kullanımı (Varsa) ---
+        if tool_calls:
+            messages.append(msg)
+
+            # Tüm sorgular tek embedding isteği + paralel koleksiyon sorguları
+            # Bağlama giren kaynakları sakla (UI ve Eval için)
+            # Her bir kaynak {'content': ..., 'metadata': ...} formatında
+            tool_messages, used_sources = self._tool_messages(self._run_tool_calls(tool_calls, speculation))
+            # Araçların sonucunu mesaja ekle
+            messages.extend(tool_messages)
+
+            # --- 3. ADIM: Nihai Cevap ---
+            with metrics.span("generation"):
                 final_response = self.client.chat.completions.create(
                     model=config.LLM_MODEL,
                     messages=messages,
                     temperature=config.TEMPERATURE
                 )
-                answer = final_response.choices[0].message.content
-            else:
-                # Araç çağırmadıysa doğrudan cevabı döndür
-                answer = msg.content
+            metrics.record_usage("generation", final_response.usage)
+            answer = final_response.choices[0].message.content
+        else:
+            # Araç çağırmadıysa doğrudan cevabı döndür
+            if speculation:
+                speculation.finish(0)
+            answer = msg.content
+
+        # --- 4. ADIM: Kaynak Referansını Koddan Ekle ---
+        answer = self._finalize_answer(answer, used_sources)
+
+        if self.answer_cache and question_embedding is not None:
+            self.answer_cache.store(question_embedding, answer, used_sources)
+
+        return answer, used_sources
+
+    @metrics.traced("async")
+    async def agenerate_answer(self, user_query):
+        """
+        ANA AKIŞIN ASENKRON HALİ (FastAPI /ask için)
+        --------------------------------------------
+        generate_answer ile aynı adımları izler; ancak OpenAI çağrıları
+        AsyncOpenAI ile, ChromaDB sorguları ise LegalRAGTool.aget_context ile
+        yapılır. Böylece bir istek LLM'i beklerken sunucu diğer istekleri
+        işlemeye devam eder.
+
+        Aynı soru (normalize edilmiş metin + ayarlar) o anda zaten cevaplanıyorsa
+        yeni bir akış başlatılmaz; devam eden akışın sonucu beklenir (single-flight).
+        """
+        if self.single_flight:
+            return await self.single_flight.run(
+                question_key(user_query), lambda: self._agenerate_answer(user_query)
+            )
+        return await self._agenerate_answer(user_query)
+
+    async def _agenerate_answer(self, user_query):
+        """agenerate_answer'ın gövdesi (tek bir akış)."""
+        # --- 0. ADIM: Anlamsal Önbellek ---
+        question_embedding = None
+        if self.answer_cache or self.router:
+            question_embedding = await self._aembed_question(user_query)
+        if self.answer_cache and question_embedding is not None:
+            cached = self.answer_cache.lookup(question_embedding)
+            metrics.record_cache("answer", bool(cached))
+            if cached:
+                return cached
+
+        # --- 1. ADIM: Planlama (Yerel Router veya LLM) ---
+        messages = self._build_messages(user_query)
+        msg, tool_calls, speculation = await self._aplan(user_query, messages, question_embedding)
+        used_sources = []
+
+        # --- 2. ADIM: Araç Kullanımı (Varsa) ---
+        if tool_calls:
+            messages.append(msg)
+
+            tool_messages, used_sources = self._tool_messages(await self._arun_tool_calls(tool_calls, speculation))
+            messages.extend(tool_messages)
+
+            # --- 3. ADIM: Nihai Cevap ---
+            with metrics.span("generation"):
+                final_response = await self.async_client.chat.completions.create(
+                    model=config.LLM_MODEL,
+                    messages=messages,
+                    temperature=config.TEMPERATURE
+                )
+            metrics.record_usage("generation", final_response.usage)
+            answer = final_response.choices[0].message.content
+        else:
+            if speculation:
+                speculation.finish(0)
+            answer = msg.content
+
+        # --- 4. ADIM: Kaynak Referansını Koddan Ekle ---
+        answer = self._finalize_answer(answer, used_sources)
+
+        if self.answer_cache and question_embedding is not None:
+            self.answer_cache.store(question_embedding, answer, used_sources)
+
+        return answer, used_sources
+
+    @metrics.traced("stream")
+    async def astream_answer(self, user_query):
+        """
+        AKIŞ (STREAMING) CEVAP — FastAPI /ask/stream için
+        --------------------------------------------------
+        agenerate_answer ile aynı adımlar; ancak sonuç tek parça yerine olaylar
+        (event) halinde üretilir. Kullanıcı, planlama biter bitmez hangi
+        kanunların tarandığını, ardından cevabı kelime kelime görür.
+
+        Üretilen olaylar (event, data):
+        - ("routing", {"tools": [{"tool": "search_kmk", "query": "..."}], "cached": False})
+        - ("sources", [{'content': ..., 'metadata': ...}, ...])
+        - ("token", {"text": "..."})         (birden çok kez)
+        - ("references", {"text": "📌 Kaynak: ..."})  (madde bulunduysa)
+        - ("done", {})
+        """
+        # --- 0. ADIM: Anlamsal Önbellek ---
+        question_embedding = None
+        if self.answer_cache or self.router:
+            question_embedding = await self._aembed_question(user_query)
+        if self.answer_cache and question_embedding is not None:
+            cached = self.answer_cache.lookup(question_embedding)
+            metrics.record_cache("answer", bool(cached))
+            if cached:
+                answer, ref_header = self._split_answer(*cached)
+                yield "routing", {"tools": [], "cached": True}
+                yield "sources", cached[1]
+                # Kayıtlı cevap kaynak satırını içerir; canlı akışla aynı olaylara ayrılır
+                yield "token", {"text": answer}
+                if ref_header:
+                    yield "references", {"text": ref_header}
+                yield "done", {}
+                return
+
+        # --- 1. ADIM: Planlama (Yerel Router veya LLM) ---
+        messages = self._build_messages(user_query)
+        msg, tool_calls, speculation = await self._aplan(user_query, messages, question_embedding)
+        used_sources = []
+
+        yield "routing", {
+            "tools": [
+                {"tool": tc.function.name, "query": self._parse_tool_call(tc)[1]}
+                for tc in (tool_calls or [])
+            ],
+            "cached": False
+        }
+
+        # --- 2. ADIM: Araç Kullanımı (Varsa) ---
+        if tool_calls:
+            messages.append(msg)
+
+            tool_messages, used_sources = self._tool_messages(await self._arun_tool_calls(tool_calls, speculation))
+            messages.extend(tool_messages)
+
+            yield "sources", used_sources
+
+            # --- 3. ADIM: Nihai Cevap (Token token akış) ---
+            generation_started = time.perf_counter()
+            stream = await self.async_client.chat.completions.create(
+                model=config.LLM_MODEL,
+                messages=messages,
+                temperature=config.TEMPERATURE,
+                stream=True,
+                # Son parça token kullanımını taşır (metrics)
+                stream_options={"include_usage": True}
+            )
+            parts = []
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    metrics.record_usage("generation", chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield "token", {"text": delta}
+            answer = "".join(parts)
+            metrics.observe_stage("generation", time.perf_counter() - generation_started)
+        else:
+            if speculation:
+                speculation.finish(0)
+            yield "sources", used_sources
+            answer = msg.content or ""
+            yield "token", {"text": answer}
+
+        # --- 4. ADIM: Kaynak Referansı ---
+        ref_header = self._extract_article_refs(used_sources)
+        if ref_header:
+            yield "references", {"text": ref_header}
+
+        if self.answer_cache and question_embedding is not None:
+            self.answer_cache.store(
+                question_embedding, self._finalize_answer(answer, used_sources), used_sources
+            )
+
+        yield "done", {}
+
+    # ==========================================================================
+    # TOPLU CEVAPLAMA (POST /ask/batch)
+    # ==========================================================================
+    def _batch_items(self, questions):
+        """
+        Soruları tekilleştirir (büyük/küçük harf ve boşluk farkları yok sayılır).
+
+        Çıktı: (benzersiz sorular için iş kayıtları, her girdinin kayıt indeksi)
+        Kayıt: {"question", "embedding", "messages", "msg", "tool_calls", "jobs",
+                "tool_results", "answer", "sources", "error"}
+        """
+        items, positions, index = [], {}, []
+        for question in questions:
+            key = " ".join(question.casefold().split())
+            if key not in positions:
+                positions[key] = len(items)
+                items.append({
+                    "question": question, "embedding": None, "messages": None, "msg": None,
+                    "tool_calls": None, "jobs": [], "tool_results": None,
+                    "answer": None, "sources": [], "error": None if key else "Soru boş olamaz.",
+                })
+            index.append(positions[key])
+        return items, index
+
+    @staticmethod
+    def _batch_pending(items):
+        """Henüz cevaplanmamış ve hata almamış kayıtlar."""
+        return [item for item in items if item["error"] is None and item["answer"] is None]
+
+    def _batch_cached(self, items, vectors):
+        """Soru vektörlerini kayıtlara yazar; anlamsal önbellekte cevabı olan soruları tamamlar."""
+        for item, vector in zip(self._batch_pending(items), vectors):
+            item["embedding"] = vector
+        if not self.answer_cache:
+            return
+        lookups = [item for item in self._batch_pending(items) if item["embedding"] is not None]
+        hits = 0
+        for item in lookups:
+            cached = self.answer_cache.lookup(item["embedding"])
+            if cached:
+                item["answer"], item["sources"] = cached
+                hits += 1
+        metrics.record_cache("answer", True, hits)
+        metrics.record_cache("answer", False, len(lookups) - hits)
+
+    def _batch_jobs(self, items):
+        """
+        Planlanan araç çağrılarını işlere çevirir.
+        Çıktı: Vektörleştirilecek benzersiz arama sorguları (tüm sorular için tek istek).
+        """
+        queries = []
+        for item in self._batch_pending(items):
+            if not item["tool_calls"]:
+                continue
+            try:
+                item["jobs"], item_queries = self._plan_tool_calls(item["tool_calls"])
+            except Exception as e:
+                item["error"] = f"İşlem hatası: {e}"
+                continue
+            metrics.record_tool_calls(item["tool_calls"])
+            queries.extend(q for q in item_queries if q not in queries)
+        return queries
+
+    def _batch_search(self, items, embeddings):
+        """
+        Tüm soruların arama çağrılarını koleksiyon başına TEK sorguyla çalıştırır
+        (LegalRAGTool.retrieve_many); koleksiyonlar thread havuzunda paralel aranır.
+
+        embeddings: {sorgu: vektör} veya None (embedding alınamadıysa sözcük araması).
+        Her kaydın 'tool_results' alanı doldurulur; kullandığı koleksiyon hata
+        verdiyse kayda 'error' yazılır (diğer sorular etkilenmez).
+        """
+        pending = [item for item in self._batch_pending(items) if item["tool_calls"]]
+        groups = {}  # {rag_tool: [sorgu, ...]}
+        for item in pending:
+            for _, rag_tool, query in item["jobs"]:
+                if rag_tool and query not in groups.setdefault(rag_tool, []):
+                    groups[rag_tool].append(query)
+
+        def search(rag_tool, queries):
+            if embeddings is None:
+                return [rag_tool.lexical_retrieve(query) for query in queries]
+            return rag_tool.retrieve_many(queries, [embeddings[query] for query in queries])
+
+        futures = {
+            rag_tool: self.executor.submit(contextvars.copy_context().run, search, rag_tool, queries)
+            for rag_tool, queries in groups.items()
+        }
+        found, failed = {}, {}
+        for rag_tool, future in futures.items():
+            try:
+                found[rag_tool] = dict(zip(groups[rag_tool], future.result()))
+            except Exception as e:
+                print(f"⚠️ Toplu arama başarısız ({rag_tool.collection_name}): {e}")
+                failed[rag_tool] = e
+
+        for item in pending:
+            try:
+                errors = [failed[rag_tool] for _, rag_tool, _ in item["jobs"] if rag_tool in failed]
+                if errors:
+                    raise errors[0]
+                item["tool_results"] = [
+                    (tool_call, found[rag_tool][query] if rag_tool else self._direct_result(tool_call))
+                    for tool_call, rag_tool, query in item["jobs"]
+                ]
+            except Exception as e:
+                item["error"] = f"İşlem hatası: {e}"
+
+    def _batch_generation_messages(self, item):
+        """Nihai cevap çağrısının mesajları; kaynaklar kayda yazılır."""
+        tool_messages, item["sources"] = self._tool_messages(item["tool_results"])
+        return item["messages"] + [item["msg"]] + tool_messages
+
+    def _batch_complete(self, item, answer):
+        """Kaynak satırını ekler ve cevabı önbelleğe yazar."""
+        item["answer"] = self._finalize_answer(answer or "", item["sources"])
+        if self.answer_cache and item["embedding"] is not None:
+            self.answer_cache.store(item["embedding"], item["answer"], item["sources"])
+
+    def _batch_results(self, items, index):
+        """Giriş sırasıyla sonuçlar: {"answer", "sources"} veya {"error"}."""
+        errors = sum(1 for item in items if item["error"])
+        print(f"📦 Toplu cevaplama: {len(index)} soru, {len(items)} benzersiz, {errors} hata")
+        return [
+            {"error": items[i]["error"]} if items[i]["error"]
+            else {"answer": items[i]["answer"], "sources": items[i]["sources"]}
+            for i in index
+        ]
+
+    def _batch_plan(self, item):
+        item["messages"] = self._build_messages(item["question"])
+        item["msg"], item["tool_calls"], _ = self._plan(
+            item["question"], item["messages"], item["embedding"], speculate=False
+        )
+        if not item["tool_calls"]:
+            self._batch_complete(item, item["msg"].content)
+
+    def _batch_generate(self, item):
+        messages = self._batch_generation_messages(item)
+        with metrics.span("generation"):
+            response = self.client.chat.completions.create(
+                model=config.LLM_MODEL, messages=messages, temperature=config.TEMPERATURE
+            )
+        metrics.record_usage("generation", response.usage)
+        self._batch_complete(item, response.choices[0].message.content)
+
+    async def _abatch_plan(self, item):
+        item["messages"] = self._build_messages(item["question"])
+        item["msg"], item["tool_calls"], _ = await self._aplan(
+            item["question"], item["messages"], item["embedding"], speculate=False
+        )
+        if not item["tool_calls"]:
+            self._batch_complete(item, item["msg"].content)
+
+    async def _abatch_generate(self, item):
+        messages = self._batch_generation_messages(item)
+        with metrics.span("generation"):
+            response = await self.async_client.chat.completions.create(
+                model=config.LLM_MODEL, messages=messages, temperature=config.TEMPERATURE
+            )
+        metrics.record_usage("generation", response.usage)
+        self._batch_complete(item, response.choices[0].message.content)
+
+    def _batch_map(self, pool, fn, items):
+        """fn'i kayıtlar üzerinde thread havuzunda çalıştırır; hata veren kayda 'error' yazılır."""
+        def guarded(item):
+            try:
+                fn(item)
+            except Exception as e:
+                item["error"] = f"İşlem hatası: {e}"
+        # copy_context: thread'lerdeki süre ve token ölçümleri de isteğin izine yazılır
+        for future in [pool.submit(contextvars.copy_context().run, guarded, item) for item in items]:
+            future.result()
+
+    async def _abatch_map(self, semaphore, fn, items):
+        """fn'i kayıtlar üzerinde (en fazla BATCH_CONCURRENCY eşzamanlı) çalıştırır; hata veren kayda 'error' yazılır."""
+        async def guarded(item):
+            try:
+                async with semaphore:
+                    await fn(item)
+            except Exception as e:
+                item["error"] = f"İşlem hatası: {e}"
+        await asyncio.gather(*(guarded(item) for item in items))
+
+    @metrics.traced("batch")
+    def generate_answers(self, questions):
+        """
+        TOPLU CEVAPLAMA (Senkron)
+        -------------------------
+        Bir soru listesini tek bir iş olarak cevaplar (tek istek izi / MLflow run'ı):
+        1. Tekilleştirme: Aynı sorular (büyük/küçük harf, boşluk farkı) bir kez cevaplanır.
+        2. Soru vektörleri TEK embeddings isteğiyle alınır (önbellek + yönlendirici).
+        3. Planlama: Soru başına LLM çağrısı, en fazla config.BATCH_CONCURRENCY eşzamanlı.
+        4. Araştırma: Tüm arama sorguları TEK embeddings isteğiyle vektörleştirilir;
+           her koleksiyona TEK sorgu atılır (LegalRAGTool.retrieve_many).
+        5. Nihai cevaplar: en fazla config.BATCH_CONCURRENCY eşzamanlı LLM çağrısı.
+
+        Çıktı: Giriş sırasıyla [{"answer", "sources"} veya {"error": "..."}]
+        Bir sorunun hatası diğerlerini etkilemez.
+        """
+        items, index = self._batch_items(questions)
+
+        # --- 1-2. ADIM: Soru vektörleri ve Anlamsal Önbellek ---
+        pending = self._batch_pending(items)
+        vectors = [None] * len(pending)
+        if pending and (self.answer_cache or self.router):
+            try:
+                with metrics.span("embedding"):
+                    vectors = self.embedding_cache.get_many(
+                        [item["question"] for item in pending], lambda texts: utils.embed_texts(self.client, texts)
+                    )
+            except Exception as e:
+                print(f"⚠️ Soru embedding'leri alınamadı (önbellek/router atlandı): {e}")
+        self._batch_cached(items, vectors)
+
+        with ThreadPoolExecutor(max_workers=config.BATCH_CONCURRENCY) as pool:
+            # --- 3. ADIM: Planlama ---
+            self._batch_map(pool, self._batch_plan, self._batch_pending(items))
+
+            # --- 4. ADIM: Toplu Araştırma ---
+            queries = self._batch_jobs(items)
+            embeddings = None
+            try:
+                with metrics.span("embedding"):
+                    vectors = self.embedding_cache.get_many(
+                        queries, lambda texts: utils.embed_texts(self.client, texts)
+                    )
+                embeddings = dict(zip(queries, vectors))
+            except Exception as e:
+                print(f"⚠️ Sorgu embedding'leri alınamadı, sözcük aramasına geçildi: {e}")
+            self._batch_search(items, embeddings)
+
+            # --- 5. ADIM: Nihai Cevaplar ---
+            self._batch_map(pool, self._batch_generate, self._batch_pending(items))
+
+        return self._batch_results(items, index)
+
+    @metrics.traced("batch")
+    async def agenerate_answers(self, questions):
+        """
+        TOPLU CEVAPLAMANIN ASENKRON HALİ (FastAPI /ask/batch için)
+        ----------------------------------------------------------
+        generate_answers ile aynı adımlar; LLM çağrıları AsyncOpenAI ile
+        (asyncio.Semaphore ile en fazla config.BATCH_CONCURRENCY eşzamanlı),
+        koleksiyon sorguları thread'de yapılır.
+        """
+        items, index = self._batch_items(questions)
+        semaphore = asyncio.Semaphore(config.BATCH_CONCURRENCY)
+
+        # --- 1-2. ADIM: Soru vektörleri ve Anlamsal Önbellek ---
+        pending = self._batch_pending(items)
+        vectors = [None] * len(pending)
+        if pending and (self.answer_cache or self.router):
+            try:
+                with metrics.span("embedding"):
+                    vectors = await self.embedding_cache.aget_many(
+                        [item["question"] for item in pending],
+                        lambda texts: utils.aembed_texts(self.async_client, texts)
+                    )
+            except Exception as e:
+                print(f"⚠️ Soru embedding'leri alınamadı (önbellek/router atlandı): {e}")
+        self._batch_cached(items, vectors)
+
+        # --- 3. ADIM: Planlama ---
+        await self._abatch_map(semaphore, self._abatch_plan, self._batch_pending(items))
+
+        # --- 4. ADIM: Toplu Araştırma ---
+        queries = self._batch_jobs(items)
+        embeddings = None
+        try:
+            with metrics.span("embedding"):
+                vectors = await self.embedding_cache.aget_many(
+                    queries, lambda texts: utils.aembed_texts(self.async_client, texts)
+                )
+            embeddings = dict(zip(queries, vectors))
+        except Exception as e:
+            print(f"⚠️ Sorgu embedding'leri alınamadı, sözcük aramasına geçildi: {e}")
+        await asyncio.to_thread(self._batch_search, items, embeddings)
 
-            # --- 4. ADIM: Kaynak Referansını Koddan Ekle ---
-            # LLM'in madde numarası uydurmak yerine, chunk'lardan
-            # regex ile çekilen gerçek madde numaralarını sona ekle.
-            ref_header = self._extract_article_refs(used_sources)
-            if ref_header:
-                answer = f"{answer}\n\n{ref_header}"
+        # --- 5. ADIM: Nihai Cevaplar ---
+        await self._abatch_map(semaphore, self._abatch_generate, self._batch_pending(items))
 
-            return answer, used_sources
+        return self._batch_results(items, index)
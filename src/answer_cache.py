@@ -0,0 +1,206 @@
+"""
+answer_cache.py — Anlamsal Cevap Önbelleği (Semantic Cache)
+===========================================================
+Trafiğin büyük kısmı aynı birkaç sorunun farklı ifadeleridir
+("Aidat ödemezsem ne olur?", "aidatı ödemeyen komşuya ne yapılır?").
+Soru embedding'i daha önce cevaplanmış bir soruya yeterince yakınsa
+(kosinüs benzerliği >= eşik) kayıtlı (answer, sources) LLM'e gidilmeden döner.
+
+Geçersiz kılma (Invalidation):
+- Kayıtlar TTL süresi dolunca silinir, kapasite aşılınca en eski kullanılan atılır.
+- Önbellek süreç içindedir; ayarlar süreç başında okunduğundan ayar değişikliği
+  yeniden başlatma gerektirir ve önbellek zaten boş başlar. config_fingerprint()
+  süreçler arası anahtarlar içindir (değerlendirme checkpoint'i, single-flight).
+- ingestion.sync_collection koleksiyona yazdığında koleksiyonun kendi metadata'sına
+  yeni bir sürüm ('ingest_version') yazar (mark_ingested). Sürüm veriyle birlikte
+  durduğu için ingestion başka bir makinede (ör. geliştirici bilgisayarından Cloud'daki
+  ChromaDB'ye) çalışsa da sunucular değişikliği görür. Önbellek sürümleri en fazla
+  ANSWER_CACHE_VERSION_CHECK_INTERVAL saniyede bir okur (version_fn); sürüm
+  değiştiyse tüm kayıtlar silinir.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from src import config
+
+
+# Cevabı (veya LLM'e giden bağlamı) etkileyen ayarlar.
+# Bilerek dışarıda bırakılanlar: SPECULATIVE_* (ön-arama sonucu ancak planlayıcının
+# sorgusuyla eşleşirse kullanılır, sonuç aynıdır), VECTOR_BACKEND (iki backend aynı
+# vektörleri tutar), önbellek / eşzamanlılık / zaman aşımı ayarları (sadece hız).
+FINGERPRINT_SETTINGS = (
+    "LLM_MODEL", "TEMPERATURE", "EMBEDDING_MODEL",
+    "CHUNK_SIZE", "CHUNK_OVERLAP", "TOP_K", "CONTEXT_TOKEN_BUDGET",
+    "ADAPTIVE_TOP_K", "RETRIEVAL_MIN_SCORE", "RETRIEVAL_SCORE_GAP",
+    "MMR_ENABLED", "MMR_CANDIDATES", "MMR_LAMBDA",
+    "HYBRID_SEARCH", "HYBRID_CANDIDATES", "RRF_K",
+    "ROUTER_MODE", "ROUTER_MIN_SCORE", "ROUTER_MARGIN", "ROUTER_GROUP_WIDTH", "ROUTER_MAX_TOOLS",
+)
+
+
+def config_fingerprint():
+    """
+    Cevabı etkileyen ayarların anlık görüntüsü: ((ayar, değer), ...).
+    Hash'lenebilir (single-flight anahtarı) ve JSON'a yazılabilir (checkpoint anahtarı).
+    """
+    return tuple((name, getattr(config, name)) for name in FINGERPRINT_SETTINGS)
+
+
+INGEST_VERSION_KEY = "ingest_version"  # Koleksiyon metadata'sındaki sürüm alanı
+
+
+def mark_ingested(collection):
+    """
+    Koleksiyonun metadata'sına yeni bir ingestion sürümü yazar.
+    ingestion.sync_collection tarafından (yazım yapıldıysa) çağrılır; çalışan
+    sunucular bir sonraki sürüm kontrolünde önbelleklerini boşaltır.
+    """
+    # ChromaDB, 'hnsw:*' ayarlarının modify ile gönderilmesine izin vermez
+    metadata = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")}
+    metadata[INGEST_VERSION_KEY] = time.time()
+    collection.modify(metadata=metadata)
+
+
+def ingest_version(collection):
+    """Koleksiyonun ingestion sürümü (hiç yazılmadıysa None)."""
+    return (collection.metadata or {}).get(INGEST_VERSION_KEY)
+
+
+class SemanticAnswerCache:
+    """
+    ANLAMSAL CEVAP ÖNBELLEĞİ
+    ------------------------
+    Kayıtlar normalize edilmiş soru vektörleriyle tutulur; arama, tüm kayıtlara
+    karşı tek bir NumPy matris çarpımıdır (kapasite küçük olduğundan yeterince hızlı).
+    """
+
+    def __init__(self, threshold=None, ttl=None, max_items=None, version_fn=None, version_check_interval=None):
+        """
+        Girdi:
+        - threshold: Eşleşme için gereken en düşük kosinüs benzerliği
+        - ttl: Bir kaydın geçerli kalacağı süre (saniye)
+        - max_items: En fazla kayıt sayısı (aşılınca en eski kullanılan atılır)
+        - version_fn: Verinin güncel sürümünü döndüren fonksiyon (ör. koleksiyonların
+          ingest_version'ları). Sonucu değişince önbellek boşaltılır. None ise sadece TTL.
+        - version_check_interval: version_fn'in en fazla hangi sıklıkta çağrılacağı (saniye)
+        """
+        self.threshold = threshold if threshold is not None else config.ANSWER_CACHE_THRESHOLD
+        self.ttl = ttl if ttl is not None else config.ANSWER_CACHE_TTL
+        self.max_items = max_items or config.ANSWER_CACHE_SIZE
+        self.version_fn = version_fn
+        self.version_check_interval = (
+            config.ANSWER_CACHE_VERSION_CHECK_INTERVAL if version_check_interval is None else version_check_interval
+        )
+
+        self._entries = OrderedDict()  # id -> {"vector", "answer", "sources", "created_at"}
+        self._next_id = 0
+        self._matrix = None            # Kayıt vektörlerinden oluşan (n, d) matris
+        self._matrix_ids = []
+        self._lock = threading.Lock()
+        self._ingest_version = None
+        self._version_checked_at = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_validity(self):
+        """
+        Veri sürümü değiştiyse (koleksiyon yeniden yüklendi) tüm kayıtları sil.
+        Sürüm en fazla version_check_interval saniyede bir okunur; okunamazsa
+        (veritabanı geçici olarak erişilemez) eski sürümle devam edilir.
+        """
+        if self.version_fn is None:
+            return
+        now = time.monotonic()
+        if self._version_checked_at is not None and now - self._version_checked_at < self.version_check_interval:
+            return
+        self._version_checked_at = now
+        try:
+            ingest_version = self.version_fn()
+        except Exception as e:
+            print(f"⚠️ Önbellek sürüm kontrolü başarısız, kayıtlar korunuyor: {e}")
+            return
+        if ingest_version != self._ingest_version:
+            self._ingest_version = ingest_version
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+
+    def _evict_expired(self, now):
+        expired = [i for i, e in self._entries.items() if now - e["created_at"] > self.ttl]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            self._matrix = None
+
+    def _ensure_matrix(self):
+        if self._matrix is None and self._entries:
+            self._matrix_ids = list(self._entries.keys())
+            self._matrix = np.stack([self._entries[i]["vector"] for i in self._matrix_ids])
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding):
+        """
+        En benzer kayıt eşiği geçiyorsa (answer, sources) döndürür, yoksa None.
+        """
+        with self._lock:
+            self._check_validity()
+            self._evict_expired(time.time())
+            self._ensure_matrix()
+
+            if self._matrix is None:
+                self.misses += 1
+                return None
+
+            scores = self._matrix @ self._normalize(embedding)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry_id = self._matrix_ids[best]
+            self._entries.move_to_end(entry_id)  # LRU: son kullanılan sona
+            self.hits += 1
+            entry = self._entries[entry_id]
+            return entry["answer"], entry["sources"]
+
+    def store(self, embedding, answer, sources):
+        """Yeni bir (soru vektörü -> cevap) kaydı ekler."""
+        with self._lock:
+            self._check_validity()
+            self._entries[self._next_id] = {
+                "vector": self._normalize(embedding),
+                "answer": answer,
+                "sources": sources,
+                "created_at": time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        """Önbelleği elle boşaltır."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+                "items": len(self._entries),
+            }
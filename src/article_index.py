@@ -0,0 +1,135 @@
+"""
+article_index.py — Madde Düzeyinde Yapısal İndeks
+==================================================
+Kanun metni ingestion sırasında maddelerine ayrıştırılır:
+(kanun, Kısım/Bölüm, madde türü [Madde / Ek Madde / Geçici Madde], numara, metin).
+
+Kullanım alanları:
+- "KMK Madde 20" gibi numarası bilinen bir maddeyi embedding veya vektör araması
+  olmadan O(1) sözlük erişimiyle getirmek (ajanın 'get_article' aracı).
+- Her chunk'ın kapsadığı maddeleri metadata'ya yazmak; cevabın altındaki
+  "📌 Kaynak" satırı her istekte regex taraması yerine bu bilgiden üretilir.
+
+Disk formatı: config.ARTICLE_INDEX_PATH (JSON) — {kanun: [madde, ...]}
+"""
+
+import json
+import os
+import re
+
+ARTICLE_TYPES = ("Madde", "Ek Madde", "Geçici Madde")
+
+# Madde başlığı: satır başında tür + numara + tire ("Madde 20 –", "MADDE\t 69-", "Ek Madde 1 –")
+# Tire şartı, metin içindeki atıfları ("Madde 20 hükmü uyarınca") başlık sanmamak içindir.
+_HEADING = re.compile(
+    r"(?m)^[ \t]*(Ek[ \t]+Madde|EK[ \t]+MADDE|Geçici[ \t]+Madde|GEÇİCİ[ \t]+MADDE|Madde|MADDE)"
+    r"[ \t]*(\d+)[ \t]*[-–—]"
+)
+# Kısım / Bölüm başlıkları ("BİRİNCİ KISIM", "İkinci Bölüm", "BÖLÜM 3")
+_PART = re.compile(r"(?m)^[ \t]*((?:\S+[ \t]+)?(?:KISIM|Kısım))\b[^\n]*$")
+_SECTION = re.compile(r"(?m)^[ \t]*((?:\S+[ \t]+)?(?:BÖLÜM|Bölüm))\b[^\n]*$")
+
+
+def normalize_type(raw):
+    """'EK  MADDE' -> 'Ek Madde', 'GEÇİCİ MADDE' -> 'Geçici Madde', 'MADDE' -> 'Madde'."""
+    raw = " ".join(raw.split()).lower()
+    if raw.startswith("ek"):
+        return "Ek Madde"
+    if raw.startswith("geçici") or raw.startswith("geçi̇ci"):
+        return "Geçici Madde"
+    return "Madde"
+
+
+def article_label(article_type, number):
+    return f"{article_type} {number}"
+
+
+def _last_heading_before(matches, position):
+    heading = ""
+    for match in matches:
+        if match.start() > position:
+            break
+        heading = " ".join(match.group(0).split())
+    return heading
+
+
+def parse_articles(law_key, text):
+    """
+    Metni maddelere ayrıştırır.
+
+    Çıktı: [{"law", "type", "number", "label", "part", "section", "start", "end", "text"}, ...]
+    (start/end: madde metninin ham metindeki karakter aralığı)
+    """
+    headings = list(_HEADING.finditer(text))
+    parts = list(_PART.finditer(text))
+    sections = list(_SECTION.finditer(text))
+
+    articles = []
+    for i, match in enumerate(headings):
+        start = match.start()
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        article_type = normalize_type(match.group(1))
+        number = match.group(2)
+        articles.append({
+            "law": law_key,
+            "type": article_type,
+            "number": number,
+            "label": article_label(article_type, number),
+            "part": _last_heading_before(parts, start),
+            "section": _last_heading_before(sections, start),
+            "start": start,
+            "end": end,
+            "text": text[start:end].strip(),
+        })
+    return articles
+
+
+def articles_in_span(articles, start, end):
+    """[start, end) aralığıyla kesişen maddelerin etiketleri (metin sırasıyla, tekrarsız)."""
+    labels = []
+    for article in articles:
+        if article["start"] < end and article["end"] > start and article["label"] not in labels:
+            labels.append(article["label"])
+    return labels
+
+
+class ArticleIndex:
+    """
+    MADDE İNDEKSİ
+    -------------
+    Anahtar: (kanun, tür, numara) -> madde. Erişim tek bir sözlük aramasıdır.
+    """
+
+    def __init__(self, articles_by_law=None):
+        self.articles_by_law = articles_by_law or {}
+        self._lookup = {}
+        for law, articles in self.articles_by_law.items():
+            for article in articles:
+                # Aynı numara birden çok kez geçerse (mükerrer başlık) ilk geçen esas alınır
+                self._lookup.setdefault((law, article["type"], str(article["number"])), article)
+
+    def __len__(self):
+        return len(self._lookup)
+
+    def get(self, law, number, article_type="Madde"):
+        """Maddeyi döndürür, bulunamazsa None."""
+        return self._lookup.get((law, normalize_type(article_type), str(number).strip()))
+
+    def set_law(self, law, articles):
+        """Bir kanunun maddelerini (yeniden) yazar."""
+        stored = [{k: v for k, v in a.items() if k not in ("start", "end")} for a in articles]
+        self.__init__({**self.articles_by_law, law: stored})
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.articles_by_law, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
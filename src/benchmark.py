@@ -0,0 +1,460 @@
+"""
+benchmark.py — Uçtan Uca Gecikme Benchmark'ı (Ağsız, Yerel Sahte Servislerle)
+============================================================================
+LegalRAG (agenerate_answer) ve FastAPI uygulamasını (POST /ask) canlı OpenAI ve
+ChromaDB olmadan, deterministik yerel sahte servislerle ölçer:
+
+- StubOpenAIServer: localhost'ta çalışan sahte OpenAI HTTP sunucusu
+  (/v1/chat/completions + /v1/embeddings). Gecikmeler ve planlama adımında kaç
+  araç çağrılacağı ayarlanabilir. Gerçek OpenAI istemcileri OPENAI_BASE_URL ile
+  bu sunucuya yönlendirilir; HTTP katmanı da ölçüme dahildir.
+- HashingEmbeddingFunction: Kelime özetlerinden (blake2b) deterministik vektör.
+- chromadb.EphemeralClient: Bellek içi koleksiyonlar; gerçek PDF'lerden
+  ingestion ile aynı parçalarla doldurulur.
+
+Her eşzamanlılık seviyesi için aşama bazlı (planning, embedding, retrieval,
+generation, total) p50/p95/p99 ve saniyedeki istek sayısı raporlanır.
+
+Yönlendirici ve spekülatif arama ortam değişkenlerinden okunmaz, açıkça sabitlenir
+(--router-mode, --speculative) ve raporda yazdırılır; sonuçlar karşılaştırılabilir kalır.
+
+Kullanım: python -m src.benchmark [--levels 1 4 16] [--requests 48] [--chat-latency 0.3]
+                                  [--router-mode shadow] [--speculative]
+          (veya: make benchmark)
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Benchmark hiçbir gerçek servise bağlanmaz; config yüklenmeden önce ayarlanır
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import numpy as np
+from src import config, utils
+
+EMBEDDING_DIM = 256
+
+
+# ==============================================================================
+# 1. SAHTE SERVİSLER
+# ==============================================================================
+def hash_embedding(text, dim=EMBEDDING_DIM):
+    """Kelime özetlerinden birim uzunlukta vektör (aynı metin -> aynı vektör)."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in text.lower().split():
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else np.full(dim, 1 / np.sqrt(dim), dtype=np.float32)
+
+
+class HashingEmbeddingFunction:
+    """ChromaDB uyumlu embedding fonksiyonu (ağ isteği yok)."""
+    def __call__(self, input):
+        return [hash_embedding(text) for text in input]
+
+    def embed_query(self, input):
+        return self(input)
+
+    def name(self):
+        return "hashing"
+
+    def is_legacy(self):
+        return False
+
+    def get_config(self):
+        return {"dim": EMBEDDING_DIM}
+
+
+class StubOpenAIServer:
+    """
+    SAHTE OPENAI SUNUCUSU
+    ---------------------
+    - Planlama isteği ('tools' içeren): plan_latency bekler; tool_calls > 0 ise soruya
+      göre deterministik seçilen 'search_*' araçlarını çağırır, 0 ise doğrudan cevaplar.
+    - Nihai cevap isteği: chat_latency bekler ve sabit bir cevap döndürür.
+    - Embedding isteği: embedding_latency bekler, hash_embedding vektörleri döndürür.
+    Her istek ayrı bir thread'de işlenir (gerçek API gibi eşzamanlı).
+    """
+    def __init__(self, plan_latency=0.2, chat_latency=0.3, embedding_latency=0.02, tool_calls=1):
+        self.plan_latency = plan_latency
+        self.chat_latency = chat_latency
+        self.embedding_latency = embedding_latency
+        self.tool_calls = tool_calls
+        self.requests = {"chat": 0, "embeddings": 0}
+        self._server = None
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive: istemci bağlantı havuzu kullanılır
+            # Başlık ve gövde tek write() ile gider (istek sonunda flush edilir) ve TCP_NODELAY:
+            # aksi halde Nagle + gecikmeli ACK her yanıta ~40-50 ms ekler ve ölçümü bozar
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.endswith("/embeddings"):
+                    payload = stub.embeddings(body)
+                elif self.path.endswith("/chat/completions"):
+                    payload = stub.chat(body)
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        ThreadingHTTPServer.request_queue_size = 256
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+
+    def embeddings(self, body):
+        self.requests["embeddings"] += 1
+        time.sleep(self.embedding_latency)
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {
+            "object": "list",
+            "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": hash_embedding(t).tolist()}
+                     for i, t in enumerate(texts)],
+            "usage": {"prompt_tokens": sum(len(t) // 4 for t in texts), "total_tokens": sum(len(t) // 4 for t in texts)},
+        }
+
+    def chat(self, body):
+        self.requests["chat"] += 1
+        messages = body.get("messages", [])
+        question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        message = {"role": "assistant", "content": None}
+        search_tools = [t["function"]["name"] for t in body.get("tools", []) if t["function"]["name"].startswith("search_")]
+
+        if search_tools and self.tool_calls:
+            time.sleep(self.plan_latency)
+            start = int(hashlib.md5(question.encode("utf-8")).hexdigest(), 16) % len(search_tools)
+            chosen = [search_tools[(start + i) % len(search_tools)] for i in range(min(self.tool_calls, len(search_tools)))]
+            message["tool_calls"] = [
+                {"id": f"call_{i}", "type": "function",
+                 "function": {"name": name, "arguments": json.dumps({"query": question}, ensure_ascii=False)}}
+                for i, name in enumerate(chosen)
+            ]
+            finish_reason = "tool_calls"
+        else:
+            time.sleep(self.chat_latency if not body.get("tools") else self.plan_latency)
+            message["content"] = "Kat Mülkiyeti Kanunu uyarınca yönetim planına göre karar verilir."
+            finish_reason = "stop"
+
+        prompt_tokens = len(json.dumps(messages, ensure_ascii=False)) // 4
+        completion_tokens = len(json.dumps(message, ensure_ascii=False)) // 4
+        return {
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+
+# ==============================================================================
+# 2. ORTAM KURULUMU
+# ==============================================================================
+def setup_environment(workdir, stub_url, router_mode="shadow", speculative=False):
+    """
+    Tüm dış bağımlılıkları yerel karşılıklarına yönlendirir ve koleksiyonları
+    gerçek PDF'lerin parçalarıyla doldurur (embedding: HashingEmbeddingFunction).
+    Önbellekler, indeksler ve MLflow kayıtları geçici dizine yazılır.
+    Akışı değiştiren ayarlar (yönlendirici, spekülatif arama) açıkça sabitlenir.
+    """
+    import chromadb
+    from src.article_index import ArticleIndex
+    from src.ingestion import prepare_document
+    from src.lexical_index import LexicalIndex, index_path
+
+    os.environ["OPENAI_BASE_URL"] = stub_url
+    config.OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
+    config.MLFLOW_TRACKING_URI = f"sqlite:///{os.path.join(workdir, 'mlflow.db')}"
+    config.EMBEDDING_CACHE_PATH = os.path.join(workdir, "query_embeddings.sqlite")
+    config.LEXICAL_INDEX_DIR = os.path.join(workdir, "lexical")
+    config.ARTICLE_INDEX_PATH = os.path.join(workdir, "articles.json")
+    # Tekrarlanan sorular önbellekten dönmesin / birleştirilmesin: her istek tüm akışı çalıştırır
+    config.ANSWER_CACHE_ENABLED = False
+    config.SINGLE_FLIGHT_ENABLED = False
+    # Hashing embedding'lerinin benzerlik puanları anlamsızdır; her arama TOP_K parça döndürsün
+    config.ADAPTIVE_TOP_K = False
+    # Planlama adımını atlatan / paralelleştiren özellikler .env'den bağımsız sabitlenir
+    config.ROUTER_MODE = router_mode
+    config.SPECULATIVE_RETRIEVAL = speculative
+
+    client = chromadb.EphemeralClient()
+    embedding_fn = HashingEmbeddingFunction()
+    utils.get_chroma_client = lambda: client
+    utils.get_vector_client = lambda: client
+    utils.get_embedding_function = lambda: embedding_fn
+    utils.get_query_embedding_cache.cache_clear()
+
+    article_index = ArticleIndex()
+    for key, doc_info in config.LEGAL_DOCS.items():
+        prepared = prepare_document(key, doc_info)
+        if not prepared["chunks"]:
+            continue
+        collection = client.get_or_create_collection(doc_info["collection"], embedding_function=embedding_fn)
+        collection.add(ids=prepared["ids"], documents=prepared["chunks"], metadatas=prepared["metadatas"])
+        LexicalIndex.build(prepared["ids"], prepared["chunks"], prepared["metadatas"]).save(
+            index_path(config.LEXICAL_INDEX_DIR, doc_info["collection"])
+        )
+        article_index.set_law(key, prepared["articles"])
+    article_index.save(config.ARTICLE_INDEX_PATH)
+
+
+# ==============================================================================
+# 3. AŞAMA ÖLÇÜMÜ
+# ==============================================================================
+STAGES = ("planning", "embedding", "retrieval", "generation", "total")
+
+
+class StageRecorder:
+    """Aşama süreleri (thread-safe). reset() ile her seviye ayrı ölçülür."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {stage: [] for stage in STAGES}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.samples = {stage: [] for stage in STAGES}
+
+
+recorder = StageRecorder()
+
+
+def _timed(stage, fn):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            recorder.record(stage, time.perf_counter() - started)
+    return wrapper
+
+
+def _atimed(stage, fn):
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            recorder.record(stage, time.perf_counter() - started)
+    return wrapper
+
+
+def instrument_modules():
+    """Sorgu embedding'i (utils) ve koleksiyon araması (LegalRAGTool) ölçümü."""
+    from src.rag_engine import LegalRAGTool
+    utils.embed_texts = _timed("embedding", utils.embed_texts)
+    utils.aembed_texts = _atimed("embedding", utils.aembed_texts)
+    LegalRAGTool.retrieve = _timed("retrieval", LegalRAGTool.retrieve)
+
+
+def instrument_agent(rag):
+    """
+    Planlama (_plan / _aplan: yönlendirici + planlama LLM çağrısı) ve nihai
+    cevap ('tools' içermeyen chat.completions çağrısı) ölçümü.
+    """
+    rag._plan = _timed("planning", rag._plan)
+    rag._aplan = _atimed("planning", rag._aplan)
+    sync_create = rag.client.chat.completions.create
+    async_create = rag.async_client.chat.completions.create
+
+    def create(**kwargs):
+        return (sync_create if "tools" in kwargs else _timed("generation", sync_create))(**kwargs)
+
+    async def acreate(**kwargs):
+        return await (async_create if "tools" in kwargs else _atimed("generation", async_create))(**kwargs)
+
+    rag.client.chat.completions.create = create
+    rag.async_client.chat.completions.create = acreate
+
+
+# ==============================================================================
+# 4. YÜK ÜRETİMİ
+# ==============================================================================
+async def drive(call, questions, concurrency, n_requests):
+    """n_requests isteği en fazla 'concurrency' eşzamanlı olarak gönderir. Çıktı: (süre, hata sayısı)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call(questions[i % len(questions)])
+            except Exception as e:
+                errors += 1
+                print(f"❌ İstek hatası: {e}")
+                return
+            recorder.record("total", time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    return time.perf_counter() - started, errors
+
+
+def summarize(target, concurrency, wall, n_requests, errors):
+    """Bir seviyenin aşama bazlı yüzdelik değerleri (ms) ve verimi."""
+    row = {"target": target, "concurrency": concurrency, "requests": n_requests, "errors": errors,
+           "throughput_rps": (n_requests - errors) / wall if wall else 0.0}
+    for stage, values in recorder.samples.items():
+        if values:
+            p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+            row[stage] = {"p50": p50, "p95": p95, "p99": p99, "count": len(values)}
+    return row
+
+
+def print_report(rows):
+    """Seviye başına tek satır: her aşama için p50/p95/p99 (ms)."""
+    print(f"\n{'hedef':<7}{'eşz.':>5}{'req/s':>8}{'hata':>6}" + "".join(f"{stage:>20}" for stage in STAGES))
+    print(f"{'':<26}" + "".join(f"{'p50/p95/p99 ms':>20}" for _ in STAGES))
+    for row in rows:
+        cells = [
+            f"{row[stage]['p50']:.0f}/{row[stage]['p95']:.0f}/{row[stage]['p99']:.0f}" if stage in row else "-"
+            for stage in STAGES
+        ]
+        print(f"{row['target']:<7}{row['concurrency']:>5}{row['throughput_rps']:>8.2f}{row['errors']:>6}"
+              + "".join(f"{cell:>20}" for cell in cells))
+
+
+async def bench_agent(questions, levels, n_requests):
+    """LegalRAG.agenerate_answer'ı doğrudan ölçer."""
+    from src.agent import LegalRAG
+    rag = LegalRAG()
+    instrument_agent(rag)
+    rows = []
+    for concurrency in levels:
+        recorder.reset()
+        wall, errors = await drive(rag.agenerate_answer, questions, concurrency, n_requests)
+        rows.append(summarize("agent", concurrency, wall, n_requests, errors))
+    return rows
+
+
+async def bench_api(questions, levels, n_requests):
+    """FastAPI uygulamasını (POST /ask) gerçek bir uvicorn sunucusu üzerinden ölçer."""
+    import httpx
+    import uvicorn
+    import app_api
+
+    # İstek başına INFO logları (app_api, HTTP istemcileri) ölçümü ve raporu boğmasın
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("app_api").setLevel(logging.WARNING)
+
+    server = uvicorn.Server(uvicorn.Config(app_api.app, host="127.0.0.1", port=0, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    instrument_agent(app_api.rag_system)
+
+    rows = []
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as http:
+        async def ask(question):
+            response = await http.post("/ask", json={"question": question})
+            response.raise_for_status()
+
+        for concurrency in levels:
+            recorder.reset()
+            wall, errors = await drive(ask, questions, concurrency, n_requests)
+            rows.append(summarize("api", concurrency, wall, n_requests, errors))
+
+    server.should_exit = True
+    await task
+    return rows
+
+
+def run_benchmark(levels=(1, 4, 16), n_requests=48, targets=("agent", "api"),
+                  router_mode="shadow", speculative=False, **stub_options):
+    """
+    BENCHMARK
+    ---------
+    Sahte sunucuyu başlatır, ortamı kurar, her hedef ve eşzamanlılık seviyesi için
+    ölçüm yapar ve raporu yazdırır. Çıktı: satır listesi (JSON'a çevrilebilir).
+    """
+    from src.eval_data import load_eval_data
+
+    stub = StubOpenAIServer(**stub_options)
+    stub_url = stub.start()
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="legal-rag-bench-") as workdir:
+        started = time.perf_counter()
+        setup_environment(workdir, stub_url, router_mode=router_mode, speculative=speculative)
+        instrument_modules()
+        print(f"🧪 Ortam hazır ({time.perf_counter() - started:.1f} sn) | Sahte OpenAI: {stub_url}")
+        print(f"⚙️ ROUTER_MODE={config.ROUTER_MODE} | SPECULATIVE_RETRIEVAL={config.SPECULATIVE_RETRIEVAL}")
+        questions = [item["question"] for item in load_eval_data()]
+
+        if "agent" in targets:
+            rows += asyncio.run(bench_agent(questions, levels, n_requests))
+        if "api" in targets:
+            rows += asyncio.run(bench_api(questions, levels, n_requests))
+    stub.stop()
+    for row in rows:
+        row.update(router_mode=router_mode, speculative=speculative)
+    print_report(rows)
+    print(f"\nROUTER_MODE={router_mode} | SPECULATIVE_RETRIEVAL={speculative}")
+    print(f"\nSahte OpenAI istekleri: {stub.requests}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LegalRAG uçtan uca gecikme benchmark'ı (ağsız)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16], help="Eşzamanlılık seviyeleri")
+    parser.add_argument("--requests", type=int, default=48, help="Seviye başına istek sayısı")
+    parser.add_argument("--targets", nargs="+", default=["agent", "api"], choices=["agent", "api"])
+    parser.add_argument("--plan-latency", type=float, default=0.2, help="Planlama LLM çağrısı gecikmesi (sn)")
+    parser.add_argument("--chat-latency", type=float, default=0.3, help="Nihai cevap LLM çağrısı gecikmesi (sn)")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="Embedding isteği gecikmesi (sn)")
+    parser.add_argument("--tool-calls", type=int, default=1, help="Planlamada çağrılacak arama aracı sayısı (0: araçsız cevap)")
+    parser.add_argument("--router-mode", default="shadow", choices=["off", "shadow", "on"],
+                        help="Yönlendirici modu (ROUTER_MODE)")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Planlamayla paralel spekülatif aramayı aç (SPECULATIVE_RETRIEVAL)")
+    parser.add_argument("--json", help="Sonuçları bu dosyaya JSON olarak yaz")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        levels=args.levels, n_requests=args.requests, targets=args.targets,
+        router_mode=args.router_mode, speculative=args.speculative,
+        plan_latency=args.plan_latency, chat_latency=args.chat_latency,
+        embedding_latency=args.embedding_latency, tool_calls=args.tool_calls,
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, default=float)
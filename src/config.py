@@ -31,15 +31,38 @@ EMBEDDING_MODEL = "text-embedding-3-small" # Vektörleştirme modeli
 MLFLOW_TRACKING_URI = "sqlite:///mlflow.db"
 MLFLOW_EXPERIMENT_NAME = "legal-rag-v1"
 
+# İstek Takibi (src/tracking.py) — her istek için bir run, arka planda toplu yazılır
+TRACKING_ENABLED = os.getenv("TRACKING_ENABLED", "True").lower() == "true"
+TRACKING_SAMPLE_RATE = float(os.getenv("TRACKING_SAMPLE_RATE", "1.0"))  # Yazılacak isteklerin oranı (0.0 - 1.0)
+TRACKING_QUEUE_SIZE = 1000       # Yazılmayı bekleyen en fazla kayıt; dolarsa yeni kayıtlar atılır
+TRACKING_BATCH_SIZE = 50         # Yazıcının tek seferde boşalttığı en fazla kayıt
+TRACKING_FLUSH_INTERVAL = 2.0    # Bir grubun dolması için beklenecek en uzun süre (sn)
+TRACKING_SHUTDOWN_TIMEOUT = 10.0 # Kapanışta kuyruğun boşaltılması için en fazla bekleme (sn)
+
 # ==============================================================================
 # 4. HUKUK KAYNAKLARI (VERİ)
 # ==============================================================================
 # Proje kök dizini ve veri klasörü
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+# Yeniden üretilebilir önbellekler (embedding vb.) — git'e ve Docker imajına girmez
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+
+# Vektör Veritabanı Seçimi
+# "chroma": Uzak ChromaDB sunucusu (Docker veya Cloud) — CHROMA_* ayarları zorunlu.
+# "local" : Süreç içi, bellek eşlemeli NumPy indeksi (src/local_index.py) — ağ gerektirmez.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(DATA_DIR, "index"))
+# BM25 sözcük indeksleri (ingestion sırasında oluşturulur, imajla birlikte dağıtılır)
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", os.path.join(DATA_DIR, "lexical"))
+# Artımlı ingestion manifest'i: PDF özetleri + chunk içerik özetleri
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", os.path.join(DATA_DIR, "ingest_manifest.json"))
+# PDF'lerden çıkarılan sayfa metinleri (PDF içerik özetiyle anahtarlanır)
+PDF_TEXT_CACHE_DIR = os.getenv("PDF_TEXT_CACHE_DIR", os.path.join(CACHE_DIR, "pdf_text"))
+# Madde indeksi: (kanun, tür, numara) -> madde metni (ingestion sırasında oluşturulur)
+ARTICLE_INDEX_PATH = os.getenv("ARTICLE_INDEX_PATH", os.path.join(DATA_DIR, "articles.json"))
 
-# Veritabanı Ayarları (Sadece Cloud Modu)
-# Yerel klasör desteği kaldırıldı. Mutlaka bir ChromaDB sunucusu (Docker veya Cloud) gereklidir.
+# ChromaDB Ayarları (VECTOR_BACKEND = "chroma")
 CHROMA_HOST = os.getenv("CHROMA_HOST") 
 CHROMA_PORT = os.getenv("CHROMA_PORT", "8000")
 CHROMA_API_KEY = os.getenv("CHROMA_API_KEY") 
@@ -47,8 +70,11 @@ CHROMA_SSL = os.getenv("CHROMA_SSL", "False").lower() == "true"
 CHROMA_TENANT = os.getenv("CHROMA_TENANT", "default_tenant")
 CHROMA_DATABASE = os.getenv("CHROMA_DATABASE", "default_database")
 
-if not CHROMA_HOST:
-    raise ValueError("HATA: .env dosyasında 'CHROMA_HOST' tanımlı değil! Cloud modu zorunludur.")
+if VECTOR_BACKEND not in ("chroma", "local"):
+    raise ValueError(f"HATA: Geçersiz VECTOR_BACKEND: '{VECTOR_BACKEND}' (chroma | local)")
+
+if VECTOR_BACKEND == "chroma" and not CHROMA_HOST:
+    raise ValueError("HATA: .env dosyasında 'CHROMA_HOST' tanımlı değil! (Yerel indeks için VECTOR_BACKEND=local)")
 
 # Kullanılabilir Hukuk Kaynakları
 # Yeni bir kanun eklemek için bu sözlüğe yeni bir kayıt ekleyin ve "make ingest" çalıştırın.
@@ -98,3 +124,96 @@ CHUNK_SIZE = 2000      # Metin parçalama boyutu (karakter)
 CHUNK_OVERLAP = 400    # Parçalar arası örtüşme (bağlam kaybını önlemek için)
 TOP_K = 6              # LLM'e gönderilecek en alakalı parça sayısı
 TEMPERATURE = 0.0      # Yaratıcılık katsayısı (0.0 = En tutarlı/Deterministik, 1.0 = En yaratıcı)
+# Nihai çağrıya gönderilen arama bağlamının en fazla token'ı (tüm araç çağrıları toplamı).
+# Tekrarlar ve parça örtüşmeleri çıkarıldıktan sonra pasajlar alaka sırasıyla eklenir (src/context_packer.py).
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+# Uyarlamalı TOP_K (src/rag_engine.py): her aramada TOP_K parça yerine sadece alakalı olanlar döner.
+# Kosinüs benzerliği RETRIEVAL_MIN_SCORE'un altındaki parçalar atılır (hiçbiri geçmezse boş sonuç);
+# ardışık iki parça arasındaki düşüş RETRIEVAL_SCORE_GAP'i aşarsa sonrakiler alınmaz.
+ADAPTIVE_TOP_K = os.getenv("ADAPTIVE_TOP_K", "True").lower() == "true"
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.25"))
+RETRIEVAL_SCORE_GAP = float(os.getenv("RETRIEVAL_SCORE_GAP", "0.08"))
+# MMR çeşitlendirmesi (src/rag_engine.py): örtüşen/benzer parçalar yerine farklı maddeler seçilir.
+# MMR_CANDIDATES aday vektörleriyle getirilir; MMR_LAMBDA: 1.0 = sadece alaka, 0.0 = sadece çeşitlilik.
+MMR_ENABLED = os.getenv("MMR_ENABLED", "False").lower() == "true"
+MMR_CANDIDATES = int(os.getenv("MMR_CANDIDATES", "20"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+
+# Ingestion Pipeline (src/ingestion.py)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))  # PDF okuma/parçalama süreç sayısı
+INGEST_BATCH_SIZE = 64            # Tek embedding isteğindeki en fazla parça sayısı
+INGEST_BATCH_CHARS = 100_000      # Tek embedding isteğindeki en fazla karakter (~25k token, limitin altında)
+INGEST_EMBED_CONCURRENCY = 4      # Aynı anda gönderilen embedding isteği sayısı
+INGEST_MAX_RETRIES = 5            # Başarısız embedding isteği için en fazla deneme
+INGEST_RETRY_DELAY = 1.0          # İlk bekleme (sn); her denemede iki katına çıkar
+
+# Hibrit Arama (Vektör + BM25, Reciprocal Rank Fusion)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "True").lower() == "true"
+HYBRID_CANDIDATES = 12  # Her iki aramadan birleştirme öncesi alınan aday sayısı
+RRF_K = 60              # RRF sabiti: 1 / (RRF_K + sıra)
+EMBEDDING_TIMEOUT = 5.0 # Sorgu embedding isteği zaman aşımı (sn); aşılırsa sözcük aramasına düşülür
+
+# Sorgu Embedding Önbelleği (Bellek LRU + Diskte SQLite)
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "query_embeddings.sqlite")
+EMBEDDING_CACHE_SIZE = 5000  # Bellekte tutulacak en fazla sorgu vektörü
+
+# Anlamsal Cevap Önbelleği (Benzer sorulara LLM'e gitmeden cevap)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "True").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # Eşleşme için en düşük kosinüs benzerliği
+ANSWER_CACHE_TTL = 24 * 3600    # Kayıt ömrü (saniye)
+ANSWER_CACHE_SIZE = 1000        # En fazla kayıt sayısı
+# Koleksiyonların ingest_version'ı (ingestion sonrası geçersiz kılma) en fazla bu sıklıkta okunur (sn)
+ANSWER_CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("ANSWER_CACHE_VERSION_CHECK_INTERVAL", "30"))
+# Aynı anda gelen aynı sorular (normalize metin + ayarlar) tek akışı bekler (src/single_flight.py)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "True").lower() == "true"
+
+# Değerlendirme (src/evaluation.py)
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "4"))                  # Aynı anda sorulan soru sayısı
+EVAL_REQUESTS_PER_MINUTE = int(os.getenv("EVAL_REQUESTS_PER_MINUTE", "60"))  # Soru başlatma hızı (0 = sınırsız)
+EVAL_CHECKPOINT_DIR = os.path.join(CACHE_DIR, "eval")                       # Soru bazında cevap checkpoint'leri (JSONL)
+
+# Retrieval Benchmark (src/retrieval_benchmark.py) — LLM'siz recall@k / MRR taraması
+RETRIEVAL_EXPERIMENT_NAME = "legal-rag-retrieval"                             # Her ayar kombinasyonu ayrı run
+CHUNK_EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "chunk_embeddings.sqlite")  # Farklı chunk ayarlarının vektörleri
+
+# Yerel Yönlendirici (Router) — src/router.py
+# "off": kapalı | "shadow": karar sadece loglanır, LLM yine çağrılır | "on": emin kararlarda LLM atlanır
+ROUTER_MODE = os.getenv("ROUTER_MODE", "shadow").lower()
+ROUTER_MIN_SCORE = 0.25          # Bir kanunun seçilebilmesi için en düşük kosinüs benzerliği
+ROUTER_MARGIN = 0.05             # Seçilenler ile en yakın seçilmeyen arasındaki en az fark ("emin" eşiği)
+ROUTER_GROUP_WIDTH = 0.02        # En yüksek puana bu kadar yakın kanunlar birlikte seçilir
+ROUTER_MAX_TOOLS = 2             # Doğrudan yönlendirmede en fazla kaç kanunda aranır
+ROUTER_SAMPLE_CHUNKS = 50        # Merkez vektör için koleksiyon başına örneklenen parça sayısı
+ROUTER_DESCRIPTION_WEIGHT = 0.5  # Merkez vektörde açıklama (description) vektörünün ağırlığı
+ROUTER_RETRY_INTERVAL = 60.0     # Merkez vektörler hesaplanamazsa tekrar denemeden önce beklenen süre (sn)
+
+# Spekülatif Arama — src/speculation.py (yönlendirici gerekir: ROUTER_MODE != "off")
+# Planlama LLM çağrısı sürerken ham soru, yönlendiricinin en olası kanunlarında önceden aranır.
+# Planlayıcı aynı kanunu aynı sorguyla (veya vektör benzerliği eşiği geçen bir sorguyla) seçerse sonuçlar kullanılır.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "False").lower() == "true"
+SPECULATIVE_COLLECTIONS = int(os.getenv("SPECULATIVE_COLLECTIONS", "2"))  # Önceden aranan kanun sayısı
+SPECULATIVE_MIN_SIMILARITY = 0.9  # Planlayıcı sorgusu ile ham soru arasındaki en düşük kosinüs benzerliği
+
+# ==============================================================================
+# 6. SUNUCU (API) AYARLARI
+# ==============================================================================
+# Asenkron akışta bloklayıcı işler (ChromaDB sorguları, önbellek) bu havuzdaki
+# thread'lerde çalışır. Aynı anda işlenebilecek istek sayısını doğrudan belirler.
+IO_THREAD_POOL_SIZE = int(os.getenv("IO_THREAD_POOL_SIZE", "64"))
+# HTTP Bağlantı Havuzu (src/utils.py: OpenAI ve ChromaDB istemcileri)
+# Tüm istekler aynı keep-alive bağlantılarını kullanır; sıcak isteklerde TLS el sıkışması yapılmaz.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))   # Sunucu başına en fazla açık bağlantı
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))        # Boşta açık tutulan en fazla bağlantı
+HTTP_KEEPALIVE_EXPIRY = 60.0     # Boştaki bağlantının kapatılma süresi (sn)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))  # İstek zaman aşımı (sn); sorgu embedding'i: EMBEDDING_TIMEOUT
+HTTP_CONNECT_TIMEOUT = 5.0       # Bağlantı kurma zaman aşımı (sn)
+HTTP2 = os.getenv("HTTP2", "True").lower() == "true"  # 'h2' paketi kuruluysa HTTP/2 (tek bağlantıda çoklu istek)
+
+# Soğuk başlangıç: True ise koleksiyonlar açılışta beklenmez; sunucu hemen istek kabul eder,
+# koleksiyonlar arka planda (veya ilk aramada) açılır. /health/ready açılış bitince 200 döner.
+LAZY_COLLECTIONS = os.getenv("LAZY_COLLECTIONS", "False").lower() == "true"
+
+# Toplu Cevaplama (POST /ask/batch, LegalRAG.agenerate_answers)
+# Aynı sorular bir kez cevaplanır, tüm sorgular toplu vektörleştirilir, koleksiyon başına tek sorgu atılır.
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "200"))  # Tek istekteki en fazla soru
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))        # Aynı anda çalışan en fazla LLM çağrısı
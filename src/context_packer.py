@@ -0,0 +1,186 @@
+"""
+context_packer.py — Token Bütçeli Bağlam Derleme
+================================================
+Arama sonuçları nihai LLM çağrısına gönderilmeden önce tek bir adımda derlenir:
+
+1. Tekilleştirme: Birden çok araç çağrısında dönen aynı parça (aynı ID) bir kez yazılır.
+2. Örtüşme birleştirme: Madde sınırında bölünemeyen uzun metinlerde komşu parçalar
+   CHUNK_OVERLAP kadar ortak metin taşır. Parçaların ham metindeki aralıkları
+   ('char_start' / 'char_end' metadata'sı) kesişiyor veya bitişiyorsa tek bir
+   pasaja birleştirilir; ortak metin bir kez yazılır.
+3. İçerilen metinler: Başka bir pasajın içinde aynen geçen metin (ör. get_article
+   ile getirilen madde, o maddeyi kapsayan parça) ayrıca yazılmaz.
+4. Bütçe: Pasajlar alaka sırasıyla (arama sırası) config.CONTEXT_TOKEN_BUDGET
+   dolana kadar eklenir; sığmayanlar atlanır.
+
+Token sayımı utils.count_tokens (tiktoken) ile yapılır. Kazanılan token sayısı
+isteğin izine ve metrics.CONTEXT_TOKENS'a yazılır.
+
+Not: 'char_start' / 'char_end' alanları olmayan eski parçalarda (2. adım) örtüşme
+birleştirilemez; `make ingest` embedding tekrarlamadan sadece metadata'yı günceller.
+"""
+
+from collections import defaultdict
+from src import config, utils
+
+NO_RESULTS = "Bilgi bulunamadı."
+SEEN_RESULTS = "Bu aramanın sonuçları diğer arama sonuçlarında yer alıyor."
+
+
+def _span(result):
+    """Parçanın (kaynak, başlangıç, bitiş) aralığı; metadata'da yoksa None."""
+    meta = result.get("metadata") or {}
+    if "char_start" in meta and "char_end" in meta:
+        return meta.get("source"), int(meta["char_start"]), int(meta["char_end"])
+    return None
+
+
+def _collect(tool_results, tokens):
+    """
+    1. ADIM: Aynı parçaları tekilleştirir.
+    Çıktı: (parçalar, ham bağlam token sayısı, tekrar sayısı)
+    Her parça: {"result", "rank" (en iyi sıra), "tool" (o sıranın araç indeksi)}
+    """
+    items = {}
+    naive_tokens = 0
+    duplicates = 0
+    for tool, (_, results) in enumerate(tool_results):
+        for rank, result in enumerate(results):
+            naive_tokens += tokens(result["content"])
+            key = result.get("id") or result["content"]
+            if key in items:
+                duplicates += 1
+                if rank < items[key]["rank"]:
+                    items[key].update(rank=rank, tool=tool)
+                continue
+            items[key] = {"result": result, "rank": rank, "tool": tool}
+    return list(items.values()), naive_tokens, duplicates
+
+
+def _merge_overlaps(items):
+    """
+    2. ADIM: Aynı kaynakta aralıkları kesişen/bitişen parçaları tek pasajda birleştirir.
+    Çıktı: (pasajlar, birleştirilen parça sayısı)
+    Pasaj: {"text", "rank", "tool", "sources": [(araç indeksi, sonuç), ...]}
+    """
+    blocks = []
+    merged = 0
+    by_source = defaultdict(list)
+    for item in items:
+        span = _span(item["result"])
+        if span:
+            by_source[span[0]].append((span[1], span[2], item))
+        else:
+            blocks.append({
+                "text": item["result"]["content"], "rank": item["rank"], "tool": item["tool"],
+                "sources": [(item["tool"], item["result"])],
+            })
+
+    for spans in by_source.values():
+        spans.sort(key=lambda s: s[0])
+        current = None
+        for start, end, item in spans:
+            text = item["result"]["content"]
+            if current and start <= current["end"]:
+                if end > current["end"]:
+                    current["text"] += text[current["end"] - start:]
+                    current["end"] = end
+                if (item["rank"], item["tool"]) < (current["rank"], current["tool"]):
+                    current["rank"], current["tool"] = item["rank"], item["tool"]
+                current["sources"].append((item["tool"], item["result"]))
+                merged += 1
+                continue
+            current = {
+                "text": text, "end": end, "rank": item["rank"], "tool": item["tool"],
+                "sources": [(item["tool"], item["result"])],
+            }
+            blocks.append(current)
+    return blocks, merged
+
+
+def _drop_contained(blocks):
+    """3. ADIM: Alaka sırasına dizer; başka bir pasajın içinde aynen geçen pasajları çıkarır."""
+    kept = []
+    contained = 0
+    for block in sorted(blocks, key=lambda b: (b["rank"], b["tool"])):
+        container = next((k for k in kept if block["text"] in k["text"]), None)
+        if container:
+            container["sources"].extend(block["sources"])
+            contained += 1
+            continue
+        inner = [k for k in kept if k["text"] in block["text"]]
+        if inner:
+            # Daha önce eklenen (daha alakalı) pasajın yerini, onu kapsayan pasaj alır
+            position = kept.index(inner[0])
+            block["rank"], block["tool"] = inner[0]["rank"], inner[0]["tool"]
+            for k in inner:
+                block["sources"] = k["sources"] + block["sources"]
+                kept.remove(k)
+            contained += len(inner)
+            kept.insert(position, block)
+            continue
+        kept.append(block)
+    return kept, contained
+
+
+def pack_context(tool_results, budget=None):
+    """
+    BAĞLAM DERLEME
+    --------------
+    Girdi:
+    - tool_results: [(tool_call, [{'id', 'content', 'metadata'}, ...]), ...] (arama sırasıyla)
+    - budget: Tüm araç mesajları için en fazla token (varsayılan: config.CONTEXT_TOKEN_BUDGET)
+
+    Çıktı: (contents, sources, stats)
+    - contents: Her araç çağrısı için 'tool' mesajı metni (aynı sırayla)
+    - sources: Bağlama giren sonuçlar (tekrarsız) — UI, değerlendirme ve kaynak satırı için
+    - stats: {"naive_tokens", "packed_tokens", "saved_tokens", "duplicates", "merged", "contained", "dropped"}
+    """
+    budget = budget or config.CONTEXT_TOKEN_BUDGET
+    token_counts = {}
+
+    def tokens(text):
+        if text not in token_counts:
+            token_counts[text] = utils.count_tokens(text)
+        return token_counts[text]
+
+    items, naive_tokens, duplicates = _collect(tool_results, tokens)
+    blocks, merged = _merge_overlaps(items)
+    blocks, contained = _drop_contained(blocks)
+
+    # 4. ADIM: Bütçe (alaka sırasıyla; sığmayan pasaj atlanır, daha kısa olanlar denenir)
+    packed, used_tokens, dropped = [], 0, 0
+    for block in blocks:
+        n = tokens(block["text"])
+        if used_tokens + n > budget:
+            if packed:
+                dropped += 1
+                continue
+            # En alakalı pasaj tek başına bütçeyi aşıyorsa kırpılır
+            block["text"] = utils.truncate_tokens(block["text"], budget)
+            n = tokens(block["text"])
+        packed.append(block)
+        used_tokens += n
+
+    sources = [result for block in packed for _, result in block["sources"]]
+    packed_keys = {result.get("id") or result["content"] for result in sources}
+    contents = []
+    for tool, (_, results) in enumerate(tool_results):
+        texts = [block["text"] for block in packed if block["tool"] == tool]
+        if texts:
+            contents.append("\n\n".join(texts))
+        elif any((result.get("id") or result["content"]) in packed_keys for result in results):
+            contents.append(SEEN_RESULTS)
+        else:
+            contents.append(NO_RESULTS)
+
+    stats = {
+        "naive_tokens": naive_tokens,
+        "packed_tokens": used_tokens,
+        "saved_tokens": max(0, naive_tokens - used_tokens),
+        "duplicates": duplicates,
+        "merged": merged,
+        "contained": contained,
+        "dropped": dropped,
+    }
+    return contents, sources, stats
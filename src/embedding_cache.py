@@ -0,0 +1,195 @@
+"""
+embedding_cache.py — Sorgu Embedding Önbelleği (İki Katmanlı)
+=============================================================
+Aynı arama sorgusu ("aidat ödememe" gibi) günde yüzlerce kez tekrar eder.
+Her seferinde OpenAI'a embedding isteği atmak yerine vektörler önbellekte tutulur:
+
+1. Katman: Süreç içi (in-memory) LRU — sınırlı boyut, mikro-saniye erişim.
+2. Katman: Diskte SQLite — sunucu yeniden başlasa da kalıcıdır.
+
+Anahtar: (config.EMBEDDING_MODEL, normalize edilmiş metin).
+Model değişirse eski vektörler otomatik olarak kullanılmaz.
+Normalizasyon yalnızca anahtar içindir; OpenAI'a her zaman metnin özgün hali
+(aynı anahtara düşen ilk metin) gönderilir.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from src import config, metrics
+
+
+# Python'un lower()'ı Türkçe değildir: "İ" -> "i̇" (i + birleşik nokta), "I" -> "i".
+_TURKISH_LOWER = str.maketrans({"İ": "i", "I": "ı"})
+
+
+def normalize_text(text):
+    """Boşlukları sadeleştirir ve Türkçe kurallarıyla küçük harfe çevirir (önbellek anahtarı için)."""
+    return " ".join(text.split()).translate(_TURKISH_LOWER).lower()
+
+
+class QueryEmbeddingCache:
+    """
+    İKİ KATMANLI EMBEDDING ÖNBELLEĞİ
+    --------------------------------
+    get_many() önce bellekteki LRU'ya, sonra SQLite'a bakar; bulunamayan
+    metinler TEK bir toplu istekle vektörleştirilip iki katmana da yazılır.
+
+    Sayaçlar (stats):
+    - memory_hits: Bellekten dönen vektör sayısı
+    - disk_hits: SQLite'tan dönen vektör sayısı
+    - misses: OpenAI'a gitmek zorunda kalınan vektör sayısı
+    """
+
+    def __init__(self, path=None, max_items=None, model=None, normalize=True):
+        """
+        Girdi:
+        - path: SQLite dosya yolu (varsayılan: config.EMBEDDING_CACHE_PATH)
+        - max_items: Bellekte tutulacak en fazla vektör sayısı (LRU)
+        - model: Anahtarın parçası olan embedding modeli adı
+        - normalize: False ise metinler olduğu gibi anahtar yapılır ve vektörleştirilir
+          (chunk embedding'leri için: ingestion ile birebir aynı girdi)
+        """
+        self.path = path or config.EMBEDDING_CACHE_PATH
+        self.max_items = max_items or config.EMBEDDING_CACHE_SIZE
+        self.model = model or config.EMBEDDING_MODEL
+        self.normalize = normalize
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Thread havuzundan erişileceği için bağlantı paylaşılır, erişim kilitle korunur.
+        # WAL modu: birden çok uvicorn worker'ı aynı dosyayı okuyup yazabilir.
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text))"
+        )
+        self._db.commit()
+
+    # --- Bellek Katmanı (LRU) ---
+    def _memory_get(self, text):
+        vector = self._memory.get(text)
+        if vector is not None:
+            self._memory.move_to_end(text)
+        return vector
+
+    def _memory_put(self, text, vector):
+        self._memory[text] = vector
+        self._memory.move_to_end(text)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    # --- Disk Katmanı (SQLite) ---
+    def _disk_get_many(self, texts):
+        placeholders = ",".join("?" * len(texts))
+        rows = self._db.execute(
+            f"SELECT text, vector FROM embeddings WHERE model = ? AND text IN ({placeholders})",
+            [self.model, *texts]
+        ).fetchall()
+        return {text: array("f", blob).tolist() for text, blob in rows}
+
+    def _disk_put_many(self, items):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+            [(self.model, text, array("f", vector).tobytes()) for text, vector in items]
+        )
+        self._db.commit()
+
+    def _lookup(self, texts):
+        """
+        Normalize edilmiş benzersiz metinleri iki katmanda arar.
+        Çıktı: (bulunanlar sözlüğü, eksik metinler listesi)
+        """
+        found = {}
+        with self._lock:
+            for text in texts:
+                vector = self._memory_get(text)
+                if vector is not None:
+                    found[text] = vector
+                    self.memory_hits += 1
+
+            pending = [t for t in texts if t not in found]
+            if pending:
+                from_disk = self._disk_get_many(pending)
+                for text, vector in from_disk.items():
+                    self._memory_put(text, vector)
+                    found[text] = vector
+                self.disk_hits += len(from_disk)
+
+        missing = [t for t in texts if t not in found]
+        metrics.record_cache("embedding", True, len(found))
+        return found, missing
+
+    def _store(self, found, texts, vectors):
+        metrics.record_cache("embedding", False, len(texts))
+        with self._lock:
+            self.misses += len(texts)
+            for text, vector in zip(texts, vectors):
+                vector = [float(x) for x in vector]
+                self._memory_put(text, vector)
+                found[text] = vector
+            self._disk_put_many([(t, found[t]) for t in texts])
+
+    def _keys(self, texts):
+        """
+        Girdi metinlerinin anahtarlarını ve her anahtar için görülen ilk özgün metni döndürür.
+        Çıktı: (anahtarlar listesi, {anahtar: özgün metin})
+        """
+        keys = [normalize_text(t) for t in texts] if self.normalize else list(texts)
+        originals = {}
+        for key, text in zip(keys, texts):
+            originals.setdefault(key, text)
+        return keys, originals
+
+    def get_many(self, texts, embed_fn):
+        """
+        Metinlerin vektörlerini döndürür (girdi sırasıyla).
+
+        Girdi:
+        - texts (list[str]): Sorgu metinleri
+        - embed_fn: Eksik metinleri toplu vektörleştiren fonksiyon (list[str] -> list[vector])
+        """
+        keys, originals = self._keys(texts)
+        found, missing = self._lookup(list(originals))
+        if missing:
+            self._store(found, missing, embed_fn([originals[k] for k in missing]))
+        return [found[k] for k in keys]
+
+    async def aget_many(self, texts, aembed_fn):
+        """
+        get_many'nin asenkron hali (eksikler await edilen bir fonksiyonla vektörleştirilir).
+        SQLite katmanı olay döngüsünü bloklamasın diye thread'de çalışır.
+        """
+        keys, originals = self._keys(texts)
+        found, missing = await asyncio.to_thread(self._lookup, list(originals))
+        if missing:
+            vectors = await aembed_fn([originals[k] for k in missing])
+            await asyncio.to_thread(self._store, found, missing, vectors)
+        return [found[k] for k in keys]
+
+    def get(self, text, embed_fn):
+        """Tek bir metnin vektörünü döndürür."""
+        return self.get_many([text], embed_fn)[0]
+
+    def stats(self):
+        """Önbellek sayaçları: kaç embedding isteğinden tasarruf edildiği görülür."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_items": len(self._memory),
+            }
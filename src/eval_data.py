@@ -0,0 +1,59 @@
+"""
+eval_data.py — Test Veri Seti Yardımcıları
+===========================================
+data/eval_data.json dosyasını yükler ve 'ground_truth_context' alanındaki
+serbest metin referanslarını ("KMK Madde 4 ve Madde 20/c", "Anayasa Md. 21")
+(kanun anahtarı, madde numarası) ikililerine çevirir.
+
+Bu yardımcılar RAGAS'a ihtiyaç duymayan (hızlı, LLM'siz) değerlendirmelerde kullanılır.
+"""
+
+import json
+import os
+import re
+from src import config
+
+# Test verisi yolu
+EVAL_DATA_PATH = os.path.join(config.DATA_DIR, "eval_data.json")
+
+# Referans metnindeki kanun adlarının config.LEGAL_DOCS anahtarlarına karşılığı
+LAW_ALIASES = {
+    "KMK": "kmk",
+    "TBK": "tbk",
+    "TMK": "tmk",
+    "Anayasa": "anayasa",
+    "Asansör": "asansor",
+    "Yangın": "yangin",
+}
+
+# Kanun adı VEYA madde numarası ("20/c" -> 20, "10/11" -> 10)
+_REF_TOKEN = re.compile(r"(" + "|".join(LAW_ALIASES) + r")|(\d+)(?:/\w+)?")
+
+
+def load_eval_data(path=EVAL_DATA_PATH):
+    """Test sorularını yükler."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_ground_truth_refs(contexts):
+    """
+    Referans metinlerini ayrıştırır.
+
+    Girdi: ["KMK Madde 28 ve Madde 27", "Anayasa Md. 21, KMK Md. 23 ve 33"]
+    Çıktı: [("kmk", "28"), ("kmk", "27"), ("anayasa", "21"), ("kmk", "23"), ("kmk", "33")]
+    """
+    refs = []
+    for text in contexts:
+        law = None
+        for alias, number in _REF_TOKEN.findall(text):
+            if alias:
+                law = LAW_ALIASES[alias]
+            elif law and (law, number) not in refs:
+                refs.append((law, number))
+    return refs
+
+
+def ground_truth_keys(item):
+    """Bir test sorusunun doğru cevabının geçtiği kanun anahtarları (sıralı, tekrarsız)."""
+    return list(dict.fromkeys(law for law, _ in parse_ground_truth_refs(item.get("ground_truth_context", []))))
@@ -5,71 +5,206 @@ Sistem performansını ölçer: Faithfulness, Answer Relevancy,
 Answer Correctness metrikleri RAGAS ile hesaplanır,
 sonuçlar MLflow'a loglanır.
 
+Sorular eşzamanlı (EVAL_CONCURRENCY) ve hız sınırlı (EVAL_REQUESTS_PER_MINUTE)
+olarak sorulur. Her cevap diske (JSONL checkpoint) yazılır; yarıda kalan bir
+değerlendirme tekrar çalıştırıldığında sadece eksik sorular sorulur.
+Uçtan uca gecikme dağılımı (p50/p90/p95/p99) kalite skorlarıyla birlikte loglanır;
+devam ettirilen bir çalıştırmada bu çalıştırmada sorulanlar (latency_*) ile
+checkpoint'ten gelenler (resumed_latency_*) ayrı raporlanır.
+
 """
 
-import pandas as pd
+import asyncio
+import hashlib
+import json
+import os
+import time
+import numpy as np
 import mlflow
-from ragas import evaluate
-from ragas.metrics import faithfulness, answer_relevancy, answer_correctness
-from datasets import Dataset
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from src.agent import LegalRAG
+from src.answer_cache import config_fingerprint
+from src.eval_data import EVAL_DATA_PATH, load_eval_data
 from src import config
 
-# Basit bir test veri seti (Sorular ve Beklenen Cevaplar)
-# bu veriler harici bir dosyadan (JSON/CSV) okunmalıdır.
-import json
-import os
 
-# Test veri seti yolu
-EVAL_DATA_PATH = os.path.join(config.DATA_DIR, "eval_data.json")
+class RateLimiter:
+    """
+    Basit asenkron hız sınırlayıcı: ardışık istekler arasında en az
+    60 / requests_per_minute saniye bırakır. requests_per_minute <= 0 ise sınırsız.
+    """
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def checkpoint_path(test_data):
+    """
+    Checkpoint dosyası: test verisi + cevabı etkileyen tüm arama/üretim ayarlarının
+    anlık görüntüsü (answer_cache.config_fingerprint) ile anahtarlanır.
+    Ayarlar veya sorular değişirse yeni bir dosya kullanılır (eski cevaplar karışmaz).
+    """
+    run_key = hashlib.sha256(json.dumps(
+        [test_data, config_fingerprint()],
+        ensure_ascii=False, sort_keys=True
+    ).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(config.EVAL_CHECKPOINT_DIR, f"answers_{run_key}.jsonl")
+
+
+def load_checkpoint(path):
+    """Daha önce cevaplanmış sorular: {soru: kayıt}. Yarım yazılmış son satır atlanır."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[record["question"]] = record
+    return done
+
+
+async def collect_answers(rag, test_data, path):
+    """
+    SORULARI EŞZAMANLI SOR (Checkpoint'li)
+    --------------------------------------
+    - Aynı anda en fazla config.EVAL_CONCURRENCY soru işlenir (Semaphore).
+    - İstekler config.EVAL_REQUESTS_PER_MINUTE ile sınırlandırılır.
+    - Biten her cevap hemen checkpoint dosyasına eklenir.
+    - Hata alan sorular yazılmaz; bir sonraki çalıştırmada tekrar denenir.
+
+    Çıktı: (kayıtlar (test verisi sırasıyla), checkpoint'ten gelen soruların kümesi, hata sayısı)
+    """
+    done = load_checkpoint(path)
+    resumed = set(done)
+    pending = [item for item in test_data if item["question"] not in done]
+    if done:
+        print(f"♻️ Checkpoint: {len(done)} soru daha önce cevaplanmış, {len(pending)} soru kaldı.")
+
+    semaphore = asyncio.Semaphore(config.EVAL_CONCURRENCY)
+    limiter = RateLimiter(config.EVAL_REQUESTS_PER_MINUTE)
+    write_lock = asyncio.Lock()
+    errors = 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    async def ask(item, out):
+        nonlocal errors
+        async with semaphore:
+            await limiter.acquire()
+            print(f"Soru: {item['question']}")
+            started = time.perf_counter()
+            try:
+                answer, sources = await rag.agenerate_answer(item["question"])
+            except Exception as e:
+                errors += 1
+                print(f"❌ Hata ({item['question'][:50]}...): {e}")
+                return
+            latency = time.perf_counter() - started
+
+        # RAGAS DEĞERLENDİRMESİ İÇİN VERİ HAZIRLIĞI
+        # ------------------------------------------
+        # Ragas 'contexts' olarak sadece metin listesi (list[str]) bekler.
+        # agent.py sözlük listesi döndürüyor ({'content':..., 'metadata':...}).
+        # Bu yüzden sadece 'content' alanını çekiyoruz.
+        record = {
+            "question": item["question"],
+            "answer": answer,
+            "contexts": [s["content"] for s in sources],
+            # JSON'daki anahtar 'ground_truth_answer'
+            "ground_truth": item.get("ground_truth_answer", ""),
+            "latency": latency,
+        }
+        async with write_lock:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+        done[item["question"]] = record
+
+    with open(path, "a", encoding="utf-8") as out:
+        await asyncio.gather(*(ask(item, out) for item in pending))
+
+    records = [done[item["question"]] for item in test_data if item["question"] in done]
+    return records, resumed, errors
+
+
+def latency_metrics(latencies):
+    """Uçtan uca gecikme dağılımı (saniye): ortalama, p50, p90, p95, p99, max."""
+    values = np.asarray(latencies, dtype=float)
+    if not len(values):
+        return {}
+    metrics = {f"latency_p{q}": float(np.percentile(values, q)) for q in (50, 90, 95, 99)}
+    metrics["latency_mean"] = float(values.mean())
+    metrics["latency_max"] = float(values.max())
+    return metrics
+
 
 def run_evaluation():
+    # RAGAS/datasets/langchain içe aktarımı birkaç saniye sürer; sadece değerlendirme öder
+    from ragas import evaluate
+    from ragas.metrics import faithfulness, answer_relevancy, answer_correctness
+    from datasets import Dataset
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
     print("Değerlendirme Başlıyor...")
     rag = LegalRAG()
-    
-    results = {
-        "question": [],
-        "answer": [],
-        "contexts": [],
-        "ground_truth": []
-    }
+    # Anlamsal önbellek kapalı: skorlar ve gecikmeler gerçek akışı ölçmeli
+    rag.answer_cache = None
 
     # Veri setini yükle
     try:
-        with open(EVAL_DATA_PATH, "r", encoding="utf-8") as f:
-            test_data = json.load(f)
+        test_data = load_eval_data()
         print(f"{len(test_data)} adet test sorusu yüklendi.")
     except FileNotFoundError:
         print(f"HATA: {EVAL_DATA_PATH} bulunamadı!")
         return
 
-    # 1. Soruları RAG Sistemine Sor
-    for item in test_data:
-        print(f"Soru: {item['question']}")
-        
-        # Cevap ve Kaynakları Al
-        answer, sources = rag.generate_answer(item['question'])
-        
-        # RAGAS DEĞERLENDİRMESİ İÇİN VERİ HAZIRLIĞI
-        # ------------------------------------------
-        # Ragas 'contexts' olarak sadece metin listesi (list[str]) bekler.
-        # agent.py artık sözlük listesi döndürüyor ({'content':..., 'metadata':...}).
-        # Bu yüzden sadece 'content' alanını çekiyoruz.
-        context_contents = [s['content'] for s in sources]
-        
-        results["question"].append(item['question'])
-        results["answer"].append(answer)
-        results["contexts"].append(context_contents)
-        # JSON'daki anahtar 'ground_truth_answer'
-        results["ground_truth"].append(item.get('ground_truth_answer', ''))
+    # 1. Soruları RAG Sistemine Sor (eşzamanlı, checkpoint'li)
+    path = checkpoint_path(test_data)
+    started = time.perf_counter()
+    records, resumed, errors = asyncio.run(collect_answers(rag, test_data, path))
+    wall = time.perf_counter() - started
+    if errors:
+        print(f"⚠️ {errors} soru hata verdi. Tekrar çalıştırınca sadece eksikler sorulur: {path}")
+        return
+
+    # Süre ve hız sadece bu çalıştırmada sorulanları kapsar; gecikme dağılımı da
+    # aynı kümeden hesaplanır. Checkpoint'ten gelenler (başka bir çalıştırma,
+    # başka yük koşulları) ayrı raporlanır.
+    fresh = [r for r in records if r["question"] not in resumed]
+    latencies = latency_metrics([r["latency"] for r in fresh])
+    latencies.update({
+        f"resumed_{k}": v
+        for k, v in latency_metrics([r["latency"] for r in records if r["question"] in resumed]).items()
+    })
+    throughput = {"eval_wall_seconds": wall}
+    if fresh:
+        throughput["eval_questions_per_second"] = len(fresh) / wall
+    print(f"⏱️ Bu çalıştırma: {len(fresh)} soru, {wall:.2f}s"
+          + (f" (checkpoint'ten {len(records) - len(fresh)} soru)" if resumed else ""))
+    print(f"⏱️ Gecikme: {', '.join(f'{k}={v:.2f}s' for k, v in latencies.items())}")
 
     # 2. Dataset Oluştur
-    dataset = Dataset.from_dict(results)
+    dataset = Dataset.from_dict({
+        "question": [r["question"] for r in records],
+        "answer": [r["answer"] for r in records],
+        "contexts": [r["contexts"] for r in records],
+        "ground_truth": [r["ground_truth"] for r in records],
+    })
 
     # 3. RAGAS ile Değerlendir
     print("RAGAS Metrikleri Hesaplanıyor...")
-    
+
     # LLM ve Embedding modellerini açıkça belirtiyoruz
     # Değerlendirme LLM'i: gpt-4o kullanıyoruz çünkü RAGAS'ın ters soru üretme
     # adımı daha güçlü bir model ile daha doğru sonuç veriyor.
@@ -82,22 +217,37 @@ def run_evaluation():
         llm=eval_llm,
         embeddings=eval_embeddings
     )
-    
+
     print(f"Sonuçlar: {scores}")
 
     # 4. MLflow'a Kaydet
+    mlflow.set_tracking_uri(config.MLFLOW_TRACKING_URI)
+    mlflow.set_experiment(config.MLFLOW_EXPERIMENT_NAME)
     with mlflow.start_run(run_name="ragas_evaluation"):
         # RAGAS skorlarını sözlüğe çevir (Pandas üzerinden ortalama alarak)
         # scores bir EvaluationResult nesnesidir.
         scores_dict = scores.to_pandas().mean(numeric_only=True).to_dict()
-        
+
         mlflow.log_metrics(scores_dict)
-        
-        # Detaylı sonuçları CSV olarak kaydet
+        # Gecikme dağılımı + toplam süre (kalite skorlarının yanında)
+        mlflow.log_metrics({**latencies, **throughput})
+        mlflow.log_params({
+            "eval_questions": len(records),
+            "eval_new_questions": len(fresh),
+            "eval_resumed_questions": len(records) - len(fresh),
+            "eval_concurrency": config.EVAL_CONCURRENCY,
+            "eval_requests_per_minute": config.EVAL_REQUESTS_PER_MINUTE,
+            **{name.lower(): value for name, value in config_fingerprint()},
+        })
+
+        # Detaylı sonuçları CSV olarak kaydet (soru bazında gecikme ile)
         df_result = scores.to_pandas()
+        df_result["latency"] = [r["latency"] for r in records]
+        df_result["resumed"] = [r["question"] in resumed for r in records]
         df_result.to_csv("evaluation_results.csv", index=False)
         mlflow.log_artifact("evaluation_results.csv")
-    
+        mlflow.log_artifact(path)
+
     print("Değerlendirme tamamlandı ve MLflow'a kaydedildi.")
 
 if __name__ == "__main__":
@@ -2,39 +2,115 @@
 ingestion.py — Veri Yükleme Pipeline'ı (ETL)
 =============================================
 PDF → Metin Çıkarma → Parçalama (Chunking) → ChromaDB'ye Kayıt.
+PDF metni sayfa sayfa çıkarılır ve diskte önbelleklenir; parçalar sayfa aralığı taşır.
+Okuma/parçalama süreç havuzunda, embedding sınırlı eşzamanlı batch'lerle yapılır.
 Hukuki metinlere özel ayırıcılar (Madde, Kısım, Bölüm) kullanır.
+Aynı metinden madde indeksi (article_index) ve BM25 sözcük indeksi de üretilir.
 
 """
 
+import gzip
+import hashlib
+import json
 import os
+import random
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from pypdf import PdfReader
 from src import config, utils
+from src.answer_cache import mark_ingested
+from src.lexical_index import LexicalIndex, index_path
+from src.article_index import ArticleIndex, parse_articles, articles_in_span
 
-def load_pdf(file_path):
+# Chunk metadata şeması değişince artırılır: kaynaklar yeniden okunur ve sadece
+# metadata güncellenir (embedding tekrarlanmaz). 2: sayfa aralıkları eklendi.
+# 3: ham metindeki karakter aralığı (context_packer örtüşmeleri birleştirir).
+METADATA_VERSION = 3
+
+def iter_pdf_pages(file_path):
     """
-    PDF Dosyasını Okur ve Metne Çevirir.
+    PDF Sayfalarını Tek Tek Üretir (Generator).
+    Çıktı: (sayfa_no, metin) — sayfa numarası 1'den başlar, boş sayfalar atlanır.
+    """
+    reader = PdfReader(file_path)
+    for number, page in enumerate(reader.pages, start=1):
+        page_text = page.extract_text()
+        if page_text:
+            yield number, page_text
+
+def load_pdf_pages(file_path, pdf_hash=None):
+    """
+    PDF Sayfalarını Okur (Disk Önbellekli).
+    
+    Çıkarılan sayfalar PDF'in içerik özetiyle (sha256) anahtarlanarak
+    config.PDF_TEXT_CACHE_DIR altına yazılır; değişmeyen PDF için pypdf hiç çalışmaz.
     
     Girdi:
     - file_path: PDF dosyasının fiziksel yolu.
+    - pdf_hash: Önceden hesaplandıysa PDF özeti (tekrar okumamak için).
     
     Çıktı:
-    - str: Dosyanın tamamının ham metin hali. Dosya yoksa None döner.
+    - list[(sayfa_no, metin)]. Dosya yoksa None döner.
     """
     if not os.path.exists(file_path):
         print(f"UYARI: Dosya bulunamadı -> {file_path}")
         return None
+
+    cache_path = os.path.join(config.PDF_TEXT_CACHE_DIR, f"{pdf_hash or file_sha256(file_path)}.json.gz")
+    if os.path.exists(cache_path):
+        with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+            return [tuple(page) for page in json.load(f)["pages"]]
+
+    pages = list(iter_pdf_pages(file_path))
+    os.makedirs(config.PDF_TEXT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump({"path": os.path.basename(file_path), "pages": pages}, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    return pages
+
+def join_pages(pages):
+    """
+    Sayfaları tek bir metinde birleştirir (her sayfa sonuna "\n").
+    Çıktı: (metin, sayfa_başlangıç_ofsetleri, sayfa_numaraları)
+    Ofsetler artan sıradadır; bir karakterin sayfası bisect ile bulunur (page_range).
+    """
+    parts, offsets, numbers = [], [], []
+    cursor = 0
+    for number, page_text in pages:
+        offsets.append(cursor)
+        numbers.append(number)
+        parts.append(page_text)
+        parts.append("\n")
+        cursor += len(page_text) + 1
+    return "".join(parts), offsets, numbers
+
+def page_range(page_map, start, end):
+    """Metindeki [start, end) aralığının kapsadığı (ilk_sayfa, son_sayfa)."""
+    offsets, numbers = page_map
+    first = numbers[max(bisect_right(offsets, start) - 1, 0)]
+    last = numbers[max(bisect_right(offsets, max(start, end - 1)) - 1, 0)]
+    return first, last
+
+def load_pdf(file_path):
+    """
+    PDF Dosyasını Okur ve Metne Çevirir.
     
-    reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
-        # Her sayfanın metnini al ve birleştir
-        page_text = page.extract_text()
-        if page_text:
-            text += page_text + "\n"
-    return text
+    Girdi:
+    - file_path: PDF dosyasının fiziksel yolu.
+    
+    Çıktı:
+    - str: Dosyanın tamamının ham metin hali. Dosya yoksa None döner.
+    """
+    pages = load_pdf_pages(file_path)
+    if pages is None:
+        return None
+    return join_pages(pages)[0]
 
-def chunk_text(text):
+def chunk_text(text, chunk_size=None, chunk_overlap=None):
     """
     Metni Parçalar (Chunking Strategy).
     
@@ -47,10 +123,13 @@ def chunk_text(text):
     1. "KISIM", "BÖLÜM" (Büyük başlıklar)
     2. "Madde", "Ek Madde" (En önemli kanun birimleri)
     3. "\n" (Paragraf sonları)
+
+    chunk_size / chunk_overlap verilmezse config değerleri kullanılır
+    (retrieval_benchmark farklı değerleri dener).
     """
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=config.CHUNK_SIZE,
-        chunk_overlap=config.CHUNK_OVERLAP,
+        chunk_size=chunk_size or config.CHUNK_SIZE,
+        chunk_overlap=config.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap,
         separators=[
             "\nKISIM ", "\nBÖLÜM ", "\nMadde ", "\nEk Madde ", "\nGeçici Madde ",
             "\n", " ", ""
@@ -59,65 +138,439 @@ def chunk_text(text):
     )
     return text_splitter.split_text(text)
 
+def chunk_spans(text, chunks):
+    """
+    Her parçanın ham metindeki [başlangıç, bitiş) aralığını bulur.
+    Parçalar örtüştüğü için arama bir önceki parçanın başından devam eder.
+    Bulunamayan parça için (-1, -1) döner.
+    """
+    spans = []
+    cursor = 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor)
+        if start == -1:
+            spans.append((-1, -1))
+            continue
+        spans.append((start, start + len(chunk)))
+        cursor = start + 1
+    return spans
+
+def chunk_metadatas(key, doc_info, text, chunks, articles, page_map=None):
+    """
+    Parça metadata'sı: kaynak kanun + parçanın kapsadığı maddeler (+ sayfalar)
+    + ham metindeki [char_start, char_end) aralığı.
+    'articles' alanı virgülle ayrılmış etiketlerdir ("Madde 20, Madde 21");
+    ChromaDB metadata değerleri sadece skaler olabilir.
+    page_map verilirse (join_pages çıktısı) 'page_start' / 'page_end' de yazılır.
+    """
+    metadatas = []
+    for start, end in chunk_spans(text, chunks):
+        meta = {"source": key, "doc_name": doc_info["name"]}
+        if start >= 0:
+            meta["char_start"], meta["char_end"] = start, end
+            meta["articles"] = ", ".join(articles_in_span(articles, start, end))
+            if page_map and page_map[0]:
+                meta["page_start"], meta["page_end"] = page_range(page_map, start, end)
+        metadatas.append(meta)
+    return metadatas
+
+def file_sha256(path):
+    """Dosyanın içerik özeti (PDF değişti mi?)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_ids(key, chunks):
+    """
+    İçerikten türetilen chunk ID'leri: "<kanun>_<sha256[:16]>".
+    Aynı metin aynı ID'yi alır; böylece değişmeyen parçalar yeniden vektörleştirilmez.
+    Belge içinde birebir aynı parça birden çok kez geçerse sıra eki eklenir ("_2").
+    """
+    ids = []
+    seen = {}
+    for chunk in chunks:
+        base = f"{key}_{content_hash(chunk)[:16]}"
+        seen[base] = seen.get(base, 0) + 1
+        ids.append(base if seen[base] == 1 else f"{base}_{seen[base]}")
+    return ids
+
+def ingest_settings():
+    """
+    Parçaları ve vektörleri etkileyen ayarlar. Chunk ayarları değişirse kaynak
+    yeniden okunur (aynı kalan parçalar yine atlanır); embedding modeli veya hedef
+    veritabanı değişirse ilgili koleksiyon tamamen yeniden oluşturulur.
+    """
+    return {
+        "chunk_size": config.CHUNK_SIZE,
+        "chunk_overlap": config.CHUNK_OVERLAP,
+        "embedding_model": config.EMBEDDING_MODEL,
+        "metadata_version": METADATA_VERSION,
+        "vector_backend": config.VECTOR_BACKEND,
+        "target": config.LOCAL_INDEX_DIR if config.VECTOR_BACKEND == "local" else config.CHROMA_HOST,
+    }
+
+def load_manifest():
+    if not os.path.exists(config.INGEST_MANIFEST_PATH):
+        return {}
+    with open(config.INGEST_MANIFEST_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    os.makedirs(os.path.dirname(config.INGEST_MANIFEST_PATH), exist_ok=True)
+    tmp_path = f"{config.INGEST_MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, config.INGEST_MANIFEST_PATH)
+
+class StageTimer:
+    """
+    Aşama bazlı süre ölçümü (ingestion sonunda rapor basılır).
+    Paralel aşamalarda (embedding, PDF okuma) toplam süre duvar saatini aşabilir;
+    bu, o aşamaya harcanan toplam iş süresidir.
+    """
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self.started = time.perf_counter()
+
+    def add(self, stage, seconds, count=1):
+        self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + count
+
+    @contextmanager
+    def measure(self, stage, count=1):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started, count)
+
+    def report(self):
+        wall = time.perf_counter() - self.started
+        print("\n⏱️ Ingestion süre raporu")
+        print(f"{'Aşama':<10}{'Süre (sn)':>12}{'Adet':>8}")
+        for stage, seconds in self.totals.items():
+            print(f"{stage:<10}{seconds:>12.2f}{self.counts[stage]:>8}")
+        print(f"{'toplam':<10}{wall:>12.2f}  (duvar saati)")
+        return {"wall": wall, **self.totals}
+
+def prepare_document(key, doc_info, pdf_hash=None):
+    """
+    Extract + Transform (Süreç havuzunda çalışır)
+    ---------------------------------------------
+    PDF okuma, parçalama ve madde ayrıştırma CPU yoğundur; her belge ayrı bir
+    süreçte işlenir. Embedding ve veritabanı işleri ana süreçte kalır.
+
+    PDF metni önbellekten (load_pdf_pages) gelir; maddeler ve parçalar sayfa
+    aralıklarıyla işaretlenir.
+
+    Çıktı: {"key", "chunks", "ids", "metadatas", "articles", "timings"}
+    Dosya okunamazsa "chunks" boş liste döner.
+    """
+    timings = {}
+    started = time.perf_counter()
+    pages = load_pdf_pages(doc_info["path"], pdf_hash) or []
+    raw_text, *page_map = join_pages(pages)
+    timings["extract"] = time.perf_counter() - started
+    if not raw_text:
+        return {"key": key, "chunks": [], "ids": [], "metadatas": [], "articles": [], "timings": timings}
+
+    started = time.perf_counter()
+    # Metni parçalara böl (Chunking)
+    chunks = chunk_text(raw_text)
+    # Metni maddelerine ayrıştır (Madde / Ek Madde / Geçici Madde)
+    articles = parse_articles(key, raw_text)
+    for article in articles:
+        article["page_start"], article["page_end"] = page_range(page_map, article["start"], article["end"])
+    # İçerikten türetilen benzersiz ID ve Metadata
+    # (Örn: source='kmk', articles='Madde 20, Madde 21')
+    ids = chunk_ids(key, chunks)
+    metadatas = chunk_metadatas(key, doc_info, raw_text, chunks, articles, page_map)
+    timings["chunk"] = time.perf_counter() - started
+    return {"key": key, "chunks": chunks, "ids": ids, "metadatas": metadatas,
+            "articles": articles, "timings": timings}
+
+def embedding_batches(ids, documents):
+    """
+    Parçaları embedding isteklerine böler. Her istek hem parça sayısı
+    (INGEST_BATCH_SIZE) hem de toplam karakter (INGEST_BATCH_CHARS) ile sınırlıdır;
+    böylece büyük yönetmelikler tek seferde token limitine takılmaz.
+    """
+    batch, chars = [], 0
+    for id_, doc in zip(ids, documents):
+        if batch and (len(batch) >= config.INGEST_BATCH_SIZE or chars + len(doc) > config.INGEST_BATCH_CHARS):
+            yield batch
+            batch, chars = [], 0
+        batch.append(id_)
+        chars += len(doc)
+    if batch:
+        yield batch
+
+def embed_with_retry(embedding_fn, texts):
+    """
+    Tek bir embedding isteği; hata alınırsa üstel bekleme (exponential backoff +
+    jitter) ile INGEST_MAX_RETRIES kez tekrar dener. Çıktı: (vektörler, süre)
+    """
+    started = time.perf_counter()
+    for attempt in range(config.INGEST_MAX_RETRIES):
+        try:
+            return embedding_fn(texts), time.perf_counter() - started
+        except Exception as e:
+            if attempt == config.INGEST_MAX_RETRIES - 1:
+                raise
+            delay = config.INGEST_RETRY_DELAY * (2 ** attempt) * (1 + random.random() * 0.25)
+            print(f"⚠️ Embedding hatası ({e}); {delay:.1f} sn sonra tekrar denenecek...")
+            time.sleep(delay)
+
+def upload_chunks(collection, embedding_fn, embedder, ids, documents, metadatas, timer, progress=None):
+    """
+    Yeni parçaları toplu (batch) embedding ile yükler.
+    Embedding istekleri 'embedder' havuzunda (en fazla INGEST_EMBED_CONCURRENCY
+    eşzamanlı) çalışır; biten her batch beklemeden veritabanına yazılır.
+    progress verilirse yazılan parça sayısı progress["added"]'a eklenir.
+
+    Bir batch hata verirse henüz başlamamış embedding istekleri iptal edilir;
+    o an çalışmakta olanlar bitince yine yazılır (bir sonraki çalıştırma sadece
+    eksik parçaları vektörleştirir). Tüm yazımlar bittikten sonra ilk hata yükseltilir.
+    """
+    records = {i: (d, m) for i, d, m in zip(ids, documents, metadatas)}
+    futures = {
+        embedder.submit(embed_with_retry, embedding_fn, [records[i][0] for i in batch]): batch
+        for batch in embedding_batches(ids, documents)
+    }
+    error = None
+    for future in as_completed(futures):
+        if future.cancelled():
+            continue
+        batch = futures[future]
+        try:
+            embeddings, seconds = future.result()
+            timer.add("embed", seconds)
+            with timer.measure("write"):
+                collection.add(
+                    ids=batch,
+                    documents=[records[i][0] for i in batch],
+                    metadatas=[records[i][1] for i in batch],
+                    embeddings=embeddings
+                )
+        except Exception as e:
+            if error is None:
+                error = e
+                for pending in futures:
+                    pending.cancel()
+            continue
+        if progress is not None:
+            progress["added"] += len(batch)
+    if error is not None:
+        raise error
+
+def sync_collection(collection, embedding_fn, embedder, prepared, previous_chunks, timer, progress=None):
+    """
+    Koleksiyonu hedef parça listesine eşitler (sadece fark kadar iş yapar):
+    - Yeni ID'ler        → embedding + ekleme (upload_chunks)
+    - İçeriği aynı, metadata'sı değişen ID'ler → sadece metadata güncelleme (embedding yok)
+    - Artık olmayan ID'ler → silme
+
+    Sıra önemlidir: eskimiş parçalar ancak yeni parçalar başarıyla yüklendikten
+    sonra silinir. Yükleme yarıda kalırsa koleksiyonda eski metin kalır (boşluk oluşmaz)
+    ve bir sonraki çalıştırma eksik parçalardan devam eder.
+
+    Herhangi bir yazım yapıldıysa (hata olsa bile) koleksiyon metadata'sına yeni bir
+    ingest_version yazılır (answer_cache.mark_ingested); çalışan sunucular anlamsal
+    cevap önbelleklerini bununla geçersiz kılar.
+
+    previous_chunks: Manifest'teki {id: metadata_hash} (önceki yükleme)
+    progress: Verilirse {"added", "deleted", "updated"} yazım yapıldıkça güncellenir;
+              hata durumunda çağıran, koleksiyonun değişip değişmediğini buradan görür.
+    Çıktı: (eklenen, silinen, güncellenen) sayıları
+    """
+    if progress is None:
+        progress = {"added": 0, "deleted": 0, "updated": 0}
+    ids, chunks, metadatas = prepared["ids"], prepared["chunks"], prepared["metadatas"]
+    existing_ids = set(collection.get(include=[])["ids"])
+    target = dict(zip(ids, zip(chunks, metadatas)))
+
+    new_ids = [i for i in ids if i not in existing_ids]
+    stale_ids = [i for i in existing_ids if i not in target]
+    changed_ids = [
+        i for i in ids
+        if i in existing_ids and previous_chunks.get(i) != content_hash(json.dumps(target[i][1], sort_keys=True))
+    ]
+
+    try:
+        if new_ids:
+            upload_chunks(
+                collection, embedding_fn, embedder, new_ids,
+                [target[i][0] for i in new_ids], [target[i][1] for i in new_ids], timer, progress
+            )
+        with timer.measure("write"):
+            if changed_ids:
+                collection.update(ids=changed_ids, metadatas=[target[i][1] for i in changed_ids])
+                progress["updated"] += len(changed_ids)
+            if stale_ids:
+                collection.delete(ids=stale_ids)
+                progress["deleted"] += len(stale_ids)
+    finally:
+        if any(progress.values()):
+            mark_ingested(collection)
+    return progress["added"], progress["deleted"], progress["updated"]
+
 def ingest_all_docs(force_recreate=False):
     """
-    ETL SÜRECİ (Extract - Transform - Load)
-    ---------------------------------------
+    ETL SÜRECİ (Extract - Transform - Load) — Artımlı ve Paralel
+    -------------------------------------------------------------
     Tüm tanımlı hukuk kaynaklarını (config.LEGAL_DOCS) işler ve Vektör Veritabanına yükler.
     
     Adımlar:
-    1. Extract: PDF dosyasını oku.
-    2. Transform: Metni anlamlı parçalara (chunks) böl.
-    3. Load: Parçaları vektöre çevir ve ChromaDB'ye kaydet.
+    1. Kontrol: PDF özeti manifest ile karşılaştırılır, değişmeyen kaynaklar atlanır.
+    2. Extract + Transform: Değişen PDF'ler süreç havuzunda (INGEST_WORKERS) okunur ve
+       parçalanır. Chunk ID'leri içerikten türetilir.
+    3. Load: Biten her belgenin sadece yeni parçaları, boyutu sınırlı batch'ler halinde
+       ve sınırlı eşzamanlılıkla (INGEST_EMBED_CONCURRENCY) vektörleştirilir; her batch
+       hazır olur olmaz veritabanına yazılır. Eskimiş parçalar silinir.
+    4. Rapor: Aşama bazlı süreler (hash, extract, chunk, embed, write, index) yazdırılır.
+
+    Manifest (config.INGEST_MANIFEST_PATH): Her kaynak için PDF özeti, ayarlar ve
+    {chunk_id: metadata_özeti}. PDF ve ayarlar değişmediyse kaynak hiç okunmaz.
+    Tek bir yönetmelik güncellendiğinde sadece onun değişen parçaları vektörleştirilir.
     
     Parametre:
     - force_recreate (bool): True ise var olan veritabanını silip sıfırdan oluşturur.
+
+    Çıktı: Aşama süreleri (dict)
     """
-    client = utils.get_chroma_client()
+    timer = StageTimer()
+    client = utils.get_vector_client()
     embedding_fn = utils.get_embedding_function()
+    article_index = ArticleIndex.load(config.ARTICLE_INDEX_PATH)
+    manifest = load_manifest()
+    settings = ingest_settings()
+    jobs = {}
     
-    # Config dosyasındaki her bir kanun tanımı için döngü
+    # --- 1. ADIM: Hangi kaynaklar değişti? (Sıralı, ucuz) ---
     for key, doc_info in config.LEGAL_DOCS.items():
         col_name = doc_info["collection"]
         pdf_path = doc_info["path"]
+        previous = manifest.get(key, {})
+
+        # Embedding modeli / hedef veritabanı değiştiyse eski vektörler kullanılamaz
+        previous_settings = previous.get("settings", {})
+        recreate = force_recreate or any(
+            previous_settings.get(name) != settings[name]
+            for name in ("embedding_model", "vector_backend", "target")
+        ) and bool(previous)
         
-        # 1. TEMİZLİK: Eğer 'force_recreate=True' ise eski veriyi sil
-        if force_recreate:
+        # Temizlik: Sıfırdan oluşturulacaksa eski veriyi sil
+        if recreate:
             try:
                 client.delete_collection(col_name)
                 print(f"🗑️ Koleksiyon silindi: {col_name}")
             except:
                 pass # Zaten yoksa hata verme, devam et
+            previous = {}
 
-        # 2. HAZIRLIK: Koleksiyonu (Tabloyu) getir veya oluştur
+        # Hazırlık: Koleksiyonu (Tabloyu) getir veya oluştur
         collection = client.get_or_create_collection(
             name=col_name,
             embedding_function=embedding_fn
         )
 
-        # 3. KONTROL: Veri zaten var mı? Varsa tekrar yükleme yapma 
-        if collection.count() == 0 or force_recreate:
-            print(f"📖 Okunuyor: {doc_info['name']}...")
-            raw_text = load_pdf(pdf_path)
-            
-            if raw_text:
-                # Metni parçalara böl (Chunking)
-                chunks = chunk_text(raw_text)
-                
-                # Her parçaya benzersiz ID ve Metadata ver
-                ids = [f"{key}_{i}" for i in range(len(chunks))]
-                
-                # Metadata: Bu parça hangi kitaptan geldi? (Örn: source='kmk')
-                metadatas = [{"source": key, "doc_name": doc_info["name"]} for _ in chunks]
-                
-                # Veritabanına kaydet
-                collection.add(documents=chunks, ids=ids, metadatas=metadatas)
-                print(f"✅ Yüklendi: {doc_info['name']} ({len(chunks)} parça)")
-            else:
-                print(f"❌ Dosya okunamadı veya boş: {pdf_path}")
-        else:
-            print(f"⏭️ Zaten yüklü: {doc_info['name']}")
+        if not os.path.exists(pdf_path):
+            print(f"❌ Dosya bulunamadı: {pdf_path}")
+            continue
+
+        # PDF ve ayarlar değişmediyse ve koleksiyon eksiksizse atla
+        with timer.measure("hash"):
+            pdf_hash = file_sha256(pdf_path)
+        if (previous.get("pdf_sha256") == pdf_hash
+                and previous.get("settings") == settings
+                and collection.count() == len(previous.get("chunks", {}))):
+            print(f"⏭️ Değişiklik yok: {doc_info['name']}")
+            continue
+        jobs[key] = (collection, pdf_hash, previous)
+
+    # --- 2. ve 3. ADIM: Paralel okuma/parçalama → batch embedding → veritabanı ---
+    if jobs:
+        workers = max(1, min(config.INGEST_WORKERS, len(jobs)))
+        with ProcessPoolExecutor(max_workers=workers) as pool, \
+                ThreadPoolExecutor(max_workers=config.INGEST_EMBED_CONCURRENCY) as embedder:
+            futures = {}
+            for key in jobs:
+                print(f"📖 Okunuyor: {config.LEGAL_DOCS[key]['name']}...")
+                futures[pool.submit(prepare_document, key, config.LEGAL_DOCS[key], jobs[key][1])] = key
+
+            # Belgeler bittikçe yükle (okuması süren belgeleri beklemeden)
+            for future in as_completed(futures):
+                key = futures[future]
+                doc_info = config.LEGAL_DOCS[key]
+                collection, pdf_hash, previous = jobs[key]
+                col_name = doc_info["collection"]
+                prepared = future.result()
+                for stage, seconds in prepared["timings"].items():
+                    timer.add(stage, seconds)
+                if not prepared["chunks"]:
+                    print(f"❌ Dosya okunamadı veya boş: {doc_info['path']}")
+                    continue
+
+                progress = {"added": 0, "deleted": 0, "updated": 0}
+                try:
+                    # Veritabanını eşitle (sadece fark kadar embedding)
+                    added, deleted, updated = sync_collection(
+                        collection, embedding_fn, embedder, prepared, previous.get("chunks", {}), timer, progress
+                    )
+                except Exception as e:
+                    # Manifest ve madde indeksi güncellenmez; bir sonraki çalıştırma eksik
+                    # parçalardan devam eder. Yarıda kalan yazımlar da sürümü değiştirir
+                    # (sync_collection), çalışan sunucuların önbelleği yine geçersiz kılınır.
+                    print(f"❌ Yükleme hatası ({doc_info['name']}): {e}")
+                    continue
+
+                # Maddeler ancak koleksiyon eşitlendikten sonra yayımlanır
+                article_index.set_law(key, prepared["articles"])
+
+                with timer.measure("index"):
+                    # Hibrit arama için aynı parçalardan BM25 sözcük indeksi
+                    LexicalIndex.build(prepared["ids"], prepared["chunks"], prepared["metadatas"]).save(
+                        index_path(config.LEXICAL_INDEX_DIR, col_name)
+                    )
+
+                manifest[key] = {
+                    "pdf_sha256": pdf_hash,
+                    "settings": settings,
+                    "chunks": {
+                        i: content_hash(json.dumps(m, sort_keys=True))
+                        for i, m in zip(prepared["ids"], prepared["metadatas"])
+                    },
+                }
+                save_manifest(manifest)
+
+                print(f"✅ {doc_info['name']}: {len(prepared['chunks'])} parça, {len(prepared['articles'])} madde "
+                      f"(+{added} yeni, -{deleted} silinen, ~{updated} güncellenen)")
+
+    # Madde indeksini kaydet (ajanın 'get_article' aracı buradan okur)
+    with timer.measure("index"):
+        article_index.save(config.ARTICLE_INDEX_PATH)
+
+    # --- 4. ADIM: Süre raporu ---
+    return timer.report()
+
+def build_lexical_indexes():
+    """
+    Var olan koleksiyonlardan BM25 sözcük indekslerini (yeniden) oluşturur.
+    PDF okuma ve embedding gerektirmez; vektör veritabanındaki parçalar kullanılır.
+    """
+    client = utils.get_vector_client()
+    for doc_info in config.LEGAL_DOCS.values():
+        col_name = doc_info["collection"]
+        index = LexicalIndex.build_from_collection(client.get_collection(col_name))
+        index.save(index_path(config.LEXICAL_INDEX_DIR, col_name))
+        print(f"🔤 Sözcük indeksi oluşturuldu: {col_name} ({len(index.ids)} parça)")
 
 if __name__ == "__main__":
-    # Tek başına çalıştırılırsa verileri tazeler
-    ingest_all_docs(force_recreate=True)
+    # Tek başına çalıştırılırsa verileri (artımlı olarak) tazeler
+    ingest_all_docs()
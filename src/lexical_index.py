@@ -0,0 +1,169 @@
+"""
+lexical_index.py — Türkçe Uyumlu BM25 Sözcük İndeksi
+=====================================================
+Hukuki sorular çoğu zaman birebir terimlere dayanır ("kırmızı etiket",
+"yönetim planı", "Madde 18"). Saf embedding benzerliği bunları bazen kaçırır.
+Bu modül her koleksiyon için ingestion sırasında bir ters indeks (inverted index)
+kurar; sorgu anında vektör aramasıyla birlikte çalışır ve sonuçlar
+Reciprocal Rank Fusion (RRF) ile birleştirilir.
+
+Türkçe işleme:
+- Büyük/küçük harf: "İ" -> "i", "I" -> "ı" (Python'un lower()'ı bunu yanlış yapar)
+- Şapkalı harfler: "â" -> "a", "î" -> "i", "û" -> "u"
+- Hafif ek atma (suffix stripping): "aidatını" -> "aidat", "maliklerinin" -> "malik"
+
+Sözcük araması embedding isteğine göre neredeyse bedavadır; embedding API'si
+yavaş/erişilemez olduğunda tek başına yedek (fallback) arama olarak da kullanılır.
+
+Disk formatı: <LEXICAL_INDEX_DIR>/<koleksiyon>.json.gz
+"""
+
+import gzip
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+_FOLD_MAP = str.maketrans({"İ": "i", "I": "ı", "Â": "a", "â": "a", "Î": "i", "î": "i", "Û": "u", "û": "u"})
+_TOKEN = re.compile(r"\w+")
+
+# Anlam taşımayan sık kelimeler (arama puanını bozmasınlar)
+STOPWORDS = {
+    "ve", "veya", "ile", "bu", "şu", "o", "bir", "için", "da", "de", "ki", "mi", "mı",
+    "mu", "mü", "ne", "gibi", "olarak", "olan", "ise", "daha", "en", "her", "hangi",
+    "nasıl", "neden", "kadar", "ya", "ama", "fakat", "göre", "dair", "ilişkin",
+}
+
+# Uzundan kısaya; kök en az MIN_STEM harf kalacak şekilde tekrar tekrar atılır
+SUFFIXES = sorted({
+    "larının", "lerinin", "larına", "lerine", "larını", "lerini", "larında", "lerinde",
+    "lardan", "lerden", "ları", "leri", "lar", "ler",
+    "ının", "inin", "unun", "ünün", "nın", "nin", "nun", "nün",
+    "ında", "inde", "unda", "ünde", "nda", "nde", "dan", "den", "tan", "ten",
+    "ını", "ini", "unu", "ünü", "yla", "yle", "sı", "si", "su", "sü", "lı", "li", "lu", "lü",
+    "ın", "in", "un", "ün", "da", "de", "ta", "te", "ya", "ye", "yı", "yi", "yu", "yü",
+    "na", "ne", "a", "e", "ı", "i", "u", "ü",
+}, key=len, reverse=True)
+MIN_STEM = 4
+
+
+def turkish_fold(text):
+    """Türkçe kurallarına uygun küçük harfe çevirme."""
+    return text.translate(_FOLD_MAP).lower()
+
+
+def stem(token):
+    """Hafif ek atma. Sayılar ve kısa kelimeler olduğu gibi kalır."""
+    if token.isdigit():
+        return token
+    for _ in range(3):
+        for suffix in SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+                token = token[:-len(suffix)]
+                break
+        else:
+            break
+    return token
+
+
+def tokenize(text):
+    """Metni indeks terimlerine çevirir."""
+    return [stem(t) for t in _TOKEN.findall(turkish_fold(text)) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 TERS İNDEKSİ
+    -----------------
+    Parça metinleri ve metadata'ları da indekste tutulur; böylece vektör
+    veritabanına gitmeden (fallback modunda) tam sonuç döndürülebilir.
+    """
+
+    def __init__(self, ids, documents, metadatas, postings, doc_lengths, k1=1.5, b=0.75):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.postings = postings          # term -> [[doc_idx, tf], ...]
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+    @classmethod
+    def build(cls, ids, documents, metadatas=None):
+        """Parçalardan indeks oluşturur (ingestion sırasında)."""
+        postings = defaultdict(list)
+        doc_lengths = []
+        for doc_idx, doc in enumerate(documents):
+            terms = tokenize(doc)
+            doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings[term].append([doc_idx, tf])
+        return cls(list(ids), list(documents), list(metadatas or [{}] * len(ids)), dict(postings), doc_lengths)
+
+    @classmethod
+    def build_from_collection(cls, collection):
+        """Var olan bir vektör koleksiyonundaki parçalardan indeks oluşturur."""
+        data = collection.get(include=["documents", "metadatas"])
+        return cls.build(data["ids"], data["documents"], data["metadatas"])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["ids"], data["documents"], data["metadatas"], data["postings"], data["doc_lengths"])
+
+    def search(self, query, k):
+        """
+        BM25 ile en iyi k parçayı döndürür.
+        Çıktı: [(doc_idx, puan), ...] (puana göre azalan)
+        """
+        n_docs = len(self.ids)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_idx] / self.avg_length)
+                scores[doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def result(self, doc_idx):
+        """Bir parçayı arama sonucu formatında döndürür."""
+        return {
+            "id": self.ids[doc_idx],
+            "content": self.documents[doc_idx],
+            "metadata": self.metadatas[doc_idx],
+        }
+
+
+def index_path(index_dir, collection_name):
+    return os.path.join(index_dir, f"{collection_name}.json.gz")
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Birden çok sıralamayı birleştirir: puan(d) = Σ 1 / (k + sıra(d)).
+    Girdi: [[id, ...], [id, ...]] — Çıktı: birleşik puana göre sıralı id listesi
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking):
+            scores[id_] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,419 @@
+"""
+local_index.py — Gömülü (In-Process) Vektör İndeksi
+====================================================
+Uzak ChromaDB sunucusuna alternatif, süreç içinde çalışan vektör deposu.
+Korpus küçüktür (6 PDF, birkaç yüz parça); her aramada ağ turu ödemek yerine
+vektörler diskten bellek eşlemeli (memory-mapped) okunur ve arama NumPy ile yapılır.
+
+Disk düzeni (her koleksiyon için bir klasör):
+    <LOCAL_INDEX_DIR>/<koleksiyon>/
+        embeddings-<sürüm>.npy → (n, d) float32 matris (np.load(mmap_mode="r") ile açılır;
+                                 aynı makinedeki tüm uvicorn worker'ları sayfa önbelleğini paylaşır)
+        records.json           → {"embeddings": "embeddings-<sürüm>.npy",
+                                  "ids": [...], "documents": [...], "metadatas": [...]}
+        collection.json        → Koleksiyon metadata'sı
+
+Her yazımda matris YENİ bir dosyaya yazılır, ardından records.json atomik
+olarak değiştirilir. records.json hangi matris dosyasının geçerli olduğunu
+gösteren işaretçidir; okuyan bir süreç yeni kayıtları eski matrisle (veya
+tersini) hiçbir zaman eşleştiremez.
+
+ChromaDB istemcisiyle aynı arayüzü (get_collection, query, add, ...) sunar;
+LegalRAGTool ve ingestion hangi backend'in kullanıldığını bilmez.
+Seçim: config.VECTOR_BACKEND = "local"
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+import numpy as np
+
+EMBEDDINGS_FILE = "embeddings.npy"  # Sürümsüz eski düzen (records.json'da "embeddings" alanı yoksa)
+EMBEDDINGS_PREFIX = "embeddings"
+RECORDS_FILE = "records.json"
+COLLECTION_FILE = "collection.json"
+LOAD_RETRIES = 5  # Eşzamanlı yazım sırasında okunan tutarsız dosyalar için tekrar sayısı
+
+
+def _atomic_write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """
+    Bir koleksiyonun yüklenmiş hali. Hiç değiştirilmez: yeniden yükleme yeni bir
+    anlık görüntü oluşturur ve tek bir atamayla yerine koyar. Okuyucular anlık
+    görüntüyü başta bir kez alır; yükleme sırasında alanları karışık okuyamazlar.
+    """
+    version: object
+    ids: list
+    documents: list
+    metadatas: list
+    matrix: np.ndarray
+    sq_norms: np.ndarray  # L2 mesafesi için satır normlarının karesi
+    index: dict           # id -> satır
+
+
+class LocalCollection:
+    """
+    TEKİL KOLEKSİYON
+    ----------------
+    Okuma yolu kilitsizdir: matris ve kayıtlar bellekte değişmez bir anlık
+    görüntüde (_Snapshot) tutulur, dosya değişirse (başka bir süreç ingestion
+    yaptıysa) bir sonraki sorguda yeniden yüklenir.
+    """
+
+    def __init__(self, name, path, embedding_function=None):
+        self.name = name
+        self.path = path
+        self.embedding_function = embedding_function
+        self._lock = threading.Lock()
+        self._metadata = ({}, None)  # (metadata, collection.json sürümü)
+        self._load()
+
+    # --- Yükleme ---
+    def _file_version(self):
+        """
+        records.json her yazımda yeni bir dosyayla değiştirilir: (mtime, inode) ikilisi,
+        aynı zaman diliminde (kaba mtime çözünürlüğü) yapılan iki yazımı da ayırt eder.
+        """
+        try:
+            stat = os.stat(os.path.join(self.path, RECORDS_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _read_files(self):
+        """
+        records.json'u ve işaret ettiği matrisi okur.
+        Başka bir süreç tam o sırada yazıyorsa (işaret edilen matris silinmiş veya
+        satır sayısı tutmuyor) kısa bir beklemeyle baştan okur.
+        Çıktı: (sürüm, kayıtlar, matris)
+        """
+        for attempt in range(LOAD_RETRIES):
+            version = self._file_version()
+            if version is None:
+                return None, {"ids": [], "documents": [], "metadatas": []}, np.zeros((0, 0), dtype=np.float32)
+            try:
+                with open(os.path.join(self.path, RECORDS_FILE), "r", encoding="utf-8") as f:
+                    records = json.load(f)
+                matrix_file = records.get("embeddings", EMBEDDINGS_FILE)
+                matrix = np.load(os.path.join(self.path, matrix_file), mmap_mode="r")
+                if matrix.shape[0] == len(records["ids"]):
+                    return version, records, matrix
+                error = ValueError(
+                    f"'{self.name}' koleksiyonunda kayıt ({len(records['ids'])}) ve "
+                    f"vektör ({matrix.shape[0]}) sayısı uyuşmuyor."
+                )
+            except (FileNotFoundError, json.JSONDecodeError) as e:
+                error = e
+            time.sleep(0.05 * (attempt + 1))
+        raise error
+
+    @property
+    def metadata(self):
+        """
+        Koleksiyon metadata'sı. collection.json başka bir süreç tarafından
+        değiştirildiyse (ör. ingestion'ın yazdığı ingest_version) yeniden okunur.
+        """
+        meta_path = os.path.join(self.path, COLLECTION_FILE)
+        try:
+            stat = os.stat(meta_path)
+            version = stat.st_mtime_ns, stat.st_ino
+        except FileNotFoundError:
+            return {}
+        metadata, loaded_version = self._metadata
+        if version != loaded_version:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            self._metadata = (metadata, version)
+        return metadata
+
+    def _load(self):
+        """Dosyaları (yeniden) yükler. Matris kopyalanmaz, bellek eşlemeli açılır."""
+        version, records, matrix = self._read_files()
+        ids = records["ids"]
+        self._snapshot = _Snapshot(
+            version=version,
+            ids=ids,
+            documents=records["documents"],
+            metadatas=records["metadatas"],
+            matrix=matrix,
+            # Tek sefer hesaplanır
+            sq_norms=np.einsum("ij,ij->i", matrix, matrix) if len(ids) else np.zeros(0),
+            index={id_: i for i, id_ in enumerate(ids)},
+        )
+
+    def _current(self):
+        """Güncel anlık görüntü. Dosya başka bir süreç tarafından değiştirildiyse önce yeniden yükler."""
+        if self._file_version() != self._snapshot.version:
+            with self._lock:
+                self._refresh_unlocked()
+        return self._snapshot
+
+    def _refresh_unlocked(self):
+        if self._file_version() != self._snapshot.version:
+            self._load()
+        return self._snapshot
+
+    def _save(self, ids, documents, metadatas, matrix):
+        """
+        Tüm koleksiyonu atomik olarak yeniden yazar: vektörler yeni sürümlü bir
+        dosyaya yazılır, sonra records.json (işaretçi) tek adımda değiştirilir.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        matrix_file = f"{EMBEDDINGS_PREFIX}-{uuid.uuid4().hex[:12]}.npy"
+        tmp_path = os.path.join(self.path, f"{matrix_file}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        os.replace(tmp_path, os.path.join(self.path, matrix_file))
+        _atomic_write_json(
+            os.path.join(self.path, RECORDS_FILE),
+            {"embeddings": matrix_file, "ids": ids, "documents": documents, "metadatas": metadatas}
+        )
+        self._load()
+        self._remove_stale_matrices(matrix_file)
+
+    def _remove_stale_matrices(self, current):
+        """
+        Artık işaret edilmeyen matris dosyalarını siler. Eski matrisi bellek
+        eşlemeli açmış okuyucular etkilenmez (POSIX); silinemeyen dosya (Windows'ta
+        açık dosya) bir sonraki yazımda tekrar denenir.
+        """
+        for name in os.listdir(self.path):
+            if name.startswith(EMBEDDINGS_PREFIX) and name.endswith(".npy") and name != current:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+    def _embed(self, documents):
+        if self.embedding_function is None:
+            raise ValueError(f"'{self.name}' koleksiyonu için embedding fonksiyonu tanımlı değil.")
+        return self.embedding_function(documents)
+
+    # --- ChromaDB Uyumlu Arayüz ---
+    def count(self):
+        return len(self._current().ids)
+
+    def modify(self, metadata=None, **kwargs):
+        if metadata is not None:
+            os.makedirs(self.path, exist_ok=True)
+            _atomic_write_json(os.path.join(self.path, COLLECTION_FILE), metadata)
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        """Var olan id'leri günceller, yenilerini ekler."""
+        if embeddings is None:
+            embeddings = self._embed(documents)
+        new_vectors = np.asarray(embeddings, dtype=np.float32)
+        documents = documents or [""] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+
+        with self._lock:
+            snapshot = self._refresh_unlocked()
+            all_ids = list(snapshot.ids)
+            all_docs = list(snapshot.documents)
+            all_metas = list(snapshot.metadatas)
+            matrix = np.array(snapshot.matrix) if len(all_ids) else np.zeros((0, new_vectors.shape[1]), dtype=np.float32)
+
+            rows = []
+            for id_, doc, meta, vector in zip(ids, documents, metadatas, new_vectors):
+                if id_ in snapshot.index:
+                    i = snapshot.index[id_]
+                    all_docs[i], all_metas[i] = doc, meta
+                    matrix[i] = vector
+                else:
+                    all_ids.append(id_)
+                    all_docs.append(doc)
+                    all_metas.append(meta)
+                    rows.append(vector)
+            if rows:
+                matrix = np.vstack([matrix, np.stack(rows)])
+            self._save(all_ids, all_docs, all_metas, matrix)
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        """
+        Var olan kayıtları günceller. Sadece metadata verilirse vektörler
+        yeniden hesaplanmaz (ChromaDB davranışıyla aynı).
+        """
+        with self._lock:
+            snapshot = self._refresh_unlocked()
+            positions = [snapshot.index[i] for i in ids]
+            all_docs = list(snapshot.documents)
+            all_metas = list(snapshot.metadatas)
+            matrix = np.array(snapshot.matrix)
+            if documents is not None and embeddings is None:
+                embeddings = self._embed(documents)
+            for n, pos in enumerate(positions):
+                if documents is not None:
+                    all_docs[pos] = documents[n]
+                if metadatas is not None:
+                    all_metas[pos] = metadatas[n]
+                if embeddings is not None:
+                    matrix[pos] = np.asarray(embeddings[n], dtype=np.float32)
+            self._save(list(snapshot.ids), all_docs, all_metas, matrix)
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        index = self._current().index
+        duplicates = [i for i in ids if i in index]
+        if duplicates:
+            raise ValueError(f"'{self.name}' koleksiyonunda zaten var olan id'ler: {duplicates[:5]}")
+        self.upsert(ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def delete(self, ids=None):
+        with self._lock:
+            snapshot = self._refresh_unlocked()
+            drop = set(ids or [])
+            keep = [i for i, id_ in enumerate(snapshot.ids) if id_ not in drop]
+            matrix = np.array(snapshot.matrix)[keep] if len(snapshot.ids) else snapshot.matrix
+            self._save(
+                [snapshot.ids[i] for i in keep],
+                [snapshot.documents[i] for i in keep],
+                [snapshot.metadatas[i] for i in keep],
+                matrix
+            )
+
+    def get(self, ids=None, include=("documents", "metadatas"), limit=None, offset=0):
+        snapshot = self._current()
+        if ids is None:
+            positions = list(range(len(snapshot.ids)))[offset:]
+            if limit is not None:
+                positions = positions[:limit]
+        else:
+            positions = [snapshot.index[i] for i in ids if i in snapshot.index]
+        return self._pack(snapshot, positions, include)
+
+    @staticmethod
+    def _pack(snapshot, positions, include, distances=None):
+        result = {"ids": [snapshot.ids[i] for i in positions]}
+        result["documents"] = [snapshot.documents[i] for i in positions] if "documents" in include else None
+        result["metadatas"] = [snapshot.metadatas[i] for i in positions] if "metadatas" in include else None
+        result["embeddings"] = np.asarray(snapshot.matrix[positions]) if "embeddings" in include else None
+        if distances is not None:
+            result["distances"] = distances
+        return result
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10,
+              include=("documents", "metadatas", "distances")):
+        """
+        En yakın n_results parçayı döndürür (ChromaDB'nin varsayılan 'l2' uzayıyla
+        aynı ölçü: karesi alınmış Öklid mesafesi). Tüm sorgular tek matris çarpımıdır.
+        """
+        snapshot = self._current()
+        if query_embeddings is None:
+            query_embeddings = self._embed(query_texts)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+
+        batch = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        if not snapshot.ids:
+            for _ in range(len(queries)):
+                for key in batch:
+                    batch[key].append([])
+            return batch
+
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2
+        scores = snapshot.matrix @ queries.T                   # (n, m)
+        q_norms = np.einsum("ij,ij->i", queries, queries)      # (m,)
+        distances = snapshot.sq_norms[:, None] - 2 * scores + q_norms[None, :]
+
+        k = min(n_results, len(snapshot.ids))
+        for col in range(distances.shape[1]):
+            column = distances[:, col]
+            top = np.argpartition(column, k - 1)[:k] if k < len(column) else np.arange(len(column))
+            top = top[np.argsort(column[top])]
+            packed = self._pack(snapshot, top.tolist(), include, [float(column[i]) for i in top])
+            for key in batch:
+                batch[key].append(packed.get(key))
+
+        for key in ("documents", "metadatas", "embeddings", "distances"):
+            if key not in include:
+                batch[key] = None
+        return batch
+
+
+class LocalVectorClient:
+    """
+    GÖMÜLÜ VEKTÖR İSTEMCİSİ
+    -----------------------
+    chromadb.HttpClient ile aynı koleksiyon yönetimi metotlarını sunar.
+    Koleksiyon nesneleri süreç içinde önbelleğe alınır.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._collections = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _collection_path(self, name):
+        return os.path.join(self.path, name)
+
+    def list_collections(self):
+        return sorted(
+            name for name in os.listdir(self.path)
+            if os.path.isdir(self._collection_path(name))
+        )
+
+    def get_collection(self, name, embedding_function=None):
+        if not os.path.isdir(self._collection_path(name)):
+            raise ValueError(f"Koleksiyon bulunamadı: {name} ({self.path})")
+        return self.get_or_create_collection(name, embedding_function=embedding_function)
+
+    def get_or_create_collection(self, name, embedding_function=None, metadata=None):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                os.makedirs(self._collection_path(name), exist_ok=True)
+                collection = LocalCollection(name, self._collection_path(name), embedding_function)
+                if metadata:
+                    collection.modify(metadata=metadata)
+                self._collections[name] = collection
+            elif embedding_function is not None:
+                collection.embedding_function = embedding_function
+            return collection
+
+    def delete_collection(self, name):
+        with self._lock:
+            self._collections.pop(name, None)
+            if not os.path.isdir(self._collection_path(name)):
+                raise ValueError(f"Koleksiyon bulunamadı: {name}")
+            shutil.rmtree(self._collection_path(name))
+
+
+def export_from_chroma(source_client, target_client, collection_names, batch_size=500):
+    """
+    Uzak ChromaDB'deki koleksiyonları (vektörleriyle birlikte) yerel indekse kopyalar.
+    Yeniden embedding yapılmaz; tek seferlik geçiş için kullanılır.
+    """
+    for name in collection_names:
+        source = source_client.get_collection(name)
+        total = source.count()
+        ids, documents, metadatas, embeddings = [], [], [], []
+        for offset in range(0, total, batch_size):
+            page = source.get(
+                include=["documents", "metadatas", "embeddings"],
+                limit=batch_size,
+                offset=offset
+            )
+            ids.extend(page["ids"])
+            documents.extend(page["documents"])
+            metadatas.extend(page["metadatas"])
+            embeddings.extend(page["embeddings"])
+
+        try:
+            target_client.delete_collection(name)
+        except ValueError:
+            pass
+        if ids:
+            target_client.get_or_create_collection(name).add(
+                ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings
+            )
+        print(f"📦 Yerel indekse kopyalandı: {name} ({len(ids)} parça)")
@@ -0,0 +1,284 @@
+"""
+metrics.py — Gecikme ve Token Ölçümleri (Prometheus)
+====================================================
+Ajanın her adımı için histogram ve sayaçlar tutar; app_api.py bunları
+/metrics endpoint'inde Prometheus formatında sunar.
+
+Ölçümler:
+- legal_rag_stage_latency_seconds{stage}: planning, embedding, generation, request
+- legal_rag_retrieval_latency_seconds{collection, mode}: koleksiyon başına arama süresi
+- legal_rag_retrieval_results{collection}: arama başına dönen parça sayısı (uyarlamalı TOP_K)
+- legal_rag_llm_tokens_total{call, kind}: planning/generation için prompt/completion token
+- legal_rag_request_tokens{kind}: istek başına token (maliyet dağılımı)
+- legal_rag_tool_calls_per_request / legal_rag_tool_calls_total{tool}
+- legal_rag_context_tokens{kind}: derlenmemiş (naive) / derlenmiş (packed) arama bağlamı token'ı
+- legal_rag_context_tokens_saved_total: bağlam derlemesiyle (context_packer) kazanılan token
+- legal_rag_cache_events_total{cache, result}: answer/embedding önbelleği isabet/ıskalama;
+  cache="inflight": devam eden aynı soruya bağlanan (hit) / yeni akış başlatan (miss) istekler
+- legal_rag_speculation_searches_total{result}: spekülatif arama — ön-aramayla karşılanan (hit) /
+  normal yapılan (miss) arama çağrıları; kullanılmayan ön-aramalar (unused)
+- legal_rag_speculation_saved_seconds: istek başına spekülatif aramayla kazanılan süre (tahmin)
+- legal_rag_requests_total{flow, outcome}
+- legal_rag_tracking_events_total{result}: MLflow yazıcısı (queued, sampled_out, dropped, written, failed)
+
+İstek İzi (RequestTrace):
+Her cevap akışı bir iz açar (traced dekoratörü). span() ile ölçülen adımlar hem
+histograma yazılır hem de o isteğin izine eklenir; istek bitince iz tek bir
+log satırı olarak yazılır ve dinleyicilere (ör. src/tracking.py) iletilir. İz, contextvars ile taşınır (asyncio görevleri ve
+asyncio.to_thread thread'leri aynı izi görür).
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+logger = logging.getLogger(__name__)
+
+# LLM çağrıları saniyeler sürer; arama ve embedding milisaniyeler
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+STAGE_LATENCY = Histogram(
+    "legal_rag_stage_latency_seconds", "Cevap akışındaki adımların süresi",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+RETRIEVAL_LATENCY = Histogram(
+    "legal_rag_retrieval_latency_seconds", "Koleksiyon başına arama süresi",
+    ["collection", "mode"], buckets=LATENCY_BUCKETS
+)
+RETRIEVAL_RESULTS = Histogram(
+    "legal_rag_retrieval_results", "Arama başına dönen parça sayısı",
+    ["collection"], buckets=(0, 1, 2, 3, 4, 6, 8, 10)
+)
+LLM_TOKENS = Counter(
+    "legal_rag_llm_tokens_total", "LLM token kullanımı (response.usage)", ["call", "kind"]
+)
+REQUEST_TOKENS = Histogram(
+    "legal_rag_request_tokens", "İstek başına toplam token", ["kind"], buckets=TOKEN_BUCKETS
+)
+TOOL_CALLS_PER_REQUEST = Histogram(
+    "legal_rag_tool_calls_per_request", "İstek başına araç çağrısı sayısı", buckets=(0, 1, 2, 3, 4, 6, 8)
+)
+CONTEXT_TOKENS = Histogram(
+    "legal_rag_context_tokens", "Nihai çağrıya giden arama bağlamı (token)", ["kind"], buckets=TOKEN_BUCKETS
+)
+CONTEXT_TOKENS_SAVED = Counter("legal_rag_context_tokens_saved_total", "Bağlam derlemesiyle kazanılan token")
+SPECULATION_SEARCHES = Counter(
+    "legal_rag_speculation_searches_total", "Spekülatif arama isabet/ıskalama", ["result"]
+)
+SPECULATION_SAVED = Histogram(
+    "legal_rag_speculation_saved_seconds", "Spekülatif aramayla kazanılan süre", buckets=LATENCY_BUCKETS
+)
+TOOL_CALLS = Counter("legal_rag_tool_calls_total", "Araç çağrıları", ["tool"])
+CACHE_EVENTS = Counter("legal_rag_cache_events_total", "Önbellek isabet/ıskalama", ["cache", "result"])
+REQUESTS = Counter("legal_rag_requests_total", "Cevaplanan istekler", ["flow", "outcome"])
+TRACKING_EVENTS = Counter("legal_rag_tracking_events_total", "MLflow istek kayıtları", ["result"])
+
+_current_trace = contextvars.ContextVar("legal_rag_trace", default=None)
+_finish_listeners = []  # fn(trace, outcome): biten her istek için çağrılır
+
+
+class RequestTrace:
+    """Tek bir isteğin adım süreleri, token kullanımı ve araç çağrıları."""
+    def __init__(self, flow, question=None):
+        self.flow = flow
+        self.question = question
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.tool_calls = 0
+        self.cache_hit = False
+        self.context = None  # context_packer istatistikleri
+        self.speculation = None  # speculation istatistikleri
+
+    def add_span(self, stage, seconds):
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def summary(self):
+        return {
+            "flow": self.flow,
+            "total": round(time.perf_counter() - self.started, 4),
+            "spans": {k: round(v, 4) for k, v in self.spans.items()},
+            "tokens": self.tokens,
+            "tool_calls": self.tool_calls,
+            "cache_hit": self.cache_hit,
+            "context": self.context,
+            "speculation": self.speculation,
+        }
+
+    def finish(self, outcome):
+        elapsed = time.perf_counter() - self.started
+        STAGE_LATENCY.labels("request").observe(elapsed)
+        REQUESTS.labels(self.flow, outcome).inc()
+        if not self.cache_hit:
+            TOOL_CALLS_PER_REQUEST.observe(self.tool_calls)
+            for kind, count in self.tokens.items():
+                REQUEST_TOKENS.labels(kind).observe(count)
+        logger.info(f"request_trace {json.dumps({**self.summary(), 'outcome': outcome})}")
+        for listener in _finish_listeners:
+            try:
+                listener(self, outcome)
+            except Exception as e:
+                logger.warning(f"İz dinleyicisi hata verdi: {e}")
+
+
+def add_finish_listener(listener):
+    """Biten her istek izinde çağrılacak fonksiyonu kaydeder: listener(trace, outcome)."""
+    _finish_listeners.append(listener)
+
+
+def current_trace():
+    """Aktif isteğin izi (istek dışında çağrılırsa None)."""
+    return _current_trace.get()
+
+
+def observe_stage(stage, seconds):
+    """Bir adımın süresini histograma ve (varsa) isteğin izine yazar."""
+    STAGE_LATENCY.labels(stage).observe(seconds)
+    trace = current_trace()
+    if trace:
+        trace.add_span(stage, seconds)
+
+
+@contextmanager
+def span(stage):
+    """Bir adımı ölçer (observe_stage)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def observe_retrieval(collection, mode, seconds, n_results=None):
+    RETRIEVAL_LATENCY.labels(collection, mode).observe(seconds)
+    if n_results is not None:
+        RETRIEVAL_RESULTS.labels(collection).observe(n_results)
+    trace = current_trace()
+    if trace:
+        trace.add_span("retrieval", seconds)
+
+
+def record_usage(call, usage):
+    """OpenAI response.usage değerlerini sayaçlara ve isteğin izine ekler."""
+    if usage is None:
+        return
+    prompt, completion = usage.prompt_tokens or 0, usage.completion_tokens or 0
+    LLM_TOKENS.labels(call, "prompt").inc(prompt)
+    LLM_TOKENS.labels(call, "completion").inc(completion)
+    trace = current_trace()
+    if trace:
+        trace.tokens["prompt"] += prompt
+        trace.tokens["completion"] += completion
+
+
+def record_tool_calls(tool_calls):
+    for tool_call in tool_calls:
+        TOOL_CALLS.labels(tool_call.function.name).inc()
+    trace = current_trace()
+    if trace:
+        trace.tool_calls += len(tool_calls)
+
+
+def record_context(stats):
+    """Bağlam derleme istatistikleri (context_packer.pack_context) — token tasarrufu."""
+    CONTEXT_TOKENS.labels("naive").observe(stats["naive_tokens"])
+    CONTEXT_TOKENS.labels("packed").observe(stats["packed_tokens"])
+    CONTEXT_TOKENS_SAVED.inc(stats["saved_tokens"])
+    trace = current_trace()
+    if trace:
+        trace.context = stats
+
+
+def record_speculation(stats):
+    """Spekülatif arama sonucu (speculation.Speculation.finish) — isabet oranı ve kazanılan süre."""
+    SPECULATION_SEARCHES.labels("hit").inc(stats["hits"])
+    SPECULATION_SEARCHES.labels("miss").inc(stats["misses"])
+    SPECULATION_SEARCHES.labels("unused").inc(stats["prefetched"] - stats["used"])
+    SPECULATION_SAVED.observe(stats["saved_seconds"])
+    trace = current_trace()
+    if trace:
+        trace.speculation = stats
+
+
+def record_cache(cache, hit, count=1):
+    if count:
+        CACHE_EVENTS.labels(cache, "hit" if hit else "miss").inc(count)
+    # Önbellekten veya devam eden bir akıştan cevaplanan istek kendi LLM çağrısını yapmaz
+    # (toplu istekte tek bir sorunun isabeti tüm isteği temsil etmez)
+    trace = current_trace()
+    if cache in ("answer", "inflight") and hit and count and trace and trace.flow != "batch":
+        trace.cache_hit = True
+
+
+def traced(flow):
+    """
+    Cevap akışını bir istek izi içinde çalıştırır (senkron, asenkron ve
+    asenkron generator fonksiyonlar için). İstek bitince/hata verince iz kapanır.
+    Metotlarda ilk argüman (self'ten sonra) kullanıcı sorusu olarak ize yazılır
+    (soru listesi verilirse — toplu istek — soru sayısı yazılır).
+    """
+    def _question(args, kwargs):
+        question = kwargs.get("user_query", kwargs.get("questions", args[1] if len(args) > 1 else None))
+        if isinstance(question, (list, tuple)):
+            return f"[{len(question)} soru]"
+        return question
+
+    def decorator(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def agen_wrapper(*args, **kwargs):
+                trace = RequestTrace(flow, _question(args, kwargs))
+                token = _current_trace.set(trace)
+                outcome = "error"
+                try:
+                    async for item in fn(*args, **kwargs):
+                        yield item
+                    outcome = "ok"
+                finally:
+                    try:
+                        _current_trace.reset(token)
+                    except ValueError:
+                        pass  # Generator başka bir context'te kapatıldı (ör. istemci bağlantıyı kesti)
+                    trace.finish(outcome)
+            return agen_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                trace = RequestTrace(flow, _question(args, kwargs))
+                token = _current_trace.set(trace)
+                outcome = "error"
+                try:
+                    result = await fn(*args, **kwargs)
+                    outcome = "ok"
+                    return result
+                finally:
+                    _current_trace.reset(token)
+                    trace.finish(outcome)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = RequestTrace(flow, _question(args, kwargs))
+            token = _current_trace.set(trace)
+            outcome = "error"
+            try:
+                result = fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                _current_trace.reset(token)
+                trace.finish(outcome)
+        return wrapper
+    return decorator
+
+
+def render():
+    """/metrics cevabı: (gövde, content-type)."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -4,9 +4,99 @@ rag_engine.py — Vektör Arama Motoru (Retriever)
 ChromaDB koleksiyonlarında semantik benzerlik araması yapar.
 Her kanun için ayrı bir LegalRAGTool nesnesi oluşturulur.
 
+Puanlar: Vektör sonuçları 'score' (kosinüs benzerliği), BM25 sonuçları
+'lexical_score' taşır. Koleksiyonlar ChromaDB'nin varsayılan 'l2' uzayındadır
+(karesi alınmış Öklid mesafesi); embedding'ler birim uzunlukta olduğundan
+benzerlik = 1 - mesafe / 2.
+
+Uyarlamalı TOP_K (config.ADAPTIVE_TOP_K): Her aramada TOP_K parça dönmez;
+benzerliği RETRIEVAL_MIN_SCORE'un altında kalan parçalar ve puanın
+RETRIEVAL_SCORE_GAP'ten fazla düştüğü noktadan sonrakiler atılır. Hiçbir
+parça eşiği geçemiyorsa (ör. yangın sorusu Anayasa'da) BM25 araması
+yapılmadan boş sonuç döner.
+
+MMR çeşitlendirmesi (config.MMR_ENABLED): Aynı maddenin örtüşen parçaları
+birlikte eşleştiğinde ilk TOP_K neredeyse aynı metinlerle dolar. Açıksa
+MMR_CANDIDATES aday, vektörleriyle birlikte getirilir ve Maximal Marginal
+Relevance ile yeniden sıralanır (mmr_select): her adımda sorguya benzer ama
+seçilmiş parçalara benzemeyen parça seçilir. Hibrit modda çeşitlendirilen,
+RRF'e giren vektör sıralamasıdır.
 """
 
-from src import config, utils
+import asyncio
+import os
+import threading
+import time
+import numpy as np
+from src import config, metrics, utils
+from src.answer_cache import ingest_version
+from src.lexical_index import LexicalIndex, index_path, reciprocal_rank_fusion
+
+
+def distance_to_score(distance):
+    """Birim vektörler arası karesi alınmış Öklid mesafesini kosinüs benzerliğine çevirir."""
+    return 1.0 - float(distance) / 2.0
+
+
+def adaptive_cutoff(scores, limit=None):
+    """
+    UYARLAMALI KESİM
+    ----------------
+    Girdi:
+    - scores: Azalan sırada vektör benzerlikleri
+    - limit: En fazla kaç parça alınacağı (varsayılan: config.TOP_K)
+
+    Çıktı: Alınacak parça sayısı (0: hiçbir parça RETRIEVAL_MIN_SCORE'u geçemedi).
+    Eşiğin altına inilen veya bir önceki puana göre RETRIEVAL_SCORE_GAP'ten
+    fazla düşülen ilk parçada durulur.
+    """
+    limit = limit or config.TOP_K
+    count = 0
+    for score in scores[:limit]:
+        if score < config.RETRIEVAL_MIN_SCORE:
+            break
+        if count and scores[count - 1] - score > config.RETRIEVAL_SCORE_GAP:
+            break
+        count += 1
+    return count
+
+
+def mmr_select(relevance, embeddings, k, lambda_mult=None):
+    """
+    MAXIMAL MARGINAL RELEVANCE
+    --------------------------
+    Girdi:
+    - relevance: Adayların sorguya benzerliği (n,)
+    - embeddings: Adayların vektörleri (n, boyut)
+    - k: Seçilecek aday sayısı
+    - lambda_mult: Alaka / çeşitlilik dengesi (1.0 = sadece alaka; varsayılan: config.MMR_LAMBDA)
+
+    Çıktı: Seçilen adayların indeksleri (seçim sırasıyla).
+    Adaylar arası benzerlik matrisi tek matris çarpımıyla hesaplanır; her adımda
+    puan = λ · alaka - (1 - λ) · seçilenlere en yüksek benzerlik.
+    """
+    lambda_mult = config.MMR_LAMBDA if lambda_mult is None else lambda_mult
+    relevance = np.asarray(relevance, dtype=np.float32)
+    k = min(k, len(relevance))
+    if k <= 0:
+        return []
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    similarity = vectors @ vectors.T                      # (n, n)
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()       # Her adayın seçilenlere en yüksek benzerliği
+    available = np.ones(len(relevance), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
 
 class LegalRAGTool:
     """
@@ -18,62 +108,296 @@ class LegalRAGTool:
     Kullanım Amacı:
     - Verilen soruyu (query) alır.
     - İlgili ChromaDB koleksiyonunda en yakın eşleşmeleri bulur.
+    - (Hibrit mod) Aynı sorguyu BM25 sözcük indeksinde de arar, sonuçları RRF ile birleştirir.
     - Bulunan içerikleri LLM'in anlayacağı formata çevirir.
+    - (Uyarlamalı TOP_K) Alakasız parçaları benzerlik puanına göre ayıklar.
+    - (MMR) Birbirinin tekrarı olan parçalar yerine farklı maddeleri öne çıkarır.
     """
     
-    def __init__(self, collection_name, client=None):
+    def __init__(self, collection_name, client=None, embedding_fn=None, lazy=False):
         """
         Araç ilklendirme.
         
         Girdi:
         - collection_name: Aranacak kanunun ChromaDB'deki koleksiyon adı (örn: "law_kmk")
-        - client: (Opsiyonel) Var olan bir ChromaDB istemcisi. Yoksa yenisini oluşturur.
+        - client: (Opsiyonel) Var olan bir vektör DB istemcisi (ChromaDB veya yerel indeks).
+          Yoksa config.VECTOR_BACKEND'e göre yenisini oluşturur.
+        - embedding_fn: (Opsiyonel) Paylaşılan embedding fonksiyonu. Yoksa yenisi oluşturulur.
+        - lazy: True ise koleksiyona (ağ isteği) hemen bağlanılmaz; open() veya ilk
+          arama sırasında bağlanılır.
         """
-        self.client = client or utils.get_chroma_client()
-        self.embedding_fn = utils.get_embedding_function()
+        self.client = client or utils.get_vector_client()
+        self.embedding_fn = embedding_fn or utils.get_embedding_function()
+        self.embedding_cache = utils.get_query_embedding_cache()
         
-        # Spesifik koleksiyona bağlan
-        self.collection = self.client.get_collection(
-            name=collection_name,
-            embedding_function=self.embedding_fn
-        )
+        self.collection_name = collection_name
+        self._collection = None
+        self._lock = threading.Lock()
+
+        # Sözcük (BM25) indeksi: ingestion sırasında oluşturulur; yoksa sadece vektör araması
+        self.lexical_index = None
+        lexical_path = index_path(config.LEXICAL_INDEX_DIR, collection_name)
+        if config.HYBRID_SEARCH and os.path.exists(lexical_path):
+            self.lexical_index = LexicalIndex.load(lexical_path)
 
-    def retrieve(self, query):
+        if not lazy:
+            self.open()
+
+    def open(self):
+        """
+        Spesifik koleksiyona bağlanır (bir kez; aynı anda çağrılırsa tek istek atılır).
+        Bağlantı hata verirse bir sonraki çağrıda tekrar denenir.
+        """
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    self._collection = self.client.get_collection(
+                        name=self.collection_name,
+                        embedding_function=self.embedding_fn
+                    )
+        return self._collection
+
+    @property
+    def collection(self):
+        return self.open()
+
+    def ingest_version(self):
+        """
+        Koleksiyonun güncel ingestion sürümü (answer_cache geçersiz kılma).
+        Açık koleksiyon nesnesindeki metadata bağlanma anının kopyasıdır;
+        sürüm bu yüzden her çağrıda veritabanından taze okunur.
+        """
+        collection = self.client.get_collection(name=self.collection_name, embedding_function=self.embedding_fn)
+        return ingest_version(collection)
+
+    @property
+    def is_open(self):
+        return self._collection is not None
+
+    def embed_query(self, query):
         """
-        Vektör Araması Yapar.
+        Sorguyu önbellek üzerinden vektörleştirir.
+        Önbellekte yoksa embedding fonksiyonu çağrılır ve sonuç saklanır.
+        """
+        return self.embedding_cache.get(query, self.embedding_fn)
+
+    def retrieve(self, query, query_embedding=None):
+        """
+        Hibrit Arama Yapar (Vektör + BM25).
         
         Ne Yapar:
-        1. Soruyu embedding (sayı vektörü) haline getirir.
-        2. Koleksiyondaki en yakın `config.TOP_K` adet parçayı bulur.
+        1. Soruyu embedding (sayı vektörü) haline getirir (önbellekten veya OpenAI'dan).
+        2. Koleksiyondaki en yakın parçaları bulur.
+        3. Sözcük indeksi varsa aynı sorguyu BM25 ile de arar ve iki sıralamayı
+           Reciprocal Rank Fusion ile birleştirip en iyi `config.TOP_K` parçayı seçer.
+        4. (Uyarlamalı TOP_K) Parça sayısını vektör benzerliklerinin geçtiği eşiğe
+           göre kısar (adaptive_cutoff); hiçbir parça eşiği geçmiyorsa boş liste döner.
+        5. (MMR) Vektör adaylarını çeşitlilik için yeniden sıralar (mmr_select).
+        Embedding API'si veya vektör veritabanı hata verirse sadece sözcük araması kullanılır.
         
         Girdi:
         - query (str): Kullanıcı sorusu veya arama metni.
+        - query_embedding (list[float], opsiyonel): Önceden hesaplanmış sorgu vektörü.
+          Verilirse ChromaDB tekrar embedding isteği atmaz (ajan, aynı adımdaki
+          tüm sorguları tek istekte vektörleştirip buraya gönderir).
         
         Çıktı:
-        - list: Bulunan dokümanların içerik ve metadatalarını içeren sözlük listesi.
+        - list: Bulunan dokümanların id, içerik, metadata ve puanlarını ('score' ve/veya
+          'lexical_score') içeren sözlük listesi.
+
+        Süre, koleksiyon ve arama türüne (hybrid / vector / lexical_fallback / below_floor)
+        göre metrics.RETRIEVAL_LATENCY histogramına; dönen parça sayısı
+        metrics.RETRIEVAL_RESULTS'a yazılır.
         """
+        started = time.perf_counter()
+        results, mode = self._retrieve(query, query_embedding)
+        metrics.observe_retrieval(self.collection_name, mode, time.perf_counter() - started, len(results))
+        return results
+
+    def retrieve_many(self, queries, query_embeddings):
+        """
+        Toplu Arama (LegalRAG.agenerate_answers / generate_answers)
+        
+        Tüm sorgu vektörleri koleksiyona TEK bir sorguyla gönderilir; sıralama
+        (BM25 birleştirmesi, uyarlamalı TOP_K, MMR) her sorgu için retrieve ile aynıdır.
+        
+        Girdi:
+        - queries (list[str]): Arama metinleri
+        - query_embeddings (list[list[float]]): Aynı sırayla sorgu vektörleri
+        
+        Çıktı: Her sorgu için retrieve çıktısı (aynı sırayla).
+        Süre tek ölçüm olarak (arama türü: batch) metrics.RETRIEVAL_LATENCY'ye yazılır.
+        """
+        if not queries:
+            return []
+        started = time.perf_counter()
+        n_candidates, n_fetch = self._candidate_counts()
+        try:
+            batches = self._vector_search_many(query_embeddings, n_fetch, with_embeddings=config.MMR_ENABLED)
+        except Exception as e:
+            if not self.lexical_index:
+                raise
+            print(f"⚠️ Vektör araması başarısız ({self.collection_name}), sözcük aramasına geçildi: {e}")
+            batches = None
+
+        all_results = []
+        for i, query in enumerate(queries):
+            if batches is None:
+                results = self._lexical_retrieve(query)
+            else:
+                results, _ = self._rank(query, *batches[i], n_candidates)
+            all_results.append(results)
+        metrics.observe_retrieval(self.collection_name, "batch", time.perf_counter() - started)
+        return all_results
+
+    def _candidate_counts(self):
+        """(Birleştirme/MMR öncesi aday sayısı, veritabanından istenecek parça sayısı)"""
+        n_candidates = config.HYBRID_CANDIDATES if self.lexical_index else config.TOP_K
+        n_fetch = max(n_candidates, config.MMR_CANDIDATES) if config.MMR_ENABLED else n_candidates
+        return n_candidates, n_fetch
+
+    def _retrieve(self, query, query_embedding):
+        """retrieve'in ölçülmeyen gövdesi. Çıktı: (sonuçlar, arama türü)"""
+        n_candidates, n_fetch = self._candidate_counts()
+        try:
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
+            vector_results, embeddings = self._vector_search(
+                query_embedding, n_fetch, with_embeddings=config.MMR_ENABLED
+            )
+        except Exception as e:
+            if not self.lexical_index:
+                raise
+            print(f"⚠️ Vektör araması başarısız ({self.collection_name}), sözcük aramasına geçildi: {e}")
+            return self._lexical_retrieve(query), "lexical_fallback"
+        return self._rank(query, vector_results, embeddings, n_candidates)
+
+    def _rank(self, query, vector_results, embeddings, n_candidates):
+        """
+        Vektör adaylarından nihai sonuçlar: uyarlamalı TOP_K, MMR ve (hibritte) BM25 + RRF.
+        Çıktı: (sonuçlar, arama türü)
+        """
+        top_k = config.TOP_K
+        if config.ADAPTIVE_TOP_K:
+            top_k = adaptive_cutoff([r["score"] for r in vector_results])
+            if top_k == 0:
+                return [], "below_floor"
+
+        if config.MMR_ENABLED and vector_results:
+            vector_results = self._diversify(vector_results, embeddings, n_candidates if self.lexical_index else top_k)
+
+        if not self.lexical_index:
+            return vector_results[:top_k], "vector"
+
+        lexical_results = self._lexical_search(query, n_candidates)
+        by_id = {r["id"]: r for r in lexical_results}
+        for r in vector_results:
+            by_id[r["id"]] = {**by_id.get(r["id"], {}), **r}
+        fused_ids = reciprocal_rank_fusion(
+            [[r["id"] for r in vector_results], [r["id"] for r in lexical_results]],
+            k=config.RRF_K
+        )
+        return [by_id[i] for i in fused_ids[:top_k]], "hybrid"
+
+    def _vector_search(self, query_embedding, n_results, with_embeddings=False):
+        """
+        Vektör veritabanında en yakın n_results parçayı (benzerlik puanlarıyla) bulur.
+        Çıktı: (sonuçlar, parça vektörleri) — vektörler sadece with_embeddings ile istenir, yoksa None.
+        """
+        return self._vector_search_many([query_embedding], n_results, with_embeddings)[0]
+
+    def _vector_search_many(self, query_embeddings, n_results, with_embeddings=False):
+        """Birden çok sorgu vektörü için tek veritabanı sorgusu. Çıktı: [(sonuçlar, parça vektörleri), ...]"""
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if with_embeddings else [])
         results = self.collection.query(
-            query_texts=[query],
-            n_results=config.TOP_K
+            query_embeddings=list(query_embeddings),
+            n_results=n_results,
+            include=include
         )
+        return [self._structure(results, i, with_embeddings) for i in range(len(query_embeddings))]
+
+    @staticmethod
+    def _structure(results, i, with_embeddings):
+        """Sorgu cevabındaki i. sorgunun sonuçlarını {'id', 'content', 'metadata', 'score'} listesine çevirir."""
+        embeddings = None
+        if with_embeddings and results.get('embeddings') is not None and len(results['embeddings']) > i:
+            embeddings = results['embeddings'][i]
         
         # Sonuçları işle ve yapılandır
         structured_results = []
-        if results['documents'] and results['documents'][0]:
-            docs = results['documents'][0]
-            metas = results['metadatas'][0] if results['metadatas'] else [{}] * len(docs)
+        if results['documents'] and results['documents'][i]:
+            docs = results['documents'][i]
+            ids = results['ids'][i]
+            metas = results['metadatas'][i] if results['metadatas'] else [{}] * len(docs)
+            distances = results['distances'][i]
             
-            for doc, meta in zip(docs, metas):
+            for id_, doc, meta, distance in zip(ids, docs, metas, distances):
                 structured_results.append({
+                    "id": id_,
                     "content": doc,
-                    "metadata": meta
+                    "metadata": meta,
+                    "score": round(distance_to_score(distance), 4)
                 })
                 
-        return structured_results
+        return structured_results, embeddings
 
-    def get_context(self, query):
+    def _diversify(self, vector_results, embeddings, k):
+        """
+        Vektör adaylarından MMR ile k tanesini seçer (seçim sırasıyla).
+        Uyarlamalı TOP_K açıksa RETRIEVAL_MIN_SCORE'un altındaki adaylar seçime girmez.
+        Vektörler yoksa (arka uç döndürmediyse) sıralama değişmez.
+        """
+        if embeddings is None or len(embeddings) != len(vector_results):
+            return vector_results[:k]
+        pool = list(range(len(vector_results)))
+        if config.ADAPTIVE_TOP_K:
+            pool = [i for i in pool if vector_results[i]["score"] >= config.RETRIEVAL_MIN_SCORE]
+        selected = mmr_select(
+            [vector_results[i]["score"] for i in pool], np.asarray(embeddings)[pool], k
+        )
+        return [vector_results[pool[i]] for i in selected]
+
+    def _lexical_search(self, query, n_results):
+        return [
+            {**self.lexical_index.result(i), "lexical_score": round(float(score), 4)}
+            for i, score in self.lexical_index.search(query, n_results)
+        ]
+
+    def lexical_retrieve(self, query):
+        """
+        Sadece sözcük (BM25) araması — embedding gerektirmez.
+        Embedding API'si yavaş veya erişilemez olduğunda yedek olarak kullanılır.
+        """
+        started = time.perf_counter()
+        results = self._lexical_retrieve(query)
+        metrics.observe_retrieval(self.collection_name, "lexical", time.perf_counter() - started, len(results))
+        return results
+
+    def _lexical_retrieve(self, query):
+        if not self.lexical_index:
+            print(f"⚠️ Sözcük indeksi yok ({self.collection_name}), sonuç döndürülemedi.")
+            return []
+        return self._lexical_search(query, config.TOP_K)
+
+    def get_context(self, query, query_embedding=None):
         """
         Ajan (Agent) tarafından kullanılan standart arayüz.
         Doğrudan retrieve fonksiyonunu çağırır.
         """
-        return self.retrieve(query)
+        return self.retrieve(query, query_embedding)
+
+    async def aretrieve(self, query, query_embedding=None):
+        """
+        Vektör Aramasının Asenkron Hali.
+
+        ChromaDB HttpClient ve embedding fonksiyonu senkron (bloklayıcı) çalışır.
+        Arama ayrı bir thread'de yürütülür; böylece FastAPI event loop'u
+        sorgu sürerken diğer istekleri işlemeye devam eder.
+        """
+        return await asyncio.to_thread(self.retrieve, query, query_embedding)
+
+    async def aget_context(self, query, query_embedding=None):
+        """
+        Ajanın asenkron akışında (agenerate_answer) kullanılan arayüz.
+        """
+        return await self.aretrieve(query, query_embedding)
@@ -0,0 +1,231 @@
+"""
+retrieval_benchmark.py — LLM'siz Retrieval Değerlendirmesi ve Parametre Taraması
+================================================================================
+data/eval_data.json'daki 'ground_truth_context' referanslarını ("KMK Madde 20")
+kullanarak sadece arama katmanını ölçer; hiçbir LLM çağrısı yapılmaz.
+
+Ölçülenler (soru başına, sonra ortalama):
+- recall@k: Doğru maddelerin kaçı getirilen k parçanın 'articles' metadata'sında geçiyor
+- hit@k: En az bir doğru maddenin getirildiği soruların oranı
+- MRR: İlk doğru parçanın sırasının tersi (1 / sıra)
+- context_tokens: LLM'e gidecek bağlamın token sayısı (maliyet)
+- empty_rate: Hiç parça dönmeyen (uyarlamalı TOP_K'da eşiği geçemeyen) aramaların oranı
+- articles_per_1k_tokens: Bağlamdaki farklı madde sayısı / 1000 token (MMR'ın hedefi)
+
+Arama, soruların doğru kanunlarında yapılır (yönlendirme hatası ayrı ölçülür:
+`make eval-router`). Vektör + BM25 birleştirmesi, uyarlamalı TOP_K kesimi ve MMR çeşitlendirmesi
+LegalRAGTool.retrieve ile aynıdır.
+
+Hız: PDF metinleri (ingestion önbelleği), chunk vektörleri
+(config.CHUNK_EMBEDDING_CACHE_PATH) ve sorgu vektörleri (sorgu önbelleği)
+diskte tutulur. İlk çalıştırmadan sonra bütün tarama saniyeler sürer.
+Her ayar kombinasyonu MLflow'a ayrı bir run olarak yazılır.
+
+Kullanım: python -m src.retrieval_benchmark   (veya: make eval-retrieval)
+"""
+
+import itertools
+import time
+import numpy as np
+import mlflow
+from src import config, utils
+from src.article_index import parse_articles
+from src.embedding_cache import QueryEmbeddingCache
+from src.eval_data import load_eval_data, parse_ground_truth_refs
+from src.ingestion import (
+    load_pdf_pages, join_pages, chunk_text, chunk_ids, chunk_metadatas,
+    embedding_batches, embed_with_retry
+)
+from src.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from src.rag_engine import adaptive_cutoff, mmr_select
+
+# Taranacak ayarlar (CHUNK_OVERLAP >= CHUNK_SIZE olan kombinasyonlar atlanır)
+SWEEP_GRID = {
+    "chunk_size": [1000, 1500, 2000, 3000],
+    "chunk_overlap": [200, 400],
+    "top_k": [3, 6, 10],
+    "hybrid": [True, False],
+    "adaptive": [True, False],  # Uyarlamalı TOP_K (RETRIEVAL_MIN_SCORE / RETRIEVAL_SCORE_GAP)
+    "mmr": [True, False],       # MMR çeşitlendirmesi (MMR_CANDIDATES / MMR_LAMBDA)
+}
+
+
+class ChunkedCorpus:
+    """
+    Tek bir (chunk_size, chunk_overlap) ayarıyla parçalanmış kaynaklar.
+    Her kanun için: parçalar, metadata, normalize edilmiş vektör matrisi, BM25 indeksi.
+    """
+    def __init__(self, chunk_size, chunk_overlap, embed_chunks):
+        self.laws = {}
+        for key, doc_info in config.LEGAL_DOCS.items():
+            pages = load_pdf_pages(doc_info["path"])
+            if not pages:
+                continue
+            text, *page_map = join_pages(pages)
+            chunks = chunk_text(text, chunk_size, chunk_overlap)
+            ids = chunk_ids(key, chunks)
+            metadatas = chunk_metadatas(key, doc_info, text, chunks, parse_articles(key, text), page_map)
+            matrix = np.asarray(embed_chunks(chunks), dtype=np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+            self.laws[key] = {
+                "ids": ids,
+                "chunks": chunks,
+                "metadatas": metadatas,
+                "matrix": matrix,
+                "lexical": LexicalIndex.build(ids, chunks, metadatas),
+            }
+
+    def num_chunks(self):
+        return sum(len(law["ids"]) for law in self.laws.values())
+
+    def retrieve(self, law, query, query_vector, top_k, hybrid, adaptive=False, mmr=False):
+        """
+        LegalRAGTool.retrieve ile aynı sıralama (sadece bellekte):
+        vektör adayları (+ hibritte BM25 adayları, RRF) → ilk top_k parça indeksi.
+        adaptive: top_k, vektör benzerliklerine göre kısılır (adaptive_cutoff).
+        mmr: vektör adayları MMR_CANDIDATES aday arasından çeşitlendirilerek seçilir (mmr_select).
+        """
+        data = self.laws[law]
+        n_candidates = config.HYBRID_CANDIDATES if hybrid else top_k
+        n_fetch = max(n_candidates, config.MMR_CANDIDATES) if mmr else n_candidates
+        similarities = data["matrix"] @ query_vector
+        vector_ranking = [int(i) for i in np.argsort(-similarities)[:n_fetch]]
+        if adaptive:
+            top_k = adaptive_cutoff([float(similarities[i]) for i in vector_ranking], top_k)
+            if top_k == 0:
+                return []
+        if mmr:
+            pool = vector_ranking
+            if adaptive:
+                pool = [i for i in pool if similarities[i] >= config.RETRIEVAL_MIN_SCORE]
+            selected = mmr_select(similarities[pool], data["matrix"][pool], n_candidates if hybrid else top_k)
+            vector_ranking = [pool[i] for i in selected]
+        if not hybrid:
+            return vector_ranking[:top_k]
+        lexical_ranking = [i for i, _ in data["lexical"].search(query, n_candidates)]
+        return reciprocal_rank_fusion([vector_ranking, lexical_ranking], k=config.RRF_K)[:top_k]
+
+
+def _is_relevant(metadata, law, number):
+    """Parça, (kanun, madde numarası) referansını kapsıyor mu?"""
+    if metadata.get("source") != law:
+        return False
+    labels = [a.strip() for a in metadata.get("articles", "").split(",")]
+    return any(label.rpartition(" ")[2] == number for label in labels if label)
+
+
+def score_configuration(corpus, questions, query_vectors, top_k, hybrid, adaptive=False, mmr=False):
+    """
+    Tek bir ayar kombinasyonunun ortalama metrikleri.
+    questions: [(soru, [(kanun, madde_no), ...]), ...]
+    """
+    recalls, hits, reciprocal_ranks, tokens, empty, articles = [], [], [], [], [], []
+    for (question, refs), query_vector in zip(questions, query_vectors):
+        laws = [law for law in dict.fromkeys(law for law, _ in refs) if law in corpus.laws]
+        found = set()
+        best_rank = None
+        context_tokens = 0
+        context_articles = set()
+        for law in laws:
+            data = corpus.laws[law]
+            retrieved = corpus.retrieve(law, question, query_vector, top_k, hybrid, adaptive, mmr)
+            empty.append(float(not retrieved))
+            for rank, idx in enumerate(retrieved, start=1):
+                context_tokens += utils.count_tokens(data["chunks"][idx])
+                context_articles.update(
+                    (law, a.strip()) for a in data["metadatas"][idx].get("articles", "").split(",") if a.strip()
+                )
+                matched = {ref for ref in refs if _is_relevant(data["metadatas"][idx], *ref)}
+                if matched and (best_rank is None or rank < best_rank):
+                    best_rank = rank
+                found |= matched
+        recalls.append(len(found) / len(refs))
+        hits.append(float(bool(found)))
+        reciprocal_ranks.append(1.0 / best_rank if best_rank else 0.0)
+        tokens.append(context_tokens)
+        articles.append(1000 * len(context_articles) / context_tokens if context_tokens else 0.0)
+    return {
+        "recall_at_k": float(np.mean(recalls)),
+        "hit_at_k": float(np.mean(hits)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "context_tokens_mean": float(np.mean(tokens)),
+        "empty_rate": float(np.mean(empty)) if empty else 0.0,
+        "articles_per_1k_tokens": float(np.mean(articles)),
+    }
+
+
+def run_sweep(grid=None):
+    """
+    PARAMETRE TARAMASI
+    ------------------
+    grid (varsayılan: SWEEP_GRID) içindeki her kombinasyon için metrikleri hesaplar,
+    tabloyu yazdırır ve her kombinasyonu ayrı bir MLflow run'ı olarak loglar.
+
+    Çıktı: [{"chunk_size", "chunk_overlap", "top_k", "hybrid", "adaptive", "mmr", metrikler...}, ...]
+    """
+    grid = grid or SWEEP_GRID
+    embedding_fn = utils.get_embedding_function()
+    query_cache = utils.get_query_embedding_cache()
+    chunk_cache = QueryEmbeddingCache(path=config.CHUNK_EMBEDDING_CACHE_PATH, max_items=50_000, normalize=False)
+
+    def embed_chunks(texts):
+        # Eksik parçalar ingestion ile aynı şekilde: boyutu sınırlı batch'ler + tekrar deneme
+        vectors = []
+        for batch in embedding_batches(texts, texts):
+            vectors.extend(embed_with_retry(embedding_fn, batch)[0])
+        return vectors
+
+    # Sorular ve referansları (referansı çözümlenemeyen sorular atlanır)
+    questions = [
+        (item["question"], refs)
+        for item in load_eval_data()
+        if (refs := parse_ground_truth_refs(item.get("ground_truth_context", [])))
+    ]
+    query_vectors = np.asarray(query_cache.get_many([q for q, _ in questions], embedding_fn), dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True) + 1e-12
+    print(f"🔎 {len(questions)} soru, {len(config.LEGAL_DOCS)} kaynak")
+
+    mlflow.set_tracking_uri(config.MLFLOW_TRACKING_URI)
+    mlflow.set_experiment(config.RETRIEVAL_EXPERIMENT_NAME)
+
+    rows = []
+    for chunk_size, chunk_overlap in itertools.product(grid["chunk_size"], grid["chunk_overlap"]):
+        if chunk_overlap >= chunk_size:
+            continue
+        started = time.perf_counter()
+        corpus = ChunkedCorpus(chunk_size, chunk_overlap, lambda texts: chunk_cache.get_many(texts, embed_chunks))
+        build_seconds = time.perf_counter() - started
+
+        for top_k, hybrid, adaptive, mmr in itertools.product(
+            grid["top_k"], grid["hybrid"], grid.get("adaptive", [False]), grid.get("mmr", [False])
+        ):
+            params = {
+                "chunk_size": chunk_size, "chunk_overlap": chunk_overlap,
+                "top_k": top_k, "hybrid": hybrid, "adaptive": adaptive, "mmr": mmr,
+            }
+            metrics = score_configuration(corpus, questions, query_vectors, top_k, hybrid, adaptive, mmr)
+            metrics["num_chunks"] = corpus.num_chunks()
+            run_name = f"cs{chunk_size}_ov{chunk_overlap}_k{top_k}_{'hybrid' if hybrid else 'vector'}"
+            run_name += ("_adaptive" if adaptive else "") + ("_mmr" if mmr else "")
+            with mlflow.start_run(run_name=run_name):
+                mlflow.log_params({**params, "embedding_model": config.EMBEDDING_MODEL, "questions": len(questions)})
+                mlflow.log_metrics({**metrics, "corpus_build_seconds": build_seconds})
+            rows.append({**params, **metrics})
+
+    # Sonuç tablosu (en iyi recall üstte)
+    print(f"\n{'chunk':>6}{'overlap':>8}{'k':>4}{'mod':>8}{'uyarl.':>7}{'mmr':>5}{'recall@k':>10}{'hit@k':>7}"
+          f"{'MRR':>7}{'token':>8}{'boş':>6}{'madde/1k':>10}")
+    for row in sorted(rows, key=lambda r: (-r["recall_at_k"], r["context_tokens_mean"])):
+        print(f"{row['chunk_size']:>6}{row['chunk_overlap']:>8}{row['top_k']:>4}"
+              f"{'hibrit' if row['hybrid'] else 'vektör':>8}{'evet' if row['adaptive'] else '-':>7}"
+              f"{'evet' if row['mmr'] else '-':>5}{row['recall_at_k']:>10.3f}{row['hit_at_k']:>7.2f}"
+              f"{row['mrr']:>7.3f}{row['context_tokens_mean']:>8.0f}{row['empty_rate']:>6.2f}"
+              f"{row['articles_per_1k_tokens']:>10.2f}")
+    cache_stats = chunk_cache.stats()
+    print(f"\n💾 Chunk embedding önbelleği: {cache_stats['disk_hits'] + cache_stats['memory_hits']} isabet, "
+          f"{cache_stats['misses']} yeni vektör")
+    return rows
+
+
+if __name__ == "__main__":
+    run_sweep()
@@ -0,0 +1,235 @@
+"""
+router.py — Yerel Embedding Tabanlı Yönlendirici (Router)
+=========================================================
+Her soru için gpt-4o'ya yalnızca "hangi kanunda arayayım?" diye sormak
+(tool_choice="auto") tam bir LLM turu demektir. Bu modül aynı kararı
+yerelde, soru embedding'i ile verir:
+
+1. Her kanun (config.LEGAL_DOCS) için bir merkez vektör (centroid) hesaplanır:
+   açıklama ('description') vektörü + koleksiyondan örneklenen parçaların ortalaması.
+2. Soru vektörü tüm merkezlerle kosinüs benzerliği ile puanlanır.
+3. Seçilen kanun(lar) ile geri kalanlar arasındaki fark config.ROUTER_MARGIN'den
+   büyükse karar "emin" sayılır ve planlama LLM çağrısı atlanır.
+   Aksi halde (belirsiz sorular) LLM'in araç seçimine geri dönülür.
+
+Modlar (config.ROUTER_MODE):
+- "off"   : Yönlendirici kullanılmaz.
+- "shadow": Karar hesaplanır ve loglanır ama LLM yine çağrılır (isabet ölçümü için).
+- "on"    : Emin kararlarda LLM planlama çağrısı atlanır.
+
+Değerlendirme: python -m src.router  (data/eval_data.json üzerinde isabet ve atlanan çağrı oranı)
+"""
+
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+import numpy as np
+from src import config, utils
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouteDecision:
+    """Yönlendirici kararı."""
+    keys: list                 # Seçilen kanun anahtarları (örn: ["kmk"])
+    scores: dict               # Tüm kanunların benzerlik puanları
+    confident: bool            # True ise LLM planlamasına gerek yok
+    margin: float = 0.0        # Seçilenler ile en yakın seçilmeyen arasındaki fark
+    extra: dict = field(default_factory=dict)
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingRouter:
+    """
+    YEREL YÖNLENDİRİCİ
+    ------------------
+    Merkez vektörler bir kez hesaplanır: sunucu açılışında arka planda (warm_up)
+    veya ilk kararda. Sonrasında her karar tek bir (6 x d) matris-vektör çarpımıdır.
+    Hesaplama hata verirse (embedding API'si / koleksiyon erişilemez) ROUTER_RETRY_INTERVAL
+    saniye boyunca tekrar denenmez; kararlar hata verir ve ajan LLM planlamasına döner.
+    """
+
+    def __init__(self, tools_map, embed_fn):
+        """
+        Girdi:
+        - tools_map: {kanun_anahtarı: LegalRAGTool} (koleksiyonlardan parça örneklemek için)
+        - embed_fn: Metin listesini vektörleştiren fonksiyon (açıklamalar için)
+        """
+        self.tools_map = tools_map
+        self.embed_fn = embed_fn
+        self.keys = [k for k in config.LEGAL_DOCS if k in tools_map]
+        self._centroids = None
+        self._lock = threading.Lock()
+        self._failed_at = None  # Son başarısız merkez vektör hesaplamasının zamanı (monotonic)
+
+        self.decisions = 0
+        self.confident_decisions = 0
+        self.skipped_planning_calls = 0
+        self.shadow_compared = 0
+        self.shadow_agreed = 0
+
+    def _sample_embeddings(self, collection):
+        """Koleksiyondan eşit aralıklı en fazla ROUTER_SAMPLE_CHUNKS parçanın vektörünü çeker."""
+        ids = collection.get(include=[])["ids"]
+        if not ids:
+            return np.zeros((0, 0), dtype=np.float32)
+        step = max(1, len(ids) // config.ROUTER_SAMPLE_CHUNKS)
+        sampled = ids[::step][:config.ROUTER_SAMPLE_CHUNKS]
+        return np.asarray(collection.get(ids=sampled, include=["embeddings"])["embeddings"], dtype=np.float32)
+
+    def _build_centroids(self):
+        descriptions = [
+            f"{config.LEGAL_DOCS[k]['name']}: {config.LEGAL_DOCS[k]['description']}" for k in self.keys
+        ]
+        desc_vectors = _normalize(self.embed_fn(descriptions))
+
+        centroids = []
+        for key, desc_vector in zip(self.keys, desc_vectors):
+            chunks = self._sample_embeddings(self.tools_map[key].collection)
+            if len(chunks):
+                chunk_centroid = _normalize(_normalize(chunks).mean(axis=0))
+                w = config.ROUTER_DESCRIPTION_WEIGHT
+                centroids.append(w * desc_vector + (1 - w) * chunk_centroid)
+            else:
+                centroids.append(desc_vector)
+        return _normalize(np.stack(centroids))
+
+    def _ensure_centroids(self):
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    if self._failed_at is not None and time.monotonic() - self._failed_at < config.ROUTER_RETRY_INTERVAL:
+                        raise RuntimeError("Router merkez vektörleri hesaplanamadı (tekrar deneme bekleniyor)")
+                    try:
+                        self._centroids = self._build_centroids()
+                    except Exception:
+                        self._failed_at = time.monotonic()
+                        raise
+                    self._failed_at = None
+                    logger.info(f"Router merkez vektörleri hazır: {self.keys}")
+        return self._centroids
+
+    @property
+    def ready(self):
+        """Merkez vektörler hesaplandı mı (karar vermek ağ isteği gerektirmez)."""
+        return self._centroids is not None
+
+    def warm_up(self):
+        """Merkez vektörleri önceden hesaplar (sunucu açılışında, arka plan thread'inde)."""
+        self._ensure_centroids()
+
+    def route(self, question_embedding):
+        """
+        Soru vektörünü puanlar ve karar verir.
+
+        Seçim: En yüksek puana ROUTER_GROUP_WIDTH kadar yakın olan ve
+        ROUTER_MIN_SCORE'u geçen kanunlar. Karar, seçilen en düşük puan ile
+        seçilmeyen en yüksek puan arasındaki fark ROUTER_MARGIN'i geçerse "emin"dir.
+        """
+        centroids = self._ensure_centroids()
+        scores = centroids @ _normalize(question_embedding)
+        order = np.argsort(-scores)
+        top = float(scores[order[0]])
+
+        selected = [
+            i for i in order
+            if scores[i] >= config.ROUTER_MIN_SCORE and scores[i] >= top - config.ROUTER_GROUP_WIDTH
+        ][:config.ROUTER_MAX_TOOLS]
+        rest = [float(scores[i]) for i in order if i not in selected]
+        margin = (float(min(scores[i] for i in selected)) - max(rest, default=0.0)) if selected else 0.0
+        confident = bool(selected) and margin >= config.ROUTER_MARGIN
+
+        decision = RouteDecision(
+            keys=[self.keys[i] for i in selected],
+            scores={k: round(float(s), 4) for k, s in zip(self.keys, scores)},
+            confident=confident,
+            margin=round(margin, 4)
+        )
+        self.decisions += 1
+        if confident:
+            self.confident_decisions += 1
+        return decision
+
+    def record(self, decision, planner_keys=None, skipped=False):
+        """
+        Kararı loglar. planner_keys verilirse (shadow modu veya emin olunmayan karar)
+        LLM'in seçimiyle karşılaştırılır; böylece isabet oranı canlı trafikte ölçülür.
+        """
+        entry = {
+            "router_keys": decision.keys,
+            "confident": decision.confident,
+            "margin": decision.margin,
+            "scores": decision.scores,
+            "skipped_planning": skipped,
+        }
+        if skipped:
+            self.skipped_planning_calls += 1
+        if planner_keys is not None:
+            entry["planner_keys"] = planner_keys
+            if decision.confident:
+                agreed = set(decision.keys) == set(planner_keys)
+                entry["agreed"] = agreed
+                self.shadow_compared += 1
+                self.shadow_agreed += int(agreed)
+        logger.info(f"router_decision {json.dumps(entry, ensure_ascii=False)}")
+
+    def stats(self):
+        return {
+            "mode": config.ROUTER_MODE,
+            "decisions": self.decisions,
+            "confident_decisions": self.confident_decisions,
+            "skipped_planning_calls": self.skipped_planning_calls,
+            "confident_agreement_with_llm": (
+                round(self.shadow_agreed / self.shadow_compared, 4) if self.shadow_compared else None
+            ),
+        }
+
+
+def evaluate_router():
+    """
+    Yönlendiriciyi data/eval_data.json üzerinde değerlendirir (LLM çağrısı yapmaz).
+
+    Ölçülenler:
+    - coverage: Kaç soruda karar "emin" (planlama çağrısı atlanırdı)
+    - accuracy: Emin kararlarda seçilen kanunlar doğru kanunları kapsıyor mu
+    """
+    from src.eval_data import load_eval_data, ground_truth_keys
+    from src.rag_engine import LegalRAGTool
+
+    client = utils.get_openai_client()
+    vector_client = utils.get_vector_client()
+    embedding_fn = utils.get_embedding_function()
+    tools_map = {
+        k: LegalRAGTool(info["collection"], vector_client, embedding_fn) for k, info in config.LEGAL_DOCS.items()
+    }
+    embed_fn = lambda texts: utils.embed_texts(client, texts)
+    router = EmbeddingRouter(tools_map, embed_fn)
+    cache = utils.get_query_embedding_cache()
+
+    data = load_eval_data()
+    confident, correct = 0, 0
+    for item in data:
+        expected = set(ground_truth_keys(item))
+        decision = router.route(cache.get(item["question"], embed_fn))
+        hit = expected.issubset(decision.keys)
+        if decision.confident:
+            confident += 1
+            correct += int(hit)
+        print(f"{'✅' if hit else '❌'} {'EMİN ' if decision.confident else 'LLM  '} "
+              f"{decision.keys} (beklenen: {sorted(expected)}, fark: {decision.margin}) {item['question'][:60]}")
+
+    print(f"\nAtlanan planlama çağrısı: {confident}/{len(data)} "
+          f"| Emin kararlarda isabet: {correct}/{confident if confident else 0}")
+
+
+if __name__ == "__main__":
+    evaluate_router()
@@ -0,0 +1,66 @@
+"""
+single_flight.py — Eşzamanlı Aynı Soruların Birleştirilmesi (Single-Flight)
+===========================================================================
+Bir soru apartman grubunda yayıldığında aynı metin saniyeler içinde onlarca kez
+gelir. Anlamsal önbellek ancak ilk cevap bittikten sonra işe yarar; o ana kadar
+gelen her kopya tüm akışı (embedding + 2 LLM çağrısı + arama) baştan çalıştırır.
+
+SingleFlight, aynı anahtarla (normalize edilmiş soru + cevabı etkileyen ayarlar)
+devam eden bir hesaplama varsa yenisini başlatmaz; sonradan gelenler ilk
+hesaplamanın sonucunu (veya hatasını) bekler.
+
+Hesaplama ayrı bir asyncio görevi olarak çalışır: ilk isteği gönderen istemci
+bağlantıyı kesse bile bekleyen diğer istekler cevabını alır.
+"""
+
+import asyncio
+from src import metrics
+from src.answer_cache import config_fingerprint
+
+
+def question_key(question):
+    """Büyük/küçük harf ve boşluk farkları yok sayılır; ayarlar değişirse anahtar da değişir."""
+    return (" ".join(question.casefold().split()), config_fingerprint())
+
+
+class SingleFlight:
+    """
+    DEVAM EDEN HESAPLAMALAR
+    -----------------------
+    {anahtar: asyncio.Task}. Görev bitince kaydı silinir; sonraki aynı soru
+    (önbellek dışında) yeniden hesaplanır.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0       # Başlatılan hesaplama sayısı
+        self.coalesced = 0   # Devam eden bir hesaplamaya bağlanan (tasarruf edilen) istek sayısı
+
+    async def run(self, key, factory):
+        """
+        Girdi:
+        - key: Hesaplamanın anahtarı (question_key)
+        - factory: Hesaplamayı başlatan, argümansız coroutine fonksiyonu
+        Çıktı: Hesaplamanın sonucu (tüm bekleyenler aynı nesneyi alır)
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            metrics.record_cache("inflight", False)
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+            metrics.record_cache("inflight", True)
+        # shield: bekleyen isteklerden biri iptal edilirse ortak hesaplama iptal edilmez
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Kimse beklemiyorsa "exception was never retrieved" uyarısını önler
+
+    def stats(self):
+        return {"in_flight": len(self._inflight), "calls": self.calls, "coalesced": self.coalesced}
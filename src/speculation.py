@@ -0,0 +1,196 @@
+"""
+speculation.py — Planlamayla Paralel Spekülatif Arama
+=====================================================
+Cevap akışı sıralıdır: planlama LLM çağrısı (araç seçimi) bitmeden arama
+başlayamaz. Oysa planlayıcının ürettiği arama sorgusu çoğu zaman kullanıcının
+ham sorusudur (veya ona çok yakındır) ve seçtiği kanun, yönlendiricinin
+(router) en yüksek puan verdiği kanunlardan biridir.
+
+Spekülatif arama bu bekleme süresini kullanır:
+1. Planlama isteği gönderilmeden hemen önce ham soru, yönlendiricinin en olası
+   config.SPECULATIVE_COLLECTIONS kanununda (soru vektörüyle) aranmaya başlar.
+2. Planlama bitince her arama çağrısı için bakılır: aynı kanunda önceden arama
+   yapıldıysa ve sorgu ham soruyla aynıysa (büyük/küçük harf ve boşluk farkı
+   yok sayılır) veya sorgu vektörünün soru vektörüne kosinüs benzerliği
+   config.SPECULATIVE_MIN_SIMILARITY'yi geçiyorsa önceden bulunan sonuçlar
+   kullanılır (isabet). Aksi halde normal arama yapılır; kullanılmayan
+   ön-aramalar iptal edilir.
+
+Kazanılan süre (tahmin): kullanılan ön-aramaların en uzun süresi - planlama
+bittikten sonra bu aramalar için beklenen süre.
+
+İsabet oranı ve kazanılan süre isteğin izine, /metrics
+(legal_rag_speculation_*) ve /stats ('speculation') üzerinden izlenir.
+"""
+
+import asyncio
+import contextvars
+import time
+import numpy as np
+from src import config, metrics
+
+
+def _normalize_query(text):
+    return " ".join((text or "").casefold().split())
+
+
+async def _atimed(fn, *args):
+    started = time.perf_counter()
+    results = await fn(*args)
+    return results, time.perf_counter() - started
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    results = fn(*args)
+    return results, time.perf_counter() - started
+
+
+class Speculation:
+    """
+    TEK İSTEĞİN ÖN-ARAMALARI
+    ------------------------
+    {LegalRAGTool: asyncio.Task veya concurrent.futures.Future}. Her görevin
+    sonucu (sonuçlar, arama süresi) ikilisidir.
+    """
+
+    def __init__(self, speculator, question, question_embedding, pending):
+        self.speculator = speculator
+        self.question = _normalize_query(question)
+        self.question_vector = np.asarray(question_embedding, dtype=np.float32)
+        self.question_vector /= np.linalg.norm(self.question_vector) + 1e-12
+        self.pending = pending
+        self.used = {}       # {rag_tool: (arama süresi, planlamadan sonra beklenen süre)}
+        self.hit_jobs = 0    # Ön-aramayla karşılanan arama çağrısı sayısı
+        self.finished = False
+
+    def matches(self, rag_tool, query, query_embedding=None):
+        """Bu aracın bu sorgusu ön-aramayla karşılanabilir mi?"""
+        if rag_tool not in self.pending:
+            return False
+        if _normalize_query(query) == self.question:
+            return True
+        if query_embedding is None:
+            return False
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        similarity = float(vector @ self.question_vector) / (float(np.linalg.norm(vector)) + 1e-12)
+        return similarity >= config.SPECULATIVE_MIN_SIMILARITY
+
+    def _use(self, rag_tool, outcome, waited):
+        results, seconds = outcome
+        self.used[rag_tool] = (seconds, max(waited, self.used.get(rag_tool, (0.0, 0.0))[1]))
+        self.hit_jobs += 1
+        return results
+
+    def take(self, rag_tool):
+        """Ön-aramanın sonuçlarını bekler (senkron). Ön-arama hata verdiyse None."""
+        started = time.perf_counter()
+        try:
+            outcome = self.pending[rag_tool].result()
+        except Exception as e:
+            print(f"⚠️ Spekülatif arama başarısız ({rag_tool.collection_name}), normal aramaya geçildi: {e}")
+            return None
+        return self._use(rag_tool, outcome, time.perf_counter() - started)
+
+    async def atake(self, rag_tool):
+        """Ön-aramanın sonuçlarını bekler (asenkron). Ön-arama hata verdiyse None."""
+        started = time.perf_counter()
+        try:
+            outcome = await asyncio.shield(self.pending[rag_tool])
+        except Exception as e:
+            print(f"⚠️ Spekülatif arama başarısız ({rag_tool.collection_name}), normal aramaya geçildi: {e}")
+            return None
+        return self._use(rag_tool, outcome, time.perf_counter() - started)
+
+    def finish(self, search_jobs):
+        """
+        Kullanılmayan ön-aramaları iptal eder ve sonucu kaydeder.
+        search_jobs: Planlayıcının ürettiği arama çağrısı sayısı (madde aracı hariç).
+        """
+        if self.finished:
+            return
+        self.finished = True
+        for rag_tool, handle in self.pending.items():
+            if rag_tool not in self.used:
+                handle.cancel()
+
+        saved = 0.0
+        if self.used:
+            saved = max(0.0, max(s for s, _ in self.used.values()) - max(w for _, w in self.used.values()))
+        stats = {
+            "prefetched": len(self.pending),
+            "used": len(self.used),
+            "hits": self.hit_jobs,
+            "misses": max(0, search_jobs - self.hit_jobs),
+            "saved_seconds": round(saved, 4),
+        }
+        metrics.record_speculation(stats)
+        self.speculator.record(stats)
+
+
+class SpeculativeRetriever:
+    """
+    SPEKÜLATİF ARAMA YÖNETİCİSİ
+    ---------------------------
+    Ön-aramaları başlatır (start: thread havuzunda, astart: asyncio görevleri)
+    ve süreç genelindeki isabet/kazanç sayaçlarını tutar.
+    """
+
+    def __init__(self, tools_map, executor):
+        """
+        Girdi:
+        - tools_map: {kanun_anahtarı: LegalRAGTool}
+        - executor: Senkron akışta ön-aramaların çalıştığı thread havuzu
+        """
+        self.tools_map = tools_map
+        self.executor = executor
+        self.requests = 0
+        self.prefetched = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _targets(self, decision):
+        """Yönlendirici puanına göre en olası SPECULATIVE_COLLECTIONS kanunun aracı."""
+        ranked = sorted(decision.scores, key=decision.scores.get, reverse=True)
+        return [self.tools_map[key] for key in ranked[:config.SPECULATIVE_COLLECTIONS] if key in self.tools_map]
+
+    def start(self, question, question_embedding, decision):
+        """Senkron akış (generate_answer): ön-aramalar thread havuzunda başlar."""
+        pending = {
+            # copy_context: thread'deki arama süreleri de isteğin izine yazılır
+            tool: self.executor.submit(
+                contextvars.copy_context().run, _timed, tool.get_context, question, question_embedding
+            )
+            for tool in self._targets(decision)
+        }
+        return Speculation(self, question, question_embedding, pending)
+
+    def astart(self, question, question_embedding, decision):
+        """Asenkron akışlar: ön-aramalar asyncio görevleri olarak başlar."""
+        pending = {}
+        for tool in self._targets(decision):
+            task = asyncio.ensure_future(_atimed(tool.aget_context, question, question_embedding))
+            # Kimse beklemezse (iptal/hata) "exception was never retrieved" uyarısını önler
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            pending[tool] = task
+        return Speculation(self, question, question_embedding, pending)
+
+    def record(self, stats):
+        self.requests += 1
+        self.prefetched += stats["prefetched"]
+        self.hits += stats["hits"]
+        self.misses += stats["misses"]
+        self.saved_seconds += stats["saved_seconds"]
+
+    def stats(self):
+        searches = self.hits + self.misses
+        return {
+            "requests": self.requests,
+            "prefetched": self.prefetched,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / searches, 4) if searches else None,
+            "saved_seconds_total": round(self.saved_seconds, 4),
+            "saved_seconds_mean": round(self.saved_seconds / self.requests, 4) if self.requests else None,
+        }
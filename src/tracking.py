@@ -0,0 +1,256 @@
+"""
+tracking.py — Arka Planda Toplu MLflow Yazımı
+==============================================
+Her istek için bir MLflow run'ı açmak (SQLite'a birkaç yazma) istek yolunda
+onlarca milisaniye sürer ve yük altında veritabanı kilidinde sıraya girer.
+Bu modül yazımı istekten ayırır:
+
+- İstek bitince (metrics.RequestTrace.finish) kayıt bellekteki bir kuyruğa
+  eklenir — put_nowait, bekleme yok.
+- Arka plandaki tek bir thread kuyruğu TRACKING_BATCH_SIZE'lık gruplar halinde
+  boşaltır ve MLflow'a yazar (tek yazar -> SQLite kilit çekişmesi yok).
+- Her grup TEK bir MLflow run'ıdır: gruptaki her istek bir adımdır (step = sıra
+  numarası, timestamp = isteğin bitiş anı). Grup başına 3 çağrı yapılır
+  (create_run, log_batch, set_terminated) — istek başına 3 çağrı değil.
+  MLflow arayüzünde bir metriğin grafiği, o gruptaki isteklerin dağılımını verir.
+- TRACKING_SAMPLE_RATE < 1 ise isteklerin sadece bir kısmı yazılır
+  (veritabanı trafikle sınırsız büyümez).
+- Kuyruk dolarsa (MLflow yavaş / erişilemez) yeni kayıtlar atılır ve sayılır;
+  istekler asla beklemez.
+- Kapanışta (FastAPI shutdown, atexit) kuyruktaki kayıtlar yazılır.
+
+Sayaçlar /stats ('tracking') ve /metrics (legal_rag_tracking_events_total) üzerinden izlenir.
+"""
+
+import atexit
+import functools
+import queue
+import random
+import threading
+import time
+from src import config, metrics
+
+_STOP = object()  # Yazıcı thread'e kapanış işareti
+MLFLOW_MAX_BATCH_METRICS = 1000  # MLflow log_batch sınırı (tek çağrıdaki en fazla metrik)
+
+
+class RequestTracker:
+    """
+    TOPLU MLFLOW YAZICISI
+    ---------------------
+    track() istek yolundan çağrılır ve hiçbir zaman bloklamaz; asıl yazım
+    arka plandaki thread'de yapılır. Thread ilk kayıtta başlatılır.
+    """
+
+    def __init__(self, sample_rate=None, queue_size=None, batch_size=None, flush_interval=None):
+        """
+        Girdi:
+        - sample_rate: Yazılacak isteklerin oranı (0.0 - 1.0)
+        - queue_size: Kuyrukta bekleyebilecek en fazla kayıt (aşılınca atılır)
+        - batch_size: Yazıcının tek seferde boşalttığı en fazla kayıt
+        - flush_interval: Bir grubun dolmasını beklenecek en uzun süre (saniye)
+        """
+        self.sample_rate = config.TRACKING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.batch_size = batch_size or config.TRACKING_BATCH_SIZE
+        self.flush_interval = config.TRACKING_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._queue = queue.Queue(maxsize=queue_size or config.TRACKING_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._client = None
+        self._experiment_id = None
+
+        self.queued = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def _count(self, result, n=1):
+        with self._lock:
+            setattr(self, result, getattr(self, result) + n)
+        metrics.TRACKING_EVENTS.labels(result).inc(n)
+
+    def track(self, trace, outcome):
+        """
+        Biten bir isteği kuyruğa ekler (metrics.RequestTrace.finish dinleyicisi).
+        Örneklemeye takılırsa veya kuyruk doluysa kayıt sadece sayılır.
+        """
+        if self._closed:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self._count("sampled_out")
+            return
+
+        summary = trace.summary()
+        now_ms = int(time.time() * 1000)
+        question = trace.question or ""
+        record = {
+            "question": question[:50] + "..." if len(question) > 50 else question,
+            "start_time": now_ms - int(summary["total"] * 1000),
+            "end_time": now_ms,
+            "status": "FINISHED" if outcome == "ok" else "FAILED",
+            "tags": {"flow": summary["flow"], "outcome": outcome},
+            "metrics": {
+                "latency_total": summary["total"],
+                **{f"latency_{stage}": seconds for stage, seconds in summary["spans"].items()},
+                **{f"tokens_{kind}": count for kind, count in summary["tokens"].items()},
+                "tool_calls": summary["tool_calls"],
+                "cache_hit": float(summary["cache_hit"]),
+                **{f"context_{k}": v for k, v in (summary["context"] or {}).items()},
+                **{f"speculation_{k}": v for k, v in (summary["speculation"] or {}).items()},
+            },
+        }
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count("dropped")
+            return
+        self._count("queued")
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mlflow-tracker", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Yazıcı döngüsü: bir kayıt gelene kadar bekle, grubu doldur (en fazla flush_interval), yaz."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is _STOP
+            records = [r for r in batch if r is not _STOP]
+            if records:
+                self._write(records)
+            if stop:
+                return
+
+    def _connect(self):
+        """MLflow istemcisi ve deney (ilk yazımda, yazıcı thread'inde)."""
+        if self._client is None:
+            # mlflow içe aktarımı ağırdır; sadece yazıcı thread'i öder
+            import mlflow
+            client = mlflow.MlflowClient(tracking_uri=config.MLFLOW_TRACKING_URI)
+            experiment = client.get_experiment_by_name(config.MLFLOW_EXPERIMENT_NAME)
+            self._experiment_id = (
+                experiment.experiment_id if experiment
+                else client.create_experiment(config.MLFLOW_EXPERIMENT_NAME)
+            )
+            self._client = client
+        return self._client
+
+    def _write(self, records):
+        """
+        Bir grup kaydı tek bir MLflow run'ı olarak yazar: her kayıt bir adım (step),
+        istek sonucu 'error' metriği (0/1) olarak tutulur. Yazım hata verirse
+        gruptaki kayıtlar 'failed' sayılır, yazıcı durmaz.
+        """
+        from mlflow.entities import Metric, Param, RunTag
+
+        try:
+            client = self._connect()
+        except Exception as e:
+            print(f"⚠️ MLflow'a bağlanılamadı, {len(records)} kayıt yazılamadı: {e}")
+            self._count("failed", len(records))
+            return
+
+        params = [
+            Param(k, str(v)) for k, v in {
+                "llm_model": config.LLM_MODEL,
+                "top_k": config.TOP_K,
+                "embedding_model": config.EMBEDDING_MODEL,
+                "temperature": config.TEMPERATURE,
+            }.items()
+        ]
+        flows = sorted({r["tags"]["flow"] for r in records})
+        errors = sum(r["status"] != "FINISHED" for r in records)
+        tags = {
+            "requests": str(len(records)),
+            "errors": str(errors),
+            "flows": ",".join(flows),
+            "first_question": records[0]["question"],
+        }
+        metric_rows = [
+            Metric(k, float(v), record["end_time"], step)
+            for step, record in enumerate(records)
+            for k, v in {**record["metrics"], "error": float(record["status"] != "FINISHED")}.items()
+        ]
+        try:
+            run = client.create_run(
+                self._experiment_id,
+                start_time=min(r["start_time"] for r in records),
+                run_name=f"{len(records)} istek ({', '.join(flows)})",
+            )
+            run_id = run.info.run_id
+            # log_batch en fazla MLFLOW_MAX_BATCH_METRICS metrik kabul eder
+            for i in range(0, max(len(metric_rows), 1), MLFLOW_MAX_BATCH_METRICS):
+                client.log_batch(
+                    run_id,
+                    metrics=metric_rows[i:i + MLFLOW_MAX_BATCH_METRICS],
+                    params=params if i == 0 else [],
+                    tags=[RunTag(k, v) for k, v in tags.items()] if i == 0 else [],
+                )
+            client.set_terminated(
+                run_id, status="FINISHED" if errors < len(records) else "FAILED",
+                end_time=max(r["end_time"] for r in records),
+            )
+            self._count("written", len(records))
+        except Exception as e:
+            print(f"⚠️ MLflow'a {len(records)} kayıt yazılamadı: {e}")
+            self._count("failed", len(records))
+
+    def flush(self, timeout=None):
+        """
+        Kuyruktaki kayıtları yazar ve yazıcıyı durdurur (kapanışta çağrılır).
+        Sonraki track() çağrıları yok sayılır.
+        """
+        timeout = config.TRACKING_SHUTDOWN_TIMEOUT if timeout is None else timeout
+        self._closed = True
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"⚠️ MLflow yazıcısı {timeout}s içinde bitmedi; ~{self._queue.qsize()} kayıt yazılmadı.")
+
+    def stats(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "pending": self._queue.qsize(),
+            "queued": self.queued,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+        }
+
+
+@functools.lru_cache(maxsize=1)
+def get_request_tracker():
+    """
+    Süreç genelinde tek yazıcı. İlk çağrıda istek izlerinin bitişine bağlanır
+    ve süreç kapanırken kuyruğun boşaltılması için atexit'e kaydedilir.
+    TRACKING_ENABLED kapalıysa None döner.
+    """
+    if not config.TRACKING_ENABLED:
+        return None
+    tracker = RequestTracker()
+    metrics.add_finish_listener(tracker.track)
+    atexit.register(tracker.flush)
+    return tracker
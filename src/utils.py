@@ -1,14 +1,23 @@
 """
 utils.py — Yardımcı Fonksiyonlar
 =================================
-ChromaDB bağlantısı ve embedding fonksiyonu kurulumu.
+Vektör veritabanı (ChromaDB veya yerel indeks) bağlantısı ve embedding fonksiyonu kurulumu.
 Tüm modüller bu dosyadaki fonksiyonları kullanır.
+
+İstemci Kaydı: OpenAI (senkron), ChromaDB ve embedding fonksiyonu süreç genelinde
+TEK nesnedir (lru_cache). Hepsi config.HTTP_* ile ayarlanan, keep-alive (ve 'h2'
+kuruluysa HTTP/2) bağlantı havuzlarını kullanır.
+
+chromadb ve tiktoken içe aktarımı ağırdır (~0.5 sn); modül yüklenirken değil,
+ilk kullanımda içe aktarılır (soğuk başlangıçta /health'teki dökümde 'init' altında görünür).
 """
 
+import importlib.util
 import os
-import chromadb
-from chromadb.utils import embedding_functions
+from functools import lru_cache
 from src import config
+from src.embedding_cache import QueryEmbeddingCache
+from src.local_index import LocalVectorClient
 
 
 def get_chroma_client():
@@ -24,9 +33,19 @@ def get_chroma_client():
     Not:
         .env dosyasında CHROMA_HOST tanımlı olmalıdır.
     """
+    import chromadb
+
     try:
         # Cloud ChromaDB Bağlantısı (Zorunlu)
-        settings = chromadb.config.Settings()
+        # Bağlantı havuzu ayarları (eski chromadb sürümlerinde olmayan alanlar atlanır)
+        pool_settings = {
+            "chroma_http_keepalive_secs": config.HTTP_KEEPALIVE_EXPIRY,
+            "chroma_http_max_connections": config.HTTP_MAX_CONNECTIONS,
+            "chroma_http_max_keepalive_connections": config.HTTP_MAX_KEEPALIVE,
+        }
+        settings = chromadb.config.Settings(**{
+            k: v for k, v in pool_settings.items() if k in chromadb.config.Settings.__fields__
+        })
         
         # Auth Provider YERİNE Header kullanıyoruz (api.trychroma.com için)
         headers = {}
@@ -50,6 +69,82 @@ def get_chroma_client():
         raise e
 
 
+@lru_cache(maxsize=None)
+def get_vector_client():
+    """
+    Vektör Veritabanı İstemcisini Getir
+    -----------------------------------
+    config.VECTOR_BACKEND ayarına göre:
+    - "chroma": Uzak ChromaDB HttpClient (get_chroma_client)
+    - "local" : Süreç içi, bellek eşlemeli indeks (LocalVectorClient)
+
+    İki istemci de aynı arayüzü (get_collection, get_or_create_collection,
+    delete_collection) sunar. Süreç genelinde tek istemci (tek bağlantı havuzu).
+    """
+    if config.VECTOR_BACKEND == "local":
+        print(f"💾 Yerel vektör indeksi: {config.LOCAL_INDEX_DIR}")
+        return LocalVectorClient(config.LOCAL_INDEX_DIR)
+    return get_chroma_client()
+
+
+def _http2_enabled():
+    """HTTP/2 açık mı: config.HTTP2 ve 'h2' paketi kurulu (httpx[http2])."""
+    return config.HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def http_client_options():
+    """
+    Havuzlu httpx istemcileri için ortak ayarlar (limits, timeout, http2).
+    httpx.Client(**http_client_options()) veya httpx.AsyncClient(...) ile kullanılır.
+    """
+    import httpx
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+        "http2": _http2_enabled(),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """
+    Süreç genelinde TEK senkron OpenAI istemcisi (havuzlu httpx.Client).
+    Ajan, yönlendirici ve embedding fonksiyonu aynı bağlantıları kullanır.
+    """
+    import httpx
+    from openai import OpenAI
+
+    options = http_client_options()
+    return OpenAI(
+        api_key=config.OPENAI_API_KEY,
+        timeout=options["timeout"],
+        http_client=httpx.Client(**options),
+    )
+
+
+def new_async_openai_client():
+    """
+    Havuzlu AsyncOpenAI istemcisi.
+    Asenkron bağlantılar oluşturuldukları event loop'a bağlıdır; bu yüzden süreç
+    geneli değil, event loop'u kullanan nesne (LegalRAG) başına bir tane oluşturulur.
+    """
+    import httpx
+    from openai import AsyncOpenAI
+
+    options = http_client_options()
+    return AsyncOpenAI(
+        api_key=config.OPENAI_API_KEY,
+        timeout=options["timeout"],
+        http_client=httpx.AsyncClient(**options),
+    )
+
+
+@lru_cache(maxsize=None)
 def get_embedding_function():
     """
     Embedding (Vektörleştirme) Fonksiyonunu Getir
@@ -61,12 +156,101 @@ def get_embedding_function():
         
     Kullanım:
         Bu fonksiyon hem veri yüklerken (ingestion) hem de soru sorarken (retrieval)
-        aynı standartta olmalıdır.
+        aynı standartta olmalıdır. Süreç genelinde tek nesnedir; istekler
+        get_openai_client() havuzu üzerinden gider.
     """
+    from chromadb.utils import embedding_functions
+
     if not config.OPENAI_API_KEY:
         raise ValueError("HATA: .env dosyasında OPENAI_API_KEY eksik!")
 
-    return embedding_functions.OpenAIEmbeddingFunction(
+    class PooledOpenAIEmbeddingFunction(embedding_functions.OpenAIEmbeddingFunction):
+        """
+        ChromaDB'nin OpenAI embedding fonksiyonu (aynı ad ve ayarlar; koleksiyon
+        kayıtlarıyla uyumlu), ancak istekler paylaşılan OpenAI istemcisiyle atılır.
+        """
+        def __call__(self, input):
+            return embed_texts(get_openai_client(), input, timeout=config.HTTP_TIMEOUT)
+
+    return PooledOpenAIEmbeddingFunction(
         api_key=config.OPENAI_API_KEY,
         model_name=config.EMBEDDING_MODEL
     )
+
+
+@lru_cache(maxsize=None)
+def get_query_embedding_cache():
+    """
+    Süreç genelinde TEK bir sorgu embedding önbelleği döndürür.
+    Ajan ve tüm LegalRAGTool nesneleri aynı önbelleği (ve sayaçları) paylaşır.
+    """
+    return QueryEmbeddingCache()
+
+
+def embed_texts(client, texts, timeout=None):
+    """
+    Toplu Embedding (Tek İstek)
+    ---------------------------
+    Birden çok metni TEK bir OpenAI embeddings isteğiyle vektörleştirir.
+    Ajan aynı planlama adımındaki tüm arama sorgularını bu fonksiyonla
+    birlikte gönderir; her sorgu için ayrı bir ağ turu ödenmez.
+
+    Girdi:
+        - client: OpenAI istemcisi
+        - texts (list[str]): Vektörleştirilecek metinler
+        - timeout: İstek zaman aşımı (varsayılan: config.EMBEDDING_TIMEOUT — sorgu embedding'i)
+    Çıktı:
+        - list[list[float]]: Girdi sırasıyla aynı sırada vektörler
+    """
+    if not texts:
+        return []
+    response = client.embeddings.create(
+        model=config.EMBEDDING_MODEL, input=list(texts), timeout=timeout or config.EMBEDDING_TIMEOUT
+    )
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+async def aembed_texts(async_client, texts):
+    """embed_texts fonksiyonunun AsyncOpenAI ile çalışan hali."""
+    if not texts:
+        return []
+    response = await async_client.embeddings.create(
+        model=config.EMBEDDING_MODEL, input=list(texts), timeout=config.EMBEDDING_TIMEOUT
+    )
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    """
+    LLM modelinin tokenizer'ı (bilinmeyen model adlarında o200k_base).
+    tiktoken sözlük dosyasını ilk kullanımda indirir; indirilemezse (çevrimdışı) None döner.
+    """
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(config.LLM_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"⚠️ Tokenizer yüklenemedi, yaklaşık token sayımı kullanılacak: {e}")
+        return None
+
+
+def count_tokens(text):
+    """Metnin LLM'e gönderildiğinde kaç token tuttuğu (maliyet hesabı için)."""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return len(text) // 4  # Yaklaşık: ~4 karakter / token
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text, max_tokens):
+    """Metni en fazla max_tokens token olacak şekilde kırpar."""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return text[:max_tokens * 4]
+    token_ids = tokenizer.encode(text, disallowed_special=())
+    if len(token_ids) <= max_tokens:
+        return text
+    return tokenizer.decode(token_ids[:max_tokens])
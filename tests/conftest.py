@@ -0,0 +1,9 @@
+"""
+Test ortamı: src.config içe aktarılırken zorunlu ayarların (CHROMA_HOST) eksik
+olması testleri durdurmasın. Testler ağa, OpenAI'a veya ChromaDB'ye bağlanmaz.
+"""
+
+import os
+
+os.environ.setdefault("CHROMA_HOST", "localhost")
+os.environ.setdefault("OPENAI_API_KEY", "test")
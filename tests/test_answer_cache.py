@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from src import answer_cache, config
+from src.agent import LegalRAG
+from src.answer_cache import SemanticAnswerCache, config_fingerprint, ingest_version, mark_ingested
+from src.local_index import LocalVectorClient
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_similar_question_hits_and_distant_misses():
+    cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_items=10)
+    cache.store([1.0, 0.0], "cevap", [{"id": "a"}])
+    assert cache.lookup([2.0, 0.1]) == ("cevap", [{"id": "a"}])
+    assert cache.lookup([0.0, 1.0]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_items=10)
+    cache.store([1.0, 0.0], "cevap", [])
+    clock[0] += 59
+    assert cache.lookup([1.0, 0.0]) is not None
+    clock[0] += 2
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["items"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = SemanticAnswerCache(threshold=0.99, ttl=60, max_items=2)
+    cache.store([1.0, 0.0, 0.0], "a", [])
+    cache.store([0.0, 1.0, 0.0], "b", [])
+    assert cache.lookup([1.0, 0.0, 0.0])[0] == "a"   # "a" son kullanılan olur
+    cache.store([0.0, 0.0, 1.0], "c", [])
+    assert cache.lookup([0.0, 1.0, 0.0]) is None      # en eski kullanılan "b" atıldı
+    assert cache.lookup([1.0, 0.0, 0.0])[0] == "a"
+    assert cache.lookup([0.0, 0.0, 1.0])[0] == "c"
+
+
+def test_reingestion_invalidates_entries(tmp_path):
+    # Sunucu ve ingestion ayrı istemcilerle (ayrı süreçler gibi) aynı veriye bakar
+    server = LocalVectorClient(str(tmp_path)).get_or_create_collection("law_kmk")
+    ingestion = LocalVectorClient(str(tmp_path)).get_or_create_collection("law_kmk")
+    cache = SemanticAnswerCache(
+        threshold=0.95, ttl=60, max_items=10,
+        version_fn=lambda: ingest_version(server), version_check_interval=0,
+    )
+    cache.store([1.0, 0.0], "eski cevap", [])
+    assert cache.lookup([1.0, 0.0]) is not None
+
+    mark_ingested(ingestion)
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_version_is_checked_at_most_once_per_interval():
+    calls = []
+    cache = SemanticAnswerCache(
+        threshold=0.95, ttl=60, max_items=10,
+        version_fn=lambda: calls.append(1) or len(calls), version_check_interval=60,
+    )
+    cache.store([1.0, 0.0], "cevap", [])
+    assert cache.lookup([1.0, 0.0]) is not None
+    assert len(calls) == 1
+
+
+def test_failed_version_check_keeps_entries():
+    def unreachable():
+        raise ConnectionError("ChromaDB erişilemez")
+
+    cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_items=10, version_fn=unreachable, version_check_interval=0)
+    cache.store([1.0, 0.0], "cevap", [])
+    assert cache.lookup([1.0, 0.0]) is not None
+
+
+def test_mark_ingested_keeps_other_metadata():
+    class Collection:
+        metadata = {"hnsw:space": "cosine", "description": "KMK"}
+
+        def modify(self, metadata):
+            self.metadata = metadata
+
+    collection = Collection()
+    mark_ingested(collection)
+    # hnsw:* ChromaDB'de modify ile gönderilemez
+    assert set(collection.metadata) == {"description", "ingest_version"}
+    assert ingest_version(collection) is not None
+
+
+def test_config_fingerprint_tracks_answer_settings(monkeypatch):
+    before = config_fingerprint()
+    hash(before)
+    monkeypatch.setattr(config, "HYBRID_SEARCH", not config.HYBRID_SEARCH)
+    assert config_fingerprint() != before
+
+
+def test_streamed_cache_hit_sends_references_separately():
+    sources = [{"content": "...", "metadata": {"doc_name": "Kat Mülkiyeti Kanunu", "articles": "Madde 20"}}]
+    cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_items=10)
+    agent = SimpleNamespace(answer_cache=cache, router=None)
+    agent._extract_article_refs = lambda used: LegalRAG._extract_article_refs(agent, used)
+    agent._split_answer = lambda answer, used: LegalRAG._split_answer(agent, answer, used)
+    agent._finalize_answer = lambda answer, used: LegalRAG._finalize_answer(agent, answer, used)
+
+    async def aembed(question):
+        return [1.0, 0.0]
+    agent._aembed_question = aembed
+    cache.store([1.0, 0.0], agent._finalize_answer("Aidat ödenmelidir.", sources), sources)
+
+    async def collect():
+        return [event async for event in LegalRAG.astream_answer(agent, "Aidat?")]
+
+    events = asyncio.run(collect())
+    assert [name for name, _ in events] == ["routing", "sources", "token", "references", "done"]
+    assert events[2][1] == {"text": "Aidat ödenmelidir."}
+    assert events[3][1]["text"].startswith("📌 Kaynak: Kat Mülkiyeti Kanunu")
@@ -0,0 +1,95 @@
+import json
+from types import SimpleNamespace
+from src.agent import LegalRAG
+from src.article_index import ArticleIndex, articles_in_span, normalize_type, parse_articles
+
+TEXT = """BİRİNCİ KISIM
+Genel Hükümler
+Madde 1 – Bu kanun kat mülkiyetini düzenler.
+Madde 2 – Tanımlar. Madde 1 hükmü saklıdır.
+İKİNCİ KISIM
+Birinci Bölüm
+MADDE 20- Her kat maliki ortak giderlere katılmakla yükümlüdür.
+Ek Madde 1 – Yönetim planı değiştirilebilir.
+GEÇİCİ MADDE 1 – Eski hükümler uygulanır.
+"""
+
+
+def test_parse_articles_finds_headings_and_ignores_references():
+    articles = parse_articles("kmk", TEXT)
+    assert [a["label"] for a in articles] == [
+        "Madde 1", "Madde 2", "Madde 20", "Ek Madde 1", "Geçici Madde 1",
+    ]
+    # "Madde 1 hükmü" metin içi atıftır, başlık değildir
+    assert "Madde 1 hükmü saklıdır" in articles[1]["text"]
+
+
+def test_parse_articles_tracks_part_section_and_spans():
+    articles = parse_articles("kmk", TEXT)
+    first, article_20 = articles[0], articles[2]
+    assert first["part"] == "BİRİNCİ KISIM"
+    assert article_20["part"] == "İKİNCİ KISIM"
+    assert article_20["section"] == "Birinci Bölüm"
+    assert TEXT[article_20["start"]:article_20["end"]].strip() == article_20["text"]
+    assert article_20["end"] == articles[3]["start"]
+
+
+def test_normalize_type():
+    assert normalize_type("EK  MADDE") == "Ek Madde"
+    assert normalize_type("GEÇİCİ MADDE") == "Geçici Madde"
+    assert normalize_type("MADDE") == "Madde"
+
+
+def test_articles_in_span_returns_overlapping_labels_in_order():
+    articles = parse_articles("kmk", TEXT)
+    start = articles[1]["start"] + 5
+    end = articles[2]["start"] + 5
+    assert articles_in_span(articles, start, end) == ["Madde 2", "Madde 20"]
+
+
+def test_get_article_by_number_and_type():
+    index = ArticleIndex()
+    index.set_law("kmk", parse_articles("kmk", TEXT))
+    assert len(index) == 5
+    assert index.get("kmk", 20)["label"] == "Madde 20"
+    assert index.get("kmk", " 1 ", "EK MADDE")["text"].startswith("Ek Madde 1")
+    assert index.get("kmk", "1", "Geçici Madde")["label"] == "Geçici Madde 1"
+    assert index.get("kmk", 99) is None
+    assert index.get("tbk", 1) is None
+    assert "start" not in index.get("kmk", 1)
+
+
+def test_set_law_replaces_only_that_law():
+    index = ArticleIndex()
+    index.set_law("kmk", parse_articles("kmk", TEXT))
+    index.set_law("tbk", parse_articles("tbk", "Madde 314 – Kiracı kira bedelini öder."))
+    index.set_law("kmk", parse_articles("kmk", "Madde 20 – Yeni metin."))
+    assert index.get("kmk", 1) is None
+    assert index.get("kmk", 20)["text"] == "Madde 20 – Yeni metin."
+    assert index.get("tbk", 314) is not None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "articles" / "index.json")
+    index = ArticleIndex()
+    index.set_law("kmk", parse_articles("kmk", TEXT))
+    index.save(path)
+
+    loaded = ArticleIndex.load(path)
+    assert loaded.get("kmk", 20) == index.get("kmk", 20)
+    assert len(ArticleIndex.load(str(tmp_path / "missing.json"))) == 0
+
+
+def test_agent_get_article_returns_search_result_format():
+    index = ArticleIndex()
+    index.set_law("kmk", parse_articles("kmk", TEXT))
+    agent = SimpleNamespace(article_index=index)
+
+    def call(**args):
+        return SimpleNamespace(function=SimpleNamespace(arguments=json.dumps(args)))
+
+    [result] = LegalRAG._get_article(agent, call(law="kmk", number="20"))
+    assert result["id"] == "kmk:Madde 20"
+    assert result["metadata"]["articles"] == "Madde 20"
+    assert result["metadata"]["doc_name"] == "Kat Mülkiyeti Kanunu"
+    assert LegalRAG._get_article(agent, call(law="kmk", number="99")) == []
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from src.agent import LegalRAG
+
+AGENT = SimpleNamespace(_batch_pending=LegalRAG._batch_pending)
+
+
+def test_batch_items_deduplicates_case_and_whitespace():
+    items, index = LegalRAG._batch_items(AGENT, [
+        "Aidat ödemezsem ne olur?", "  aidat   ÖDEMEZSEM ne olur? ", "Kira artışı?", "Aidat ödemezsem ne olur?",
+    ])
+    assert [item["question"] for item in items] == ["Aidat ödemezsem ne olur?", "Kira artışı?"]
+    assert index == [0, 0, 1, 0]
+    assert all(item["error"] is None for item in items)
+
+
+def test_batch_items_marks_empty_questions():
+    items, index = LegalRAG._batch_items(AGENT, ["", "Kira artışı?", "   "])
+    assert index == [0, 1, 0]
+    assert items[0]["error"] == "Soru boş olamaz."
+    assert LegalRAG._batch_pending(items) == [items[1]]
+
+
+def test_batch_results_follow_input_order_and_isolate_errors():
+    items, index = LegalRAG._batch_items(AGENT, ["A sorusu", "B sorusu", "a sorusu", "C sorusu"])
+
+    def answer(item):
+        if item["question"] == "B sorusu":
+            raise RuntimeError("LLM hatası")
+        item["answer"], item["sources"] = f"cevap: {item['question']}", []
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        LegalRAG._batch_map(AGENT, pool, answer, LegalRAG._batch_pending(items))
+
+    results = LegalRAG._batch_results(AGENT, items, index)
+    assert results == [
+        {"answer": "cevap: A sorusu", "sources": []},
+        {"error": "İşlem hatası: LLM hatası"},
+        {"answer": "cevap: A sorusu", "sources": []},
+        {"answer": "cevap: C sorusu", "sources": []},
+    ]
@@ -0,0 +1,24 @@
+import statistics
+import time
+import httpx
+
+
+def test_stub_server_adds_no_transport_delay(monkeypatch):
+    # src.benchmark içe aktarılırken VECTOR_BACKEND'i değiştirir; test bitince geri alınır
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    from src.benchmark import StubOpenAIServer
+
+    stub = StubOpenAIServer(embedding_latency=0.0)
+    url = stub.start()
+    try:
+        with httpx.Client() as client:
+            timings = []
+            for _ in range(10):
+                started = time.perf_counter()
+                response = client.post(f"{url}/embeddings", json={"input": ["aidat"], "model": "test"})
+                timings.append(time.perf_counter() - started)
+                assert response.status_code == 200
+    finally:
+        stub.stop()
+    # Nagle + gecikmeli ACK her yanıta ~40 ms eklerdi; ölçülen süre ayarlanan gecikmeye yakın olmalı
+    assert statistics.median(timings[1:]) < 0.02
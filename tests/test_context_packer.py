@@ -0,0 +1,53 @@
+import pytest
+from src import config, utils
+from src.context_packer import NO_RESULTS, SEEN_RESULTS, pack_context
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """Deterministik token sayımı: kelime başına bir token (tiktoken indirilmez)."""
+    monkeypatch.setattr(utils, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(utils, "truncate_tokens", lambda text, n: " ".join(text.split()[:n]))
+
+
+def result(id_, content, **metadata):
+    return {"id": id_, "content": content, "metadata": {"source": "kmk", **metadata}}
+
+
+def test_duplicates_are_written_once():
+    chunk = result("a", "aidat borcu faiz")
+    contents, sources, stats = pack_context([("t1", [chunk]), ("t2", [chunk])], budget=100)
+    assert contents == ["aidat borcu faiz", SEEN_RESULTS]
+    assert stats["duplicates"] == 1
+    assert [s["id"] for s in sources] == ["a"]
+
+
+def test_overlapping_spans_are_merged():
+    text = "bir iki üç dört beş altı"
+    first = result("a", text[:13], char_start=0, char_end=13)     # "bir iki üç dö"
+    second = result("b", text[8:], char_start=8, char_end=len(text))
+    contents, _, stats = pack_context([("t", [first, second])], budget=100)
+    assert contents == [text]
+    assert stats["merged"] == 1
+
+
+def test_budget_drops_less_relevant_passages():
+    results = [result("a", "a " * 6), result("b", "b " * 6), result("c", "c " * 3)]
+    contents, sources, stats = pack_context([("t", results)], budget=10)
+    assert stats["packed_tokens"] <= 10
+    assert stats["dropped"] == 1
+    assert [s["id"] for s in sources] == ["a", "c"]
+    assert stats["saved_tokens"] == stats["naive_tokens"] - stats["packed_tokens"]
+
+
+def test_single_passage_over_budget_is_truncated():
+    contents, _, stats = pack_context([("t", [result("a", "x " * 50)])], budget=8)
+    assert stats["packed_tokens"] == 8
+    assert len(contents[0].split()) == 8
+
+
+def test_empty_search_and_default_budget(monkeypatch):
+    monkeypatch.setattr(config, "CONTEXT_TOKEN_BUDGET", 2)
+    contents, sources, stats = pack_context([("t1", []), ("t2", [result("a", "bir iki üç")])])
+    assert contents[0] == NO_RESULTS
+    assert stats["packed_tokens"] == 2
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from src.embedding_cache import QueryEmbeddingCache, normalize_text
+
+
+class Embedder:
+    """Çağrıları kaydeden sahte embedding fonksiyonu."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return QueryEmbeddingCache(path=str(tmp_path / "embeddings.sqlite"), max_items=10, model="test-model")
+
+
+def test_normalize_text_turkish_case_and_spaces():
+    assert normalize_text("  İSTANBUL   Kira\n") == "istanbul kira"
+    assert normalize_text("KIRA") == "kıra"
+    assert "̇" not in normalize_text("İzmir")  # lower()'ın eklediği birleşik nokta yok
+
+
+def test_variants_share_one_embedding_of_original_text(cache):
+    embed = Embedder()
+    vectors = cache.get_many(["İzmir  Aidat", "izmir aidat", "Kira"], embed)
+    assert embed.calls == [["İzmir  Aidat", "Kira"]]
+    assert vectors[0] == vectors[1]
+    assert cache.get("İZMİR AİDAT", embed) == vectors[0]
+    assert len(embed.calls) == 1
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_without_normalization_texts_are_exact(tmp_path):
+    cache = QueryEmbeddingCache(path=str(tmp_path / "chunks.sqlite"), max_items=10, model="m", normalize=False)
+    embed = Embedder()
+    cache.get_many(["Madde 1", "madde 1"], embed)
+    assert embed.calls == [["Madde 1", "madde 1"]]
+
+
+def test_disk_tier_survives_new_instance(cache, tmp_path):
+    embed = Embedder()
+    cache.get("aidat", embed)
+    fresh = QueryEmbeddingCache(path=cache.path, max_items=10, model="test-model")
+    assert fresh.get("Aidat", embed) == [5.0, 1.0]
+    assert len(embed.calls) == 1
+    assert fresh.stats()["disk_hits"] == 1
+    # Model değişirse eski vektör kullanılmaz
+    other = QueryEmbeddingCache(path=cache.path, max_items=10, model="other-model")
+    other.get("aidat", embed)
+    assert len(embed.calls) == 2
+
+
+def test_async_get_many(cache):
+    embed = Embedder()
+
+    async def aembed(texts):
+        return embed(texts)
+
+    vectors = asyncio.run(cache.aget_many(["Yeni  Soru", "yeni soru"], aembed))
+    assert embed.calls == [["Yeni  Soru"]]
+    assert vectors[0] == vectors[1] == [10.0, 1.0]
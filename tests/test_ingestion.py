@@ -0,0 +1,227 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.article_index import parse_articles
+from src import config, ingestion
+from src.ingestion import (
+    StageTimer, chunk_ids, chunk_metadatas, chunk_spans, content_hash, embedding_batches,
+    prepare_document, sync_collection, upload_chunks,
+)
+
+TEXT = (
+    "BİRİNCİ KISIM\n"
+    "Madde 1 – Bu Kanun kat mülkiyetini düzenler.\n"
+    "Madde 2 – Tanımlar bu maddede yer alır.\n"
+    "Madde 3 – Madde 1 hükmü saklıdır; aidat ödenir.\n"
+)
+
+PAGE_1 = (
+    "BİRİNCİ KISIM\n"
+    "Madde 1 – Bu Kanun kat mülkiyetini düzenler.\n"
+    "Madde 2 – Tanımlar bu maddede yer alır.\n"
+)
+PAGE_2 = (
+    "Madde 3 – Madde 1 hükmü saklıdır; aidat ödenir.\n"
+    "Geçici Madde 1 – Yürürlük tarihi.\n"
+)
+
+
+def test_chunk_spans_overlapping_chunks():
+    text = "abcdefghij"
+    assert chunk_spans(text, ["abcdef", "efghij"]) == [(0, 6), (4, 10)]
+
+
+def test_chunk_spans_repeated_text_moves_forward():
+    text = "Madde 1 x Madde 1 x"
+    assert chunk_spans(text, ["Madde 1 x", "Madde 1 x"]) == [(0, 9), (10, 19)]
+
+
+def test_chunk_spans_missing_chunk():
+    assert chunk_spans("abc", ["zz", "bc"]) == [(-1, -1), (1, 3)]
+
+
+def test_chunk_metadatas_lists_covered_articles():
+    chunks = [TEXT[:TEXT.index("Madde 2")], TEXT[TEXT.index("Madde 2"):], "bulunamayan parça"]
+    metas = chunk_metadatas("kmk", {"name": "KMK"}, TEXT, chunks, parse_articles("kmk", TEXT))
+
+    split = TEXT.index("Madde 2")
+    assert metas[0] == {
+        "source": "kmk", "doc_name": "KMK", "articles": "Madde 1", "char_start": 0, "char_end": split,
+    }
+    assert (metas[1]["char_start"], metas[1]["char_end"]) == (split, len(TEXT))
+    # "Madde 1 hükmü" bir atıftır, başlık değildir
+    assert metas[1]["articles"] == "Madde 2, Madde 3"
+    assert "articles" not in metas[2] and "char_start" not in metas[2]
+
+
+def test_prepare_document_matches_articles_and_pages_to_chunks(monkeypatch):
+    monkeypatch.setattr(ingestion, "load_pdf_pages", lambda path, pdf_hash=None: [(1, PAGE_1), (2, PAGE_2)])
+    monkeypatch.setattr(ingestion, "chunk_text", lambda text: [
+        text[:text.index("Madde 2")],
+        text[text.index("Madde 2"):text.index("Geçici")],
+        text[text.index("Geçici"):],
+    ])
+    prepared = prepare_document("kmk", {"name": "KMK", "path": "kmk.pdf"})
+
+    labels = [a["label"] for a in prepared["articles"]]
+    assert labels == ["Madde 1", "Madde 2", "Madde 3", "Geçici Madde 1"]
+    assert prepared["articles"][0]["part"] == "BİRİNCİ KISIM"
+
+    metas = prepared["metadatas"]
+    assert metas[0]["articles"] == "Madde 1"
+    assert metas[1]["articles"] == "Madde 2, Madde 3"
+    assert metas[2]["articles"] == "Geçici Madde 1"
+    assert (metas[1]["page_start"], metas[1]["page_end"]) == (1, 2)
+    assert (metas[2]["page_start"], metas[2]["page_end"]) == (2, 2)
+    assert len(set(prepared["ids"])) == 3
+
+
+def test_prepare_document_unreadable_pdf(monkeypatch):
+    monkeypatch.setattr(ingestion, "load_pdf_pages", lambda path, pdf_hash=None: None)
+    prepared = prepare_document("kmk", {"name": "KMK", "path": "yok.pdf"})
+    assert prepared["chunks"] == [] and prepared["metadatas"] == []
+
+
+class RecordingCollection:
+    """Sadece sync_collection'ın kullandığı işlemleri bellekte yapan sahte koleksiyon."""
+
+    def __init__(self, items=None):
+        self.items = dict(items or {})
+        self.calls = []
+        self.metadata = None
+
+    def modify(self, metadata):
+        self.calls.append(("modify", sorted(metadata)))
+        self.metadata = metadata
+
+    def get(self, include=None):
+        return {"ids": list(self.items)}
+
+    def add(self, ids, documents, metadatas, embeddings=None):
+        self.calls.append(("add", list(ids)))
+        self.items.update(zip(ids, zip(documents, metadatas)))
+
+    def delete(self, ids):
+        self.calls.append(("delete", list(ids)))
+        for i in ids:
+            del self.items[i]
+
+    def update(self, ids, metadatas):
+        self.calls.append(("update", list(ids)))
+        for i, meta in zip(ids, metadatas):
+            self.items[i] = (self.items[i][0], meta)
+
+
+def fake_embed(texts):
+    return [[float(len(t))] for t in texts]
+
+
+def sync(collection, ids, chunks, metadatas, previous, embed=fake_embed, progress=None):
+    prepared = {"ids": ids, "chunks": chunks, "metadatas": metadatas}
+    with ThreadPoolExecutor(max_workers=2) as embedder:
+        return sync_collection(collection, embed, embedder, prepared, previous, StageTimer(), progress)
+
+
+def manifest_chunks(ids, metadatas):
+    return {i: content_hash(json.dumps(m, sort_keys=True)) for i, m in zip(ids, metadatas)}
+
+
+def test_chunk_ids_are_content_derived_and_unique():
+    ids = chunk_ids("kmk", ["aynı", "farklı", "aynı"])
+    assert ids[0] == chunk_ids("kmk", ["aynı"])[0]
+    assert ids[2] == f"{ids[0]}_2"
+    assert len(set(ids)) == 3
+
+
+def test_sync_collection_only_touches_the_difference():
+    chunks = ["Madde 1 metni", "Madde 2 metni", "Madde 3 metni"]
+    ids = chunk_ids("kmk", chunks)
+    metas = [{"articles": "Madde 1"}, {"articles": "Madde 2"}, {"articles": "Madde 3"}]
+    collection = RecordingCollection()
+    assert sync(collection, ids, chunks, metas, {}) == (3, 0, 0)
+    previous = manifest_chunks(ids, metas)
+
+    assert collection.calls[-1] == ("modify", ["ingest_version"])
+
+    # Aynı girdi: hiçbir yazma yapılmaz, sürüm değişmez
+    collection.calls.clear()
+    assert sync(collection, ids, chunks, metas, previous) == (0, 0, 0)
+    assert collection.calls == []
+
+    # Madde 2 değişti, Madde 3'ün sadece metadata'sı değişti
+    new_chunks = ["Madde 1 metni", "Madde 2 yeni metni", "Madde 3 metni"]
+    new_ids = chunk_ids("kmk", new_chunks)
+    new_metas = [metas[0], metas[1], {"articles": "Madde 3, Madde 4"}]
+    assert sync(collection, new_ids, new_chunks, new_metas, previous) == (1, 1, 1)
+    assert sorted(name for name, _ in collection.calls) == ["add", "delete", "modify", "update"]
+    assert ("add", [new_ids[1]]) in collection.calls
+    assert ("delete", [ids[1]]) in collection.calls
+    assert ("update", [ids[2]]) in collection.calls
+    assert collection.items == dict(zip(new_ids, zip(new_chunks, new_metas)))
+    # Eskimiş parça ancak yeni parça yazıldıktan sonra silinir
+    names = [name for name, _ in collection.calls]
+    assert names.index("add") < names.index("delete")
+
+
+def test_sync_collection_keeps_stale_chunks_when_upload_fails(monkeypatch):
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 1)
+    monkeypatch.setattr(config, "INGEST_MAX_RETRIES", 1)
+    chunks = ["Madde 1 metni", "Madde 2 metni"]
+    ids = chunk_ids("kmk", chunks)
+    metas = [{"articles": "Madde 1"}, {"articles": "Madde 2"}]
+    collection = RecordingCollection()
+    sync(collection, ids, chunks, metas, {})
+    previous = manifest_chunks(ids, metas)
+
+    def failing_embed(texts):
+        if texts == ["Madde 2 bozuk metin"]:
+            time.sleep(0.05)
+            raise RuntimeError("embedding servisi yanıt vermiyor")
+        return fake_embed(texts)
+
+    new_chunks = ["Madde 1 yeni metni", "Madde 2 bozuk metin"]
+    new_ids = chunk_ids("kmk", new_chunks)
+    progress = {"added": 0, "deleted": 0, "updated": 0}
+    collection.calls.clear()
+    with pytest.raises(RuntimeError, match="embedding servisi"):
+        sync(collection, new_ids, new_chunks, metas, previous, embed=failing_embed, progress=progress)
+
+    # Eski metin yerinde kalır; yazılan batch çağırana bildirilir ve sürüm yine değişir
+    assert [name for name, _ in collection.calls] == ["add", "modify"]
+    assert set(ids) <= set(collection.items)
+    assert progress == {"added": 1, "deleted": 0, "updated": 0}
+
+
+def test_upload_chunks_cancels_queued_batches_and_keeps_finished_ones(monkeypatch):
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 1)
+    monkeypatch.setattr(config, "INGEST_MAX_RETRIES", 1)
+    embedded = []
+
+    def embed(texts):
+        embedded.extend(texts)
+        if texts == ["a"]:
+            raise RuntimeError("kota aşıldı")
+        time.sleep(0.05)  # Hata anında hâlâ çalışıyor
+        return fake_embed(texts)
+
+    ids = list("abcdefgh")
+    collection = RecordingCollection()
+    progress = {"added": 0}
+    with ThreadPoolExecutor(max_workers=2) as embedder, pytest.raises(RuntimeError, match="kota"):
+        upload_chunks(collection, embed, embedder, ids, ids, [{}] * len(ids), StageTimer(), progress)
+    # Sıradaki batch'ler hiç gönderilmez (en fazla boşalan işçinin aldığı tek batch);
+    # hata anında çalışmakta olan batch'ler bitince yazılır
+    assert {"a", "b"} <= set(embedded) <= {"a", "b", "c"}
+    written = sorted(i for _, batch in collection.calls for i in batch)
+    assert written == sorted(set(embedded) - {"a"})
+    assert progress == {"added": len(written)}
+
+
+def test_embedding_batches_respect_count_and_char_limits(monkeypatch):
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 3)
+    monkeypatch.setattr(config, "INGEST_BATCH_CHARS", 10)
+    ids = ["a", "b", "c", "d", "e", "f"]
+    documents = ["xx", "xx", "xx", "xx", "xxxxxxxxxxxx", "x"]
+    # "e" tek başına sınırı aşsa da kendi batch'ine girer (boş batch üretilmez)
+    assert list(embedding_batches(ids, documents)) == [["a", "b", "c"], ["d"], ["e"], ["f"]]
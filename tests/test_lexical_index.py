@@ -0,0 +1,63 @@
+from src.lexical_index import (
+    LexicalIndex, index_path, reciprocal_rank_fusion, stem, tokenize, turkish_fold,
+)
+
+
+def test_turkish_fold_handles_dotted_and_dotless_i():
+    assert turkish_fold("İSTANBUL IĞDIR") == "istanbul ığdır"
+    assert turkish_fold("Hâkim Kâtip") == "hakim katip"
+
+
+def test_stem_strips_suffixes_but_keeps_short_words_and_numbers():
+    assert stem("aidatını") == "aidat"
+    assert stem("maliklerinin") == "malik"
+    assert stem("kat") == "kat"
+    assert stem("18") == "18"
+
+
+def test_tokenize_drops_stopwords_and_matches_inflected_forms():
+    assert tokenize("AİDATINI ve Maliklerinin") == ["aidat", "malik"]
+    assert tokenize("aidat") == tokenize("Aidatını")
+
+
+def test_search_ranks_matching_document_first():
+    index = LexicalIndex.build(
+        ["a", "b", "c"],
+        [
+            "Kat malikleri yönetim planına uymak zorundadır.",
+            "AİDATINI ödemeyen malik hakkında icra takibi başlatılır.",
+            "Kırmızı etiketli yapılar kullanılamaz.",
+        ],
+    )
+    results = index.search("aidat ödemeyen", k=3)
+    assert [index.ids[i] for i, _ in results] == ["b"]
+    assert index.result(results[0][0])["id"] == "b"
+
+
+def test_search_prefers_rarer_terms():
+    index = LexicalIndex.build(
+        ["a", "b", "c"],
+        ["malik aidat", "malik kira", "malik tapu"],
+    )
+    results = index.search("malik aidat", k=3)
+    assert index.ids[results[0][0]] == "a"
+    assert results[0][1] > results[1][1]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = LexicalIndex.build(["a"], ["Yönetim planı"], [{"source": "kmk"}])
+    path = index_path(str(tmp_path), "kmk_db")
+    index.save(path)
+
+    loaded = LexicalIndex.load(path)
+    assert loaded.result(0) == {"id": "a", "content": "Yönetim planı", "metadata": {"source": "kmk"}}
+    assert loaded.search("yönetim", k=1) == index.search("yönetim", k=1)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]], k=60)
+    assert fused == ["b", "c", "a", "d"]
+
+
+def test_reciprocal_rank_fusion_single_ranking_keeps_order():
+    assert reciprocal_rank_fusion([["x", "y", "z"]]) == ["x", "y", "z"]
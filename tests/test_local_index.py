@@ -0,0 +1,136 @@
+import threading
+import numpy as np
+import pytest
+from src.local_index import LocalCollection, LocalVectorClient
+
+
+def brute_force(matrix, ids, query, n):
+    """Karesi alınmış L2 mesafesine göre en yakın n kaydın id'leri (ChromaDB 'l2')."""
+    distances = ((np.asarray(matrix) - np.asarray(query)) ** 2).sum(axis=1)
+    order = np.argsort(distances, kind="stable")[:n]
+    return [ids[i] for i in order], distances[order]
+
+
+@pytest.fixture
+def client(tmp_path):
+    return LocalVectorClient(str(tmp_path / "index"))
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+def test_query_matches_brute_force_l2(client, rng):
+    collection = client.get_or_create_collection("kmk_db")
+    matrix = rng.normal(size=(40, 8)).astype(np.float32)
+    ids = [f"c{i}" for i in range(40)]
+    collection.add(ids=ids, documents=[f"metin {i}" for i in ids], embeddings=matrix)
+
+    queries = rng.normal(size=(3, 8)).astype(np.float32)
+    results = collection.query(query_embeddings=queries, n_results=5)
+    for row, query in enumerate(queries):
+        expected_ids, expected_distances = brute_force(matrix, ids, query, 5)
+        assert results["ids"][row] == expected_ids
+        assert results["documents"][row] == [f"metin {i}" for i in expected_ids]
+        np.testing.assert_allclose(results["distances"][row], expected_distances, rtol=1e-4, atol=1e-4)
+
+
+def test_upsert_and_delete_keep_rows_aligned(client, rng):
+    collection = client.get_or_create_collection("kmk_db")
+    collection.add(ids=["a", "b", "c"], documents=["A", "B", "C"],
+                   metadatas=[{"n": 1}, {"n": 2}, {"n": 3}], embeddings=np.eye(3))
+    collection.upsert(ids=["b", "d"], documents=["B2", "D"], metadatas=[{"n": 20}, {"n": 4}],
+                      embeddings=[[0, 0, 5], [1, 1, 0]])
+    assert collection.count() == 4
+    assert collection.get(ids=["b"])["documents"] == ["B2"]
+
+    collection.delete(ids=["a"])
+    assert collection.get()["ids"] == ["b", "c", "d"]
+    top = collection.query(query_embeddings=[[0, 0, 5]], n_results=1)
+    assert top["ids"] == [["b"]] and top["metadatas"] == [[{"n": 20}]]
+    assert top["distances"][0][0] == pytest.approx(0.0)
+
+
+def test_add_rejects_existing_ids(client):
+    collection = client.get_or_create_collection("kmk_db")
+    collection.add(ids=["a"], documents=["A"], embeddings=[[1.0, 0.0]])
+    with pytest.raises(ValueError):
+        collection.add(ids=["a"], documents=["A"], embeddings=[[1.0, 0.0]])
+
+
+def test_reader_reloads_after_external_write(client, tmp_path):
+    writer = client.get_or_create_collection("kmk_db")
+    writer.add(ids=["a"], documents=["eski"], embeddings=[[1.0, 0.0]])
+    # Başka bir süreç (ör. ingestion) aynı klasörü açmış gibi
+    reader = LocalCollection("kmk_db", str(tmp_path / "index" / "kmk_db"))
+    assert reader.count() == 1
+
+    writer.upsert(ids=["a", "b"], documents=["yeni", "ikinci"], embeddings=[[1.0, 0.0], [0.0, 1.0]])
+    assert reader.count() == 2
+    result = reader.query(query_embeddings=[[0.0, 1.0]], n_results=1)
+    assert result["ids"] == [["b"]] and result["documents"] == [["ikinci"]]
+
+
+def test_only_current_matrix_file_is_kept(client, tmp_path):
+    collection = client.get_or_create_collection("kmk_db")
+    for i in range(3):
+        collection.upsert(ids=[f"c{i}"], documents=["x"], embeddings=[[float(i), 1.0]])
+    matrices = [f for f in (tmp_path / "index" / "kmk_db").iterdir() if f.suffix == ".npy"]
+    assert len(matrices) == 1
+
+
+def test_missing_collection_and_delete(client):
+    with pytest.raises(ValueError):
+        client.get_collection("yok")
+    client.get_or_create_collection("kmk_db")
+    assert client.list_collections() == ["kmk_db"]
+    client.delete_collection("kmk_db")
+    assert client.list_collections() == []
+
+
+def test_query_uses_one_snapshot_while_collection_is_rewritten(client):
+    collection = client.get_or_create_collection("kmk_db")
+    collection.add(ids=["a", "b"], documents=["A", "B"], embeddings=[[1.0, 0.0], [0.0, 1.0]])
+
+    def embed_and_rewrite(texts):
+        # Sorgu vektörleştirilirken başka bir thread koleksiyonu yeniden yazar
+        collection.delete(ids=["a"])
+        return [[1.0, 0.0] for _ in texts]
+
+    collection.embedding_function = embed_and_rewrite
+    result = collection.query(query_texts=["a"], n_results=2)
+    # Sorgu başladığı andaki anlık görüntüden cevaplanır: kayıtlar ve vektörler tutarlı
+    assert result["ids"] == [["a", "b"]] and result["documents"] == [["A", "B"]]
+    assert result["distances"][0][0] == pytest.approx(0.0)
+    assert collection.get()["ids"] == ["b"]
+
+
+def test_concurrent_reads_never_mix_records_and_vectors(client):
+    collection = client.get_or_create_collection("kmk_db")
+    collection.add(ids=["c0"], documents=["0"], embeddings=[[0.0, 1.0]])
+    stop = threading.Event()
+    errors = []
+
+    def write():
+        for i in range(1, 40):
+            collection.upsert(ids=[f"c{i}"], documents=[str(i)], embeddings=[[float(i), 1.0]])
+        stop.set()
+
+    def read():
+        while not stop.is_set():
+            result = collection.query(query_embeddings=[[5.0, 1.0]], n_results=3)
+            ids, docs, distances = result["ids"][0], result["documents"][0], result["distances"][0]
+            # Her kaydın belgesi ve mesafesi kendi vektörüyle uyumlu olmalı: c<i> -> [i, 1]
+            for id_, doc, distance in zip(ids, docs, distances):
+                if doc != id_[1:] or abs(distance - (int(doc) - 5.0) ** 2) > 1e-3:
+                    errors.append((id_, doc, distance))
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for thread in readers:
+        thread.start()
+    write()
+    for thread in readers:
+        thread.join()
+    assert errors == []
+    assert collection.count() == 40
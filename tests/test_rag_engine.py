@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from src import config
+from src.rag_engine import adaptive_cutoff, distance_to_score, mmr_select
+
+
+@pytest.fixture
+def cutoff_config(monkeypatch):
+    monkeypatch.setattr(config, "TOP_K", 6)
+    monkeypatch.setattr(config, "RETRIEVAL_MIN_SCORE", 0.25)
+    monkeypatch.setattr(config, "RETRIEVAL_SCORE_GAP", 0.08)
+
+
+def test_distance_to_score_unit_vectors():
+    assert distance_to_score(0.0) == 1.0
+    assert distance_to_score(2.0) == 0.0
+    assert distance_to_score(4.0) == -1.0
+    # Birim vektörlerde ||a - b||^2 = 2 - 2 cos
+    a = np.array([1.0, 0.0])
+    b = np.array([np.cos(0.5), np.sin(0.5)])
+    assert distance_to_score(np.sum((a - b) ** 2)) == pytest.approx(np.cos(0.5))
+
+
+def test_adaptive_cutoff_keeps_scores_above_floor(cutoff_config):
+    assert adaptive_cutoff([0.6, 0.55, 0.5, 0.2, 0.19]) == 3
+
+
+def test_adaptive_cutoff_stops_at_gap(cutoff_config):
+    assert adaptive_cutoff([0.7, 0.68, 0.5, 0.49]) == 2
+
+
+def test_adaptive_cutoff_nothing_above_floor(cutoff_config):
+    assert adaptive_cutoff([0.2, 0.1]) == 0
+    assert adaptive_cutoff([]) == 0
+
+
+def test_adaptive_cutoff_respects_limit(cutoff_config):
+    scores = [0.9, 0.89, 0.88, 0.87, 0.86, 0.85, 0.84, 0.83]
+    assert adaptive_cutoff(scores) == 6
+    assert adaptive_cutoff(scores, limit=3) == 3
+
+
+def test_mmr_select_pure_relevance():
+    relevance = [0.2, 0.9, 0.5]
+    embeddings = np.eye(3)
+    assert mmr_select(relevance, embeddings, k=3, lambda_mult=1.0) == [1, 2, 0]
+
+
+def test_mmr_select_skips_near_duplicates():
+    # 0 ve 1 neredeyse aynı vektör; 2 farklı ama biraz daha az alakalı
+    embeddings = np.array([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]])
+    relevance = [0.9, 0.89, 0.8]
+    assert mmr_select(relevance, embeddings, k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_mmr_select_bounds():
+    embeddings = np.eye(2)
+    assert mmr_select([0.5, 0.4], embeddings, k=5, lambda_mult=0.5) == [0, 1]
+    assert mmr_select([], np.zeros((0, 2)), k=3) == []
@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from src import config, router as router_module
+from src.agent import LegalRAG
+from src.router import EmbeddingRouter
+
+KEYS = list(config.LEGAL_DOCS)
+
+
+class EmptyCollection:
+    """Parçası olmayan koleksiyon: merkez vektör sadece açıklama vektörü olur."""
+
+    def get(self, ids=None, include=None):
+        return {"ids": [], "embeddings": []}
+
+
+def description_embedder(calls):
+    """Her kanunun açıklamasını kendi eksenine koyan sahte embedding fonksiyonu."""
+    def embed(texts):
+        calls.append(list(texts))
+        vectors = []
+        for text in texts:
+            vector = np.zeros(len(KEYS) + 1)  # Son eksen: hiçbir kanuna ait olmayan konu
+            vector[next(i for i, k in enumerate(KEYS) if text.startswith(config.LEGAL_DOCS[k]["name"] + ":"))] = 1.0
+            vectors.append(vector)
+        return vectors
+    return embed
+
+
+def axis(*weights):
+    vector = np.zeros(len(KEYS) + 1)
+    vector[:len(weights)] = weights
+    return vector
+
+
+@pytest.fixture
+def tools_map():
+    return {key: SimpleNamespace(collection=EmptyCollection()) for key in KEYS}
+
+
+@pytest.fixture
+def router_config(monkeypatch):
+    monkeypatch.setattr(config, "ROUTER_MIN_SCORE", 0.25)
+    monkeypatch.setattr(config, "ROUTER_MARGIN", 0.05)
+    monkeypatch.setattr(config, "ROUTER_GROUP_WIDTH", 0.02)
+    monkeypatch.setattr(config, "ROUTER_MAX_TOOLS", 2)
+    monkeypatch.setattr(config, "ROUTER_RETRY_INTERVAL", 60.0)
+
+
+def test_clear_question_is_confident(tools_map, router_config):
+    calls = []
+    router = EmbeddingRouter(tools_map, description_embedder(calls))
+    decision = router.route(axis(1.0, 0.1))
+    assert decision.keys == [KEYS[0]]
+    assert decision.confident and decision.margin >= config.ROUTER_MARGIN
+    router.route(axis(0.1, 1.0))
+    assert len(calls) == 1  # Merkez vektörler bir kez hesaplanır
+
+
+def test_close_scores_are_not_confident(tools_map, router_config):
+    router = EmbeddingRouter(tools_map, description_embedder([]))
+    decision = router.route(axis(1.0, 0.95))
+    assert decision.keys == [KEYS[0]]
+    assert not decision.confident
+
+
+def test_near_ties_are_selected_together(tools_map, router_config):
+    router = EmbeddingRouter(tools_map, description_embedder([]))
+    decision = router.route(axis(1.0, 0.99))
+    assert decision.keys == [KEYS[0], KEYS[1]]
+    assert decision.confident
+
+
+def test_low_scores_select_nothing(tools_map, router_config):
+    router = EmbeddingRouter(tools_map, description_embedder([]))
+    off_topic = axis(0.2, 0.1)
+    off_topic[-1] = 1.0
+    decision = router.route(off_topic)
+    assert decision.keys == [] and not decision.confident
+
+
+def test_failed_build_is_not_retried_until_interval(tools_map, router_config, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(router_module.time, "monotonic", lambda: now[0])
+    attempts = []
+
+    def failing(texts):
+        attempts.append(texts)
+        raise ConnectionError("embedding API erişilemez")
+
+    router = EmbeddingRouter(tools_map, failing)
+    with pytest.raises(ConnectionError):
+        router.route(axis(1.0))
+    with pytest.raises(RuntimeError):
+        router.route(axis(1.0))
+    assert len(attempts) == 1 and not router.ready
+
+    now[0] += config.ROUTER_RETRY_INTERVAL + 1
+    router.embed_fn = description_embedder([])
+    assert router.route(axis(1.0)).keys == [KEYS[0]]
+    assert router.ready
+
+
+def test_agent_falls_back_to_llm_planning_when_router_fails(tools_map, router_config):
+    def failing(texts):
+        raise ConnectionError("embedding API erişilemez")
+
+    agent = SimpleNamespace(router=EmbeddingRouter(tools_map, failing))
+    agent._route = lambda embedding: LegalRAG._route(agent, embedding)
+    assert LegalRAG._route(agent, axis(1.0)) == (None, False)
+    assert asyncio.run(LegalRAG._aroute(agent, axis(1.0))) == (None, False)
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from src.single_flight import SingleFlight, question_key
+
+
+def test_question_key_ignores_case_and_spaces():
+    assert question_key("  Aidat   ÖDEMEZSEM? ") == question_key("aidat ödemezsem?")
+
+
+def test_concurrent_calls_share_one_computation():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "cevap"
+
+        results = await asyncio.gather(*(flight.run("k", compute) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["cevap"] * 5
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 4}
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("LLM hatası")
+
+        results = await asyncio.gather(*(flight.run("k", failing) for _ in range(3)), return_exceptions=True)
+        # Hata sonrası kayıt silinir: aynı anahtar yeniden hesaplanır
+        again = await asyncio.gather(flight.run("k", failing), return_exceptions=True)
+        return flight, calls, results + again
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == 2
+    assert all(isinstance(r, RuntimeError) and str(r) == "LLM hatası" for r in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_computation():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "cevap"
+
+        first = asyncio.ensure_future(flight.run("k", compute))
+        second = asyncio.ensure_future(flight.run("k", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first
+
+    result, first = asyncio.run(scenario())
+    assert result == "cevap"
+    assert first.cancelled()
@@ -0,0 +1,142 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from src import config
+from src.agent import LegalRAG
+from src.speculation import Speculation, SpeculativeRetriever
+
+QUESTION = "Aidat ödemeyen malike ne yapılır?"
+QUESTION_VECTOR = [1.0, 0.0, 0.0]
+
+
+class SlowTool:
+    """Aramayı 'delay' saniye süren sahte LegalRAGTool."""
+
+    def __init__(self, name, delay=0.05, fail=False):
+        self.collection_name = name
+        self.delay = delay
+        self.fail = fail
+        self.cancelled = False
+
+    def get_context(self, query, query_embedding=None):
+        if self.fail:
+            raise RuntimeError("koleksiyon erişilemez")
+        return [{"id": f"{self.collection_name}:1", "content": query}]
+
+    async def aget_context(self, query, query_embedding=None):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.get_context(query, query_embedding)
+
+
+@pytest.fixture
+def tools(monkeypatch):
+    monkeypatch.setattr(config, "SPECULATIVE_COLLECTIONS", 2)
+    monkeypatch.setattr(config, "SPECULATIVE_MIN_SIMILARITY", 0.9)
+    return {"kmk": SlowTool("law_kmk"), "tbk": SlowTool("law_tbk"), "imar": SlowTool("law_imar")}
+
+
+def decision(**scores):
+    return SimpleNamespace(scores=scores)
+
+
+def test_prefetches_top_scored_collections(tools):
+    async def scenario():
+        speculator = SpeculativeRetriever(tools, executor=None)
+        speculation = speculator.astart(QUESTION, QUESTION_VECTOR, decision(kmk=0.2, tbk=0.5, imar=0.4))
+        targets = set(speculation.pending)
+        speculation.finish(0)
+        return targets
+
+    assert asyncio.run(scenario()) == {tools["tbk"], tools["imar"]}
+
+
+def test_matches_same_question_or_similar_vector(tools):
+    speculator = SpeculativeRetriever(tools, executor=None)
+    speculation = Speculation(speculator, QUESTION, QUESTION_VECTOR, {tools["kmk"]: None})
+
+    assert speculation.matches(tools["kmk"], "  aidat ÖDEMEYEN malike ne yapılır? ")
+    assert speculation.matches(tools["kmk"], "aidat borcu", query_embedding=np.array([0.99, 0.1, 0.0]))
+    assert not speculation.matches(tools["kmk"], "aidat borcu", query_embedding=np.array([0.5, 0.8, 0.0]))
+    assert not speculation.matches(tools["kmk"], "aidat borcu")
+    # Ön-arama yapılmayan kanun hiçbir zaman eşleşmez
+    assert not speculation.matches(tools["tbk"], QUESTION)
+
+
+def test_hit_uses_prefetched_results_and_cancels_the_rest(tools):
+    tools["tbk"].delay = 5
+
+    async def scenario():
+        speculator = SpeculativeRetriever(tools, executor=None)
+        speculation = speculator.astart(QUESTION, QUESTION_VECTOR, decision(kmk=0.9, tbk=0.5))
+        results = await speculation.atake(tools["kmk"])
+        speculation.finish(1)
+        await asyncio.sleep(0)
+        return speculator, results
+
+    speculator, results = asyncio.run(scenario())
+    assert results == [{"id": "law_kmk:1", "content": QUESTION}]
+    assert tools["tbk"].cancelled and not tools["kmk"].cancelled
+    stats = speculator.stats()
+    assert (stats["requests"], stats["prefetched"], stats["hits"], stats["misses"]) == (1, 2, 1, 0)
+    assert stats["saved_seconds_total"] >= 0
+
+
+def test_miss_is_counted_and_finish_is_idempotent(tools):
+    async def scenario():
+        speculator = SpeculativeRetriever(tools, executor=None)
+        speculation = speculator.astart(QUESTION, QUESTION_VECTOR, decision(kmk=0.9, tbk=0.5))
+        await asyncio.sleep(0)  # Ön-aramalar başlasın
+        speculation.finish(2)
+        speculation.finish(2)
+        await asyncio.sleep(0)
+        return speculator
+
+    speculator = asyncio.run(scenario())
+    assert tools["kmk"].cancelled and tools["tbk"].cancelled
+    stats = speculator.stats()
+    assert (stats["requests"], stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 0, 2, 0.0)
+
+
+def test_sync_take_and_failed_prefetch(tools):
+    tools["tbk"].fail = True
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        speculator = SpeculativeRetriever(tools, executor)
+        speculation = speculator.start(QUESTION, QUESTION_VECTOR, decision(kmk=0.9, tbk=0.5))
+        assert speculation.take(tools["kmk"]) == [{"id": "law_kmk:1", "content": QUESTION}]
+        # Hata veren ön-arama None döner; çağıran normal aramaya geçer
+        assert speculation.take(tools["tbk"]) is None
+        speculation.finish(2)
+    stats = speculator.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_failed_planning_cancels_prefetches(tools):
+    async def failing_create(**kwargs):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("planlama hatası")
+
+    async def aroute(question_embedding):
+        return decision(kmk=0.9, tbk=0.5), False
+
+    speculator = SpeculativeRetriever(tools, executor=None)
+    agent = SimpleNamespace(
+        _aroute=aroute,
+        speculator=speculator,
+        async_client=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=failing_create))),
+        _planning_kwargs=lambda messages: {},
+    )
+
+    async def scenario():
+        with pytest.raises(RuntimeError, match="planlama hatası"):
+            await LegalRAG._aplan(agent, QUESTION, [], QUESTION_VECTOR)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert tools["kmk"].cancelled and tools["tbk"].cancelled
+    assert speculator.stats()["requests"] == 1
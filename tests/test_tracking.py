@@ -0,0 +1,115 @@
+import threading
+import time
+from types import SimpleNamespace
+from src.tracking import RequestTracker
+
+
+class FakeTrace:
+    question = "Aidat ödemeyen malike ne yapılır?"
+
+    def summary(self):
+        return {
+            "flow": "async", "total": 0.5, "spans": {"planning": 0.2}, "tokens": {"prompt": 10},
+            "tool_calls": 1, "cache_hit": False, "context": None, "speculation": None,
+        }
+
+
+def recording_tracker(**options):
+    """_write'ı MLflow yerine bir listeye yazan yazıcı."""
+    tracker = RequestTracker(**options)
+    written = []
+
+    def write(records):
+        written.append(records)
+        tracker._count("written", len(records))
+
+    tracker._write = write
+    return tracker, written
+
+
+def test_sample_rate_zero_writes_nothing():
+    tracker, written = recording_tracker(sample_rate=0.0, flush_interval=0.01)
+    for _ in range(5):
+        tracker.track(FakeTrace(), "ok")
+    tracker.flush(timeout=1)
+    assert written == []
+    assert tracker.stats()["sampled_out"] == 5
+    assert tracker.stats()["queued"] == 0
+
+
+def test_full_queue_drops_and_counts():
+    tracker, written = recording_tracker(sample_rate=1.0, queue_size=2, batch_size=1)
+    release = threading.Event()
+    original_write = tracker._write
+
+    def blocked_write(records):
+        release.wait(5)
+        original_write(records)
+
+    tracker._write = blocked_write
+    # Yazıcı ilk kaydı alıp bloklanır; kuyruk 2 kayıtla dolar, kalanlar atılır
+    tracker.track(FakeTrace(), "ok")
+    while tracker._queue.qsize():
+        time.sleep(0.001)
+    for _ in range(5):
+        tracker.track(FakeTrace(), "ok")
+    assert tracker.stats()["dropped"] == 3
+
+    release.set()
+    tracker.flush(timeout=5)
+    stats = tracker.stats()
+    assert stats["queued"] == 3
+    assert stats["written"] == 3
+    assert sum(len(batch) for batch in written) == 3
+
+
+def test_flush_writes_pending_records_and_closes():
+    tracker, written = recording_tracker(sample_rate=1.0, batch_size=100, flush_interval=60)
+    for _ in range(4):
+        tracker.track(FakeTrace(), "error")
+    tracker.flush(timeout=5)
+
+    records = [r for batch in written for r in batch]
+    assert len(records) == 4
+    assert records[0]["status"] == "FAILED"
+    assert records[0]["metrics"]["latency_planning"] == 0.2
+    assert not tracker._thread.is_alive()
+
+    # Kapanıştan sonraki kayıtlar yok sayılır
+    tracker.track(FakeTrace(), "ok")
+    assert tracker.stats()["queued"] == 4
+
+
+class FakeMlflowClient:
+    """MLflow çağrılarını sayan sahte istemci."""
+
+    def __init__(self):
+        self.calls = []
+        self.metrics = []
+
+    def create_run(self, experiment_id, start_time, run_name):
+        self.calls.append("create_run")
+        return SimpleNamespace(info=SimpleNamespace(run_id="run-1"))
+
+    def log_batch(self, run_id, metrics, params, tags):
+        self.calls.append("log_batch")
+        self.metrics.extend(metrics)
+
+    def set_terminated(self, run_id, status, end_time):
+        self.calls.append(("set_terminated", status))
+
+
+def test_group_is_written_as_one_run_with_step_indexed_metrics():
+    tracker = RequestTracker(sample_rate=1.0, batch_size=100, flush_interval=60)
+    client = tracker._client = FakeMlflowClient()
+    tracker.track(FakeTrace(), "ok")
+    tracker.track(FakeTrace(), "error")
+    tracker.track(FakeTrace(), "ok")
+    tracker.flush(timeout=5)
+
+    # İstek başına değil, grup başına üç çağrı
+    assert client.calls == ["create_run", "log_batch", ("set_terminated", "FINISHED")]
+    errors = sorted((m.step, m.value) for m in client.metrics if m.key == "error")
+    assert errors == [(0, 0.0), (1, 1.0), (2, 0.0)]
+    assert sorted(m.step for m in client.metrics if m.key == "latency_planning") == [0, 1, 2]
+    assert tracker.stats()["written"] == 3